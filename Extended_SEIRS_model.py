@@ -10,44 +10,378 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as pyplot
 import csv
-
-def run_model(scenario,runs,plot,outfile):
-    #Total population size
-    N = 10800
+import os
+import json
+import hashlib
+import copy
+import scipy.sparse
+import pickle
+import gzip
+
+#Total population size
+N = 10800
+
+#Using demographic community network generator defined in the SEIRS+ package
+household_data = {
+                   'age_distn':{'0-9': 0.09706, '10-19':0.09917, '20-29': 0.12489, '30-39': 0.15119, '40-49': 0.14618, '50-59': 0.12868, '60-69': 0.10485, '70-79': 0.09405, '80+'  : 0.05393 },
+                   'household_size_distn':{ 1: 0.2567, 2: 0.2947, 3: 0.1978, 4: 0.1757, 5: 0.05069, 6: 0.0167, 7: 0.00771 },
+                   'household_stats':{ 'pct_with_under20': 0.28,                      # percent of households with at least one member under 60
+                                       'pct_with_over60': 0.42,                       # percent of households with at least one member over 60
+                                       'pct_with_under20_over60':  0.05,              # percent of households with at least one member under 20 and at least one member over 60
+                                       'pct_with_over60_givenSingleOccupant': 0.12,   # percent of households with a single-occupant that is over 60
+                                       'mean_num_under20_givenAtLeastOneUnder20': 1.62 # number of people under 20 in households with at least one member under 20
+                                     }
+                 }
+
+layer_info  = { '0-9':   {'ageBrackets': ['0-9'],   'meanDegree': 12.62 },
+                '10-19': {'ageBrackets': ['10-19'], 'meanDegree': 15.38 },
+                '20-29': {'ageBrackets': ['20-29'], 'meanDegree': 12.89 },
+                '30-39':   {'ageBrackets': ['30-39'], 'meanDegree': 12.89},
+                '40-49':   {'ageBrackets': ['40-49'], 'meanDegree': 12.27},
+                '50-59':   {'ageBrackets': ['50-59'], 'meanDegree': 11.64},
+                '60-69':   {'ageBrackets': ['60-69'], 'meanDegree': 9.42},
+                '70-79':   {'ageBrackets': ['70-79'], 'meanDegree': 7.2},
+                '80+':   {'ageBrackets': ['80+'], 'meanDegree': 7.2} }
+
+def network_cache_path(N, household_data, layer_info, seed, cache_dir='network_cache'):
+    #Cached networks are keyed by a hash of everything the generated network depends on
+    key = hashlib.sha1(json.dumps([N, household_data, layer_info, seed], sort_keys=True, default=str).encode()).hexdigest()
+    return os.path.join(cache_dir, 'network_'+key[:16]+'.npz')
+
+def load_demographic_contact_network(N, household_data, layer_info, seed=None, cache_dir='network_cache'):
+    #Without a seed a new network is generated from the current random state (and not cached).
+    #The generator adds entries to the dicts it is given, so it is passed copies that keep the cache key stable
+    if(seed is None):
+        demographic_graphs, individual_ageGroups, households = generate_demographic_contact_network(
+                                                                    N=N ,demographic_data=copy.deepcopy(household_data),layer_generator='FARZ',layer_info=copy.deepcopy(layer_info))
+        A_baseline = scipy.sparse.csr_matrix(networkx.to_scipy_sparse_array(demographic_graphs['baseline'], nodelist=range(N), format='csr'))
+        return A_baseline, individual_ageGroups, [household['indices'] for household in households]
+
+    path = network_cache_path(N, household_data, layer_info, seed, cache_dir)
+    if(not os.path.exists(path)):
+        #Generate the network from its own seed, leaving the random state of the run untouched
+        numpyState, pythonState = np.random.get_state(), random.getstate()
+        np.random.seed(seed)
+        random.seed(seed)
+        demographic_graphs, individual_ageGroups, households = generate_demographic_contact_network(
+                                                                    N=N ,demographic_data=copy.deepcopy(household_data),layer_generator='FARZ',layer_info=copy.deepcopy(layer_info))
+        np.random.set_state(numpyState)
+        random.setstate(pythonState)
+
+        #Store the CSR adjacency, age groups and household members (flattened, with offsets) in one npz file;
+        #written to a temporary file first so that concurrent runs never read a partial file
+        A = networkx.to_scipy_sparse_array(demographic_graphs['baseline'], nodelist=range(N), format='csr')
+        households_indices = [household['indices'] for household in households]
+        os.makedirs(cache_dir, exist_ok=True)
+        tmpPath = path[:-len('.npz')]+'.'+str(os.getpid())+'.tmp.npz'
+        np.savez(tmpPath, data=A.data, indices=A.indices, indptr=A.indptr,
+                 ageGroups=np.array(individual_ageGroups, dtype=str),
+                 householdMembers=np.concatenate(households_indices).astype(int),
+                 householdOffsets=np.cumsum([0]+[len(indices) for indices in households_indices]))
+        os.replace(tmpPath, path)
+
+    with np.load(path) as cached:
+        A_baseline = scipy.sparse.csr_matrix((cached['data'], cached['indices'], cached['indptr']), shape=(N,N))
+        individual_ageGroups = cached['ageGroups'].tolist()
+        householdMembers, householdOffsets = cached['householdMembers'], cached['householdOffsets']
+    households_indices = [householdMembers[start:end].tolist() for start, end in zip(householdOffsets[:-1], householdOffsets[1:])]
+    return A_baseline, individual_ageGroups, households_indices
+
+class Timeline:
+    #Dated events of one simulation phase: parameter checkpoints, importations (new exposures) and vaccinations.
+    #Event times are days since the start of the phase. Checkpoint values given as names are looked up in the
+    #values dict passed to run_timeline ('date' entries only document the events)
+    def __init__(self, T, checkpoints=[], importations=[], vaccinations=[]):
+        self.T            = T
+        self.checkpoints  = list(checkpoints)
+        self.importations = list(importations)
+        self.vaccinations = list(vaccinations)
+
+    def extended(self, other):
+        #This phase continued by another one whose event times are on the same clock
+        return Timeline(self.T+other.T, self.checkpoints+other.checkpoints,
+                        self.importations+other.importations, self.vaccinations+other.vaccinations)
+
+    def schedule(self):
+        #All events merged into one time-ordered schedule (at equal times: checkpoints, importations, vaccinations)
+        events = ([(event['t'], 0, 'checkpoint', event) for event in self.checkpoints]
+                  + [(event['t'], 1, 'importation', event) for event in self.importations]
+                  + [(event['t'], 2, 'vaccination', event) for event in self.vaccinations])
+        return sorted(events, key=lambda event: event[:2])
+
+def load_timelines(path):
+    #Returns the timeline of the calibration period and, for every scenario, the timelines of its pre-vaccination
+    #phase (continuing the calibration period) and of its vaccination phase (None if the scenario has none)
+    with open(path) as f:
+        spec = json.load(f)
+    def timeline(section):
+        return Timeline(section['T'], section.get('checkpoints', []), section.get('importations', []), section.get('vaccinations', []))
+    scenarioTimelines = {}
+    for scenario, scenarioSpec in spec['scenarios'].items():
+        scenarioTimelines[scenario] = (timeline(scenarioSpec['pre_vaccination']),
+                                       timeline(scenarioSpec['vaccination']) if 'vaccination' in scenarioSpec else None)
+    return timeline(spec['calibration']), scenarioTimelines
+
+def parameter_structures(model):
+    #Parameter values of a model and the structures built from them (graphs, sparse matrices and the parameter
+    #bundle of the Vac model), which the models never modify in place
+    structures = list(model.parameters.values()) + [value for value in vars(model).values()
+                                                    if scipy.sparse.issparse(value) or isinstance(value, networkx.Graph)]
+    if(getattr(model, 'parameterBundle', None) is not None):
+        structures += [model.parameterBundle] + list(vars(model.parameterBundle).values())
+    return structures
+
+def fork_model(model):
+    #Copy of a model in its current state that continues independently of it (used to branch the scenarios off the
+    #calibrated model). The Vac model forks itself (see ExtSEIRSNetworkModelVac.fork); for the stock seirsplus model the
+    #dynamic state is copied while the parameter values, graphs and sparse matrices are shared
+    if(hasattr(model, 'fork')):
+        return model.fork()
+    return copy.deepcopy(model, {id(obj): obj for obj in parameter_structures(model)})
+
+def model_state(model):
+    #Dynamic state of a model: all its attributes but the parameter values and the structures built from them.
+    #The data series are cut at the current time index (the models extend them again as needed)
+    structures = {id(structure) for structure in parameter_structures(model)}
+    state = {}
+    for attr, value in vars(model).items():
+        if(attr in ('parameters', 'parameterBundle') or (id(value) in structures and not (value is None or np.isscalar(value)))):
+            continue
+        if((attr in ('tseries', 'Xseries', 'engineSeries') or attr.startswith('num')) and isinstance(value, np.ndarray) and value.ndim > 0 and len(value) == len(model.tseries)):
+            value = value[:model.tidx+1]
+        state[attr] = value
+    return state
+
+def content_digest(value, memo):
+    #Digest of the content of a value (parameter values, graphs, model state, random states, events).
+    #Digests are memoized by id (together with the value, so that the id is not reused while memo is alive)
+    if(id(value) in memo):
+        return memo[id(value)][1]
+    if(value is None or isinstance(value, (bool, int, float, str, np.generic))):
+        return hashlib.sha1((type(value).__name__+repr(value)).encode()).digest()
+    digest = hashlib.sha1(type(value).__name__.encode())
+    if(isinstance(value, dict)):
+        for key in sorted(value, key=repr):
+            digest.update(content_digest(key, memo)+content_digest(value[key], memo))
+    elif(isinstance(value, (list, tuple))):
+        for item in value:
+            digest.update(content_digest(item, memo))
+    elif(isinstance(value, np.ndarray) and value.dtype != object):
+        digest.update((value.dtype.str+repr(value.shape)).encode()+np.ascontiguousarray(value).tobytes())
+    elif(scipy.sparse.issparse(value)):
+        value = scipy.sparse.csr_matrix(value)
+        for part in [value.shape, value.data, value.indices, value.indptr]:
+            digest.update(content_digest(part, memo))
+    elif(isinstance(value, modelVac.EdgeMaskedGraph)):
+        digest.update(content_digest(value.A, memo)+content_digest(value.mask, memo))
+    elif(isinstance(value, networkx.Graph)):
+        digest.update(content_digest(networkx.to_scipy_sparse_array(value, nodelist=sorted(value), format='csr'), memo))
+    else:
+        digest.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    memo[id(value)] = (value, digest.digest())
+    return memo[id(value)][1]
+
+def snapshot_path(snapshot_dir, key):
+    return os.path.join(snapshot_dir, 'snapshot_'+key[:16]+'.pkl.gz')
+
+def save_snapshot(snapshot_dir, key, model, **progress):
+    #Stores the dynamic state of a model, the random states and the progress through the timeline
+    #(written to a temporary file first, as the network cache is)
+    path = snapshot_path(snapshot_dir, key)
+    if(os.path.exists(path)):
+        return
+    snapshot = dict(progress, state=model_state(model), numpy_random=np.random.get_state(), random=random.getstate())
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tmpPath = path[:-len('.pkl.gz')]+'.'+str(os.getpid())+'.tmp.pkl.gz'
+    with gzip.open(tmpPath, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpPath, path)
+
+def load_snapshot(snapshot_dir, key):
+    path = snapshot_path(snapshot_dir, key)
+    if(not os.path.exists(path)):
+        return None
+    with gzip.open(path, 'rb') as f:
+        return pickle.load(f)
+
+def run_timeline(model, timeline, values, verbose=True, print_interval=10, snapshot_dir=None, bundle_cache=None):
+    #Runs a model through a timeline in one pass: the model is iterated directly (as the seirsplus sim loops do)
+    #and the events of the merged schedule are applied as soon as the simulation time reaches them.
+    #A bundle cache (a dict shared by the runs of one values dict) keeps the parameter bundles of the Vac model's
+    #checkpoints for the other timelines reaching the same parameter values (see compile_checkpoints below).
+    #With a snapshot directory, the state of the model is stored after every checkpoint and at the end of the timeline,
+    #and the run resumes from the latest stored snapshot whose timeline prefix matches (see below)
+    schedule = timeline.schedule()
+    vacModel = isinstance(model, modelVac.ExtSEIRSNetworkModelVac)
+
+    def resolve(param, value):
+        #Parameter values given as names are looked up in values (strings are only taken as they are for parameters
+        #whose values are strings, such as beta_pairwise_mode)
+        if(not isinstance(value, str) or param not in model.parameters or isinstance(model.parameters[param], str)):
+            return value
+        if(value not in values):
+            raise ValueError("Unknown value '"+value+"' for parameter "+param+" in the timeline (the values dict has no such key).")
+        return values[value]
+
+    def checkpoint_values(event):
+        #Only model parameters are updated; the stock seirsplus model only accepts networkx graphs (or dense arrays),
+        #so each edge mask it is given is converted once (see EdgeMaskedGraph.to_networkx) and reused by later checkpoints
+        params = {}
+        for param, value in event.items():
+            if(param in model.parameters):
+                value = resolve(param, value)
+                if(isinstance(value, modelVac.EdgeMaskedGraph) and not vacModel):
+                    value = value.to_networkx()
+                params[param] = value
+        return params
+
+    #Unknown value names are reported before the run rather than when their checkpoint is reached
+    checkpointEvents = [event for _, _, kind, event in schedule if kind == 'checkpoint']
+    for event in checkpointEvents:
+        for param, value in event.items():
+            resolve(param, value)
+
+    #The parameter sets of all checkpoints of the Vac model are built before the run (see compile_checkpoints)
+    if(vacModel and checkpointEvents):
+        checkpoints, current = {'t': [event['t'] for event in checkpointEvents]}, dict(model.parameters)
+        checkpointValues = [checkpoint_values(event) for event in checkpointEvents]
+        changedParams = set().union(*checkpointValues)
+        for params in checkpointValues:
+            current.update(params)
+            for param in changedParams:
+                checkpoints.setdefault(param, []).append(current[param])
+        #Bundles are cached under the parameter values in effect at each checkpoint: the names of the timeline values
+        #(or the literal values) given by the checkpoints so far, and the content of the model's other parameter values
+        #(among them the network it started with), so that the scenarios branching off a common model share them
+        cacheKeys = None
+        if(bundle_cache is not None):
+            memo, cacheKeys = {}, []
+            currentValues = {param: ('content', content_digest(value, memo)) for param, value in model.parameters.items()}
+            for event in checkpointEvents:
+                currentValues.update({param: ('name', value) if (isinstance(value, str) and value in values) else ('content', content_digest(value, memo))
+                                      for param, value in event.items() if param in model.parameters})
+                cacheKeys.append(tuple(sorted(currentValues.items())))
+        checkpoints = model.compile_checkpoints(checkpoints, bundle_cache, cacheKeys)
+
+    #Snapshots are content addressed: the key of the snapshot taken after an event is a hash of the model (state and
+    #parameters), of the random states at the start of the timeline, of its length and of all events up to that one,
+    #so that any run sharing that prefix (e.g. changing only later measures) can resume from it
+    snapshotKeys, snapshot = [], None
+    if(snapshot_dir):
+        memo = {}
+        digest = hashlib.sha1()
+        for part in [type(model).__name__, model.parameters, model_state(model), np.random.get_state(), random.getstate(), timeline.T]:
+            digest.update(content_digest(part, memo))
+        for _, _, kind, event in schedule:
+            digest.update(content_digest((kind, {key: resolve(key, value) for key, value in event.items() if key != 'date'}), memo))
+            snapshotKeys.append(digest.hexdigest())
+        endKey = hashlib.sha1(digest.digest()+b'end').hexdigest()
+
+        snapshot = load_snapshot(snapshot_dir, endKey)
+        for eventIdx in range(len(schedule)-1, -1, -1):
+            if(snapshot is not None):
+                break
+            if(schedule[eventIdx][2] == 'checkpoint'):
+                snapshot = load_snapshot(snapshot_dir, snapshotKeys[eventIdx])
+
+    model.tmax += timeline.T
+    eventIdx, checkpointIdx = 0, 0
+    running = True
+    if(snapshot is not None):
+        #Switch to the parameters in effect at the snapshot, then take over its state
+        eventIdx, checkpointIdx, running = snapshot['eventIdx'], snapshot['checkpointIdx'], snapshot['running']
+        if(checkpointIdx > 0):
+            if(vacModel):
+                model.apply_checkpoint(checkpoints, checkpointIdx-1)
+            else:
+                params = {}
+                for event in checkpointEvents[:checkpointIdx]:
+                    params.update(event)
+                model.parameters.update(checkpoint_values(params))
+                model.update_parameters()
+        vars(model).update(snapshot['state'])
+        np.random.set_state(snapshot['numpy_random'])
+        random.setstate(snapshot['random'])
+        if(verbose is not False):
+            print("[Snapshot: Resuming at t = %.2f]" % model.t)
+        if(snapshot['end']):
+            return model
+
+    print_reset = True
+    while True:
+        if(snapshot is not None):
+            #The events due at the time of the snapshot are applied before the next iteration, as in the stored run
+            snapshot = None
+        else:
+            if(vacModel):
+                #Leaps must not step over the next event
+                model.nextCheckpointTime = schedule[eventIdx][0] if eventIdx < len(schedule) else np.inf
+
+            running = model.run_iteration()
+
+            if(not running and model.t < model.tmax):
+                #No infected or isolated individuals are left: skip ahead to the next event, or stop if there is none
+                if(eventIdx >= len(schedule)):
+                    break
+                model.t = min(max(model.t, schedule[eventIdx][0]), model.tmax)
+
+        while(eventIdx < len(schedule) and model.t >= schedule[eventIdx][0]):
+            _, _, kind, event = schedule[eventIdx]
+            if(kind == 'checkpoint'):
+                if(verbose is not False):
+                    print("[Checkpoint: Updating parameters]")
+                if(vacModel):
+                    model.apply_checkpoint(checkpoints, checkpointIdx)
+                else:
+                    model.parameters.update(checkpoint_values(event))
+                    model.update_parameters()
+                checkpointIdx += 1
+                if(snapshot_dir):
+                    save_snapshot(snapshot_dir, snapshotKeys[eventIdx], model, eventIdx=eventIdx+1, checkpointIdx=checkpointIdx, running=running, end=False)
+            elif(kind == 'importation'):
+                model.introduce_exposures(num_new_exposures=event['num'])
+            elif(kind == 'vaccination'):
+                model.introduce_vaccined(num_new_vaccined=event['num'])
+            eventIdx += 1
+
+        if(not running and model.t >= model.tmax):
+            break
+
+        if(print_interval):
+            if(print_reset and (int(model.t) % print_interval == 0)):
+                if(verbose is not False):
+                    print("t = %.2f" % model.t)
+                if(verbose==True):
+                    for compartment in ['S', 'E', 'I_pre', 'I_sym', 'I_asym', 'H', 'R', 'F', 'Q_S', 'Q_E', 'Q_pre', 'Q_sym', 'Q_asym', 'Q_R']:
+                        print("\t %-6s = %s" % (compartment, getattr(model, 'num'+compartment)[model.tidx]))
+                print_reset = False
+            elif(not print_reset and (int(model.t) % 10 != 0)):
+                print_reset = True
+
+    if(snapshot_dir):
+        save_snapshot(snapshot_dir, endKey, model, eventIdx=eventIdx, checkpointIdx=checkpointIdx, running=running, end=True)
+    return model
+
+def run_model(scenario,runs,plot,outfile,network_seed=None,network_cache='network_cache',
+              timeline_file=os.path.join(os.path.dirname(os.path.abspath(__file__)),'timeline.json'),snapshot_dir=None):
+    #Dated measures, imported cases and vaccinations of the calibration period and of the scenarios
+    calibrationTimeline, scenarioTimelines = load_timelines(timeline_file)
+    #With scenario 'all' every scenario of the timeline file is run, branching off the same calibrated model
+    scenarios = list(scenarioTimelines) if scenario == 'all' else [scenario]
+    for name in scenarios:
+        assert(name in scenarioTimelines), "Unknown scenario "+str(name)+" (the timeline file defines "+", ".join(scenarioTimelines)+")."
 
     #Initial infected number
     INIT_INFECTED = 1
 
     #Specifying contact network
 
-    #Using demographic community network generator defined in the SEIRS+ package
-    household_data = {
-                       'age_distn':{'0-9': 0.09706, '10-19':0.09917, '20-29': 0.12489, '30-39': 0.15119, '40-49': 0.14618, '50-59': 0.12868, '60-69': 0.10485, '70-79': 0.09405, '80+'  : 0.05393 },
-                       'household_size_distn':{ 1: 0.2567, 2: 0.2947, 3: 0.1978, 4: 0.1757, 5: 0.05069, 6: 0.0167, 7: 0.00771 },
-                       'household_stats':{ 'pct_with_under20': 0.28,                      # percent of households with at least one member under 60
-                                           'pct_with_over60': 0.42,                       # percent of households with at least one member over 60
-                                           'pct_with_under20_over60':  0.05,              # percent of households with at least one member under 20 and at least one member over 60
-                                           'pct_with_over60_givenSingleOccupant': 0.12,   # percent of households with a single-occupant that is over 60
-                                           'mean_num_under20_givenAtLeastOneUnder20': 1.62 # number of people under 20 in households with at least one member under 20
-                                         }
-                     }
-
-    layer_info  = { '0-9':   {'ageBrackets': ['0-9'],   'meanDegree': 12.62 },
-                    '10-19': {'ageBrackets': ['10-19'], 'meanDegree': 15.38 },
-                    '20-29': {'ageBrackets': ['20-29'], 'meanDegree': 12.89 },
-                    '30-39':   {'ageBrackets': ['30-39'], 'meanDegree': 12.89},
-                    '40-49':   {'ageBrackets': ['40-49'], 'meanDegree': 12.27},
-                    '50-59':   {'ageBrackets': ['50-59'], 'meanDegree': 11.64},
-                    '60-69':   {'ageBrackets': ['60-69'], 'meanDegree': 9.42},
-                    '70-79':   {'ageBrackets': ['70-79'], 'meanDegree': 7.2},
-                    '80+':   {'ageBrackets': ['80+'], 'meanDegree': 7.2} }
-
-    demographic_graphs, individual_ageGroups, households = generate_demographic_contact_network(
-                                                                N=N ,demographic_data=household_data,layer_generator='FARZ',layer_info=layer_info)
-
-    G_baseline   = demographic_graphs['baseline']
-
-    households_indices = [household['indices'] for household in households]
+    #Network generated (or loaded from the network cache, if a network seed is given) with the demographic community network generator defined in the SEIRS+ package
+    A_baseline, individual_ageGroups, households_indices = load_demographic_contact_network(N, household_data, layer_info,
+                                                                                          seed=network_seed, cache_dir=network_cache)
+
+    #The baseline adjacency matrix is shared by all intervention networks, which are edge masks over it
+    G_baseline = modelVac.EdgeMaskedGraph(A_baseline)
 
     #Specifying parameters
 
@@ -326,7 +660,7 @@ def run_model(scenario,runs,plot,outfile):
                                         '70-79':    7,
                                         '80+':      7}
     m_SchoolUniClosure = [ageGroup_m_SchoolUniClosure[ageGroup] for ageGroup in individual_ageGroups]
-    G_SchoolUniClosure = custom_exponential_graph( G_baseline, scale = scale_SchoolUniClosure,m = m_SchoolUniClosure)
+    G_SchoolUniClosure = G_baseline.custom_exponential_graph(scale = scale_SchoolUniClosure,m = m_SchoolUniClosure)
 
     #Graph for Leisure closure
     ageGroup_scale_LeisureClosure = {'0-9':   7,
@@ -350,7 +684,7 @@ def run_model(scenario,runs,plot,outfile):
                                         '70-79':    7,
                                         '80+':      7}
     m_LeisureClosure = [ageGroup_m_LeisureClosure[ageGroup] for ageGroup in individual_ageGroups]
-    G_LeisureClosure = custom_exponential_graph( G_baseline, scale = scale_LeisureClosure,m=m_LeisureClosure )
+    G_LeisureClosure = G_baseline.custom_exponential_graph(scale = scale_LeisureClosure,m=m_LeisureClosure )
 
     #Private enterprises closure
     ageGroup_scale_PrivateEnterprises = {'0-9':   7,
@@ -373,7 +707,7 @@ def run_model(scenario,runs,plot,outfile):
                                         '70-79':    4,
                                         '80+':      4}
     m_PrivateEnterprises = [ageGroup_m_PrivateEnterprises[ageGroup] for ageGroup in individual_ageGroups]
-    G_PrivateEnterprisesClosure = custom_exponential_graph( G_baseline, scale = scale_PrivateEnterprises)
+    G_PrivateEnterprisesClosure = G_baseline.custom_exponential_graph(scale = scale_PrivateEnterprises)
 
     #1st National Lockdown
     ageGroup_scale_1stLockdown = {'0-9':   7,
@@ -396,7 +730,7 @@ def run_model(scenario,runs,plot,outfile):
                                         '70-79':    2,
                                         '80+':      2}
     m_1stLockdown = [ageGroup_m_1stLockdown[ageGroup] for ageGroup in individual_ageGroups]
-    G_1stLockdown = custom_exponential_graph( G_baseline, scale = scale_1stLockdown,m=m_1stLockdown)
+    G_1stLockdown = G_baseline.custom_exponential_graph(scale = scale_1stLockdown,m=m_1stLockdown)
 
     #Graph for Leisure – mass gathering containment
     ageGroup_scale_LeisureMass = {'0-9':   100,
@@ -419,7 +753,7 @@ def run_model(scenario,runs,plot,outfile):
                                         '70-79':    7,
                                         '80+':      7}
     m_LeisureMass = [ageGroup_m_LeisureMass[ageGroup] for ageGroup in individual_ageGroups]
-    G_LeisureMass = custom_exponential_graph( G_baseline, scale = scale_LeisureMass,m=m_LeisureMass)
+    G_LeisureMass = G_baseline.custom_exponential_graph(scale = scale_LeisureMass,m=m_LeisureMass)
 
     #Graph for Leisure closure 2
     ageGroup_scale_LeisureClosure2 = {'0-9':   100,
@@ -442,8 +776,7 @@ def run_model(scenario,runs,plot,outfile):
                                         '70-79':    7,
                                         '80+':      7}
     m_LeisureClosure2 = [ageGroup_m_LeisureClosure2[ageGroup] for ageGroup in individual_ageGroups]
-    G_baseline_NODIST = demographic_graphs['baseline'].copy()
-    G_LeisureClosure2 = custom_exponential_graph( G_baseline, scale = scale_LeisureClosure2,m=m_LeisureClosure2)
+    G_LeisureClosure2 = G_baseline.custom_exponential_graph(scale = scale_LeisureClosure2,m=m_LeisureClosure2)
 
     #«Heavy” masking +teleworking 50%
     ageGroup_scale_HeavyMaskingTeleworking = {'0-9':   100,
@@ -466,7 +799,7 @@ def run_model(scenario,runs,plot,outfile):
                                         '70-79':    7,
                                         '80+':      7}
     m_HeavyMaskingTeleworking = [ageGroup_m_HeavyMaskingTeleworking[ageGroup] for ageGroup in individual_ageGroups]
-    G_HeavyMaskingTeleworking = custom_exponential_graph(G_baseline, scale = scale_HeavyMaskingTeleworking,m=m_HeavyMaskingTeleworking)
+    G_HeavyMaskingTeleworking = G_baseline.custom_exponential_graph(scale = scale_HeavyMaskingTeleworking,m=m_HeavyMaskingTeleworking)
 
     #Graph for 2nd National Lockdown
     ageGroup_scale_Lockdown2 = {'0-9':   100,
@@ -489,7 +822,7 @@ def run_model(scenario,runs,plot,outfile):
                                         '70-79':    3,
                                         '80+':      3}
     m_Lockdown2 = [ageGroup_m_Lockdown2[ageGroup] for ageGroup in individual_ageGroups]
-    G_Lockdown2 = custom_exponential_graph(G_baseline, scale = scale_Lockdown2,m=m_Lockdown2)
+    G_Lockdown2 = G_baseline.custom_exponential_graph(scale = scale_Lockdown2,m=m_Lockdown2)
 
     #Nursery schools – kindergarten – primary schools closure
     ageGroup_scale_EducationClosure = {'0-9':   10,
@@ -512,391 +845,111 @@ def run_model(scenario,runs,plot,outfile):
                                         '70-79':    3,
                                         '80+':      3}
     m_EducationClosure = [ageGroup_m_EducationClosure[ageGroup] for ageGroup in individual_ageGroups]
-    G_EducationClosure = custom_exponential_graph( G_baseline, scale = scale_EducationClosure,m = m_EducationClosure)
-
-
-    checkpoints = {}
-    checkpoints = {'t':      [14,22,21,26,68,75,81,82,89,96,180,216,241,255,262,293,317],
-                   'G':       [G_SchoolUniClosure,#11/3 14
-                                G_LeisureClosure,#14/3 17
-                                G_PrivateEnterprisesClosure,#18/3 21
-                                G_1stLockdown,#23/3 26
-                                G_PrivateEnterprisesClosure,#4/5  68
-                                G_LeisureClosure,#11/5 75
-                                G_LeisureClosure,#17/5 81
-                                G_LeisureClosure,#18/5 82
-                                G_SchoolUniClosure,#25/5 89
-                                G_baseline,#1/6 96
-                                G_baseline,#24/8 180
-                                G_LeisureClosure2,#29/9 216
-                                G_HeavyMaskingTeleworking,#24/10 241
-                                G_Lockdown2,#7/11 255
-                                G_EducationClosure,#14/11 262
-                                G_SchoolUniClosure,#G_HeavyMaskingTeleworking,#15/12 293
-                                G_HeavyMaskingTeleworking],#8/1 317
-                   'p':       [p_SchoolUniClosure,#11/3 14
-                               p_LeisureClosure,#14/3 17
-                               p_LeisureClosure,#18/3 31
-                               p_NationalLockdown,#23/3 26
-                               p_LeisureClosure,#4/5  68
-                               p_LeisureClosure,#11/5 75
-                               p_LeisureClosure,#17/5 81
-                               p_SchoolUniClosure,#18/5 82
-                               p_SchoolUniClosure,#25/5 89
-                               P_GLOBALINTXN,#1/6 96
-                               P_GLOBALINTXN,#p_LeisureMass,#24/8 180
-                               p_LeisureMass,#p_LeisureClosure,#29/9 216
-                               p_Leisure24_10,#p_LeisureClosure,#24/10 241
-                               p_NationalLockdown2,#7/11 255
-                               p_EducationClosure,#14/11 262
-                               p_SchoolUniClosure,#15/12 293
-                               p_LeisureMass],#8/1 317
-                   'BETA':    [BETA,BETA,BETA,BETA,BETA_LightMasking,BETA_LightMasking,BETA_LightMasking,BETA_LightMasking,BETA_LightMasking,BETA_LightMasking,BETA_LightMasking,BETA_LightMasking,BETA_HeavyMaskingTeleworking,BETA_HeavyMaskingTeleworking,BETA_HeavyMaskingTeleworking,BETA_HeavyMaskingTeleworking,BETA_HeavyMaskingTeleworking],
-                   'BETA_asym':[BETA_asym,BETA_asym,BETA_asym,BETA_asym,BETA__asym_LightMasking,BETA__asym_LightMasking,BETA__asym_LightMasking,BETA__asym_LightMasking,BETA__asym_LightMasking,BETA__asym_LightMasking,BETA__asym_LightMasking,BETA__asym_LightMasking,BETA_asym_HeavyMaskingTeleworking,BETA_asym_HeavyMaskingTeleworking,BETA_asym_HeavyMaskingTeleworking,BETA_asym_HeavyMaskingTeleworking,BETA_asym_HeavyMaskingTeleworking]}
-
-    checkpoints2Freedom = {'t':[293],
-                          'G': [G_baseline],
-                          'p': [P_GLOBALINTXN],
-                          'BETA': [BETA]}
-
-    checkpoints2Lockdown ={'t':[293,317,340],
-                          'G': [G_SchoolUniClosure,G_HeavyMaskingTeleworking,G_Lockdown2],
-                          'p': [p_SchoolUniClosure,p_LeisureMass,p_NationalLockdown2],
-                          'BETA': [BETA_HeavyMaskingTeleworking,BETA_HeavyMaskingTeleworking,BETA_HeavyMaskingTeleworking]}
+    G_EducationClosure = G_baseline.custom_exponential_graph(scale = scale_EducationClosure,m = m_EducationClosure)
+
+
+    #Named networks and parameter values that the timeline checkpoints refer to
+    timelineValues = {'G_baseline':G_baseline, 'G_SchoolUniClosure':G_SchoolUniClosure, 'G_LeisureClosure':G_LeisureClosure,
+                      'G_PrivateEnterprisesClosure':G_PrivateEnterprisesClosure, 'G_1stLockdown':G_1stLockdown, 'G_LeisureMass':G_LeisureMass,
+                      'G_LeisureClosure2':G_LeisureClosure2, 'G_HeavyMaskingTeleworking':G_HeavyMaskingTeleworking, 'G_Lockdown2':G_Lockdown2,
+                      'G_EducationClosure':G_EducationClosure,
+                      'P_GLOBALINTXN':P_GLOBALINTXN, 'p_SchoolUniClosure':p_SchoolUniClosure, 'p_LeisureClosure':p_LeisureClosure,
+                      'p_NationalLockdown':p_NationalLockdown, 'p_LeisureMass':p_LeisureMass, 'p_Leisure24_10':p_Leisure24_10,
+                      'p_NationalLockdown2':p_NationalLockdown2, 'p_EducationClosure':p_EducationClosure,
+                      'BETA':BETA, 'BETA_asym':BETA_asym, 'BETA_LightMasking':BETA_LightMasking, 'BETA__asym_LightMasking':BETA__asym_LightMasking,
+                      'BETA_HeavyMaskingTeleworking':BETA_HeavyMaskingTeleworking, 'BETA_asym_HeavyMaskingTeleworking':BETA_asym_HeavyMaskingTeleworking}
+
+    #Parameter bundles of the Vac model's checkpoints, shared by all timelines run over this network (see run_timeline)
+    bundleCache = {}
 
     #Initializing the model
+    #(the pre-vaccination phase runs on the seirsplus ExtSEIRSNetworkModel, whose importations are exposures, S to E;
+    #it is not covered by the edge masks: it is given networkx graphs, each built once from its mask)
 
-    model = ExtSEIRSNetworkModel(G=G_baseline, p=P_GLOBALINTXN,
+    model = ExtSEIRSNetworkModel(G=G_baseline.to_networkx(), p=P_GLOBALINTXN,
                                   beta=BETA,beta_asym=BETA_asym, sigma=SIGMA, lamda=LAMDA, gamma=GAMMA,
                                   gamma_asym=GAMMA_asym, eta=ETA, gamma_H=GAMMA_H, mu_H=MU_H,
                                   a=PCT_ASYMPTOMATIC, h=PCT_HOSPITALIZED, f=PCT_FATALITY,
                                   alpha=ALPHA,beta_pairwise_mode=BETA_PAIRWISE_MODE, delta_pairwise_mode=DELTA_PAIRWISE_MODE, q=0,
                                   initI_pre=INIT_INFECTED)
 
-    #Running the model and introducing confirmed cases
-
-    model.run(T=36,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#23/3 36
-
-    model.run(T=8,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#5/4 44
-
-    model.run(T=58,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#2/6 102
-
-    model.run(T=42,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#14/7 144
-
-    model.run(T=17,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#31/7 161
-
-    model.run(T=6,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#6/8 167
-
-    model.run(T=5,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#11/8 172
-
-    model.run(T=4,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#15/8 176
-
-    model.run(T=5,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#20/8 181
-
-    model.run(T=4,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#24/8 185
-
-    model.run(T=6,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#30/8 191
-
-    model.run(T=5,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#4/9 196
-
-    model.run(T=3,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#7/9 199
-
-    model.run(T=4,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#11/9 203
-
-    model.run(T=3,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#14/9 206
-
-    model.run(T=3,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#17/9 209
-
-    model.run(T=3,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#20/9 212
-
-    model.run(T=4,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#24/9 216
-
-    model.run(T=2,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#26/9 218
-
-    model.run(T=4,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#30/9 222
-
-    model.run(T=2,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#2/10 224
-
-    model.run(T=3,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#5/10 227
-
-    model.run(T=3,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#8/10 230
-
-    model.run(T=2,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#10/10 232
-
-    model.run(T=2,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#12/10 234
-
-    model.run(T=2,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#14/10 236
-
-    model.run(T=2,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#16/10 238
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#17/10 239
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#18/10 240
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#19/10 241
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#20/10 242
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#31/10 243
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#22/10 244
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#23/10 245
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#24/10 246
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#25/10 247
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#26/10 248
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#27/10 249
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#28/10 250
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#29/10 251
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#30/10 252
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=3)#31/10 253
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#1/11 254
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=3)#2/11 255
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#3/11 256
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#4/11 257
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#5/11 258
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=3)#6/11 259
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=3)#7/11 260
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=4)#8/11 261
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=3)#9/11 262
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#10/11 263
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#11/11 264
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#12/11 265
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=3)#13/11 266
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=3)#14/11 267
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=3)#15/11 268
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#16/11 269
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#17/11 270
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#18/11 271
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#19/11 272
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#20/11 273
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#21/11 274
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#22/11 275
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#23/11 276
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#24/11 277
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#25/11 278
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#26/11 279
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#27/11 280
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#28/11 281
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#29/11 282
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#30/11 283
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#1/12 284
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#2/12 285
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#3/12 286
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#4/12 285
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=2)#5/12 286
-
-    model.run(T=1,verbose=True,checkpoints=checkpoints)
-    model.introduce_exposures(num_new_exposures=1)#6/12 287
-
-    #Running different scenarios
-    if(scenario == 'freedom'):
-        model.run(T=81,verbose=True,checkpoints=checkpoints2Freedom)
-    elif(scenario == 'semi'):
-        model.run(T=81,verbose=True,checkpoints=checkpoints)
-    elif(scenario == 'lockdown'):
-        model.run(T=81,verbose=True,checkpoints=checkpoints2Lockdown)
-
-    #Plotting number of nodes in each state along with the most important measures taken
-    checkpointsToPlot = [14, 17, 21, 26, 68, 216, 241, 255, 262]
-    if(plot):model.figure_infections(vlines=checkpointsToPlot,vline_labels = ['11/03 Schools/Uni Closure','13-14/03 Leisure closure',
-    '18/03 Private enterprises closure','23/03 1st National Lockdown','04/05 End of lockdown',
-    '24/08 Leisure and mass gathering containment','29/09 Leisure closure','24/10 Heavy masking + 50% teleworking'
-    ,'07/11 2nd National Lockdown','14/11 Education closure'],plot_percentages=False,
-                            ylim=100000,vline_colors=['red','purple','green','black','black','orange','blue','lightblue','pink'],
-                            )
-
-    #Getting numbers for each state at the end of the model
-    timeSeries   = model.tseries
-    Sseries      = model.numS
-    Eseries      = model.numE
-    I_preseries  = model.numI_pre
-    I_symseries  = model.numI_sym
-    I_asymseries = model.numI_asym
-    Rseries      = model.numR
-    Hseries      = model.numH
-    Fseries      = model.numF
-
-    if (scenario == 'semi'):
-        #Start vaccination model/phase 2
-        model2 = modelVac.ExtSEIRSNetworkModelVac(G=G_HeavyMaskingTeleworking, p=p_LeisureMass,
-                                      beta=BETA_HeavyMaskingTeleworking,beta_asym=BETA_asym_HeavyMaskingTeleworking, sigma=SIGMA, lamda=LAMDA, gamma=GAMMA,
-                                      gamma_asym=GAMMA_asym, eta=ETA, gamma_H=GAMMA_H, mu_H=MU_H,
-                                      a=PCT_ASYMPTOMATIC, h=PCT_HOSPITALIZED, f=PCT_FATALITY,
-                                      alpha=ALPHA,beta_pairwise_mode=BETA_PAIRWISE_MODE, delta_pairwise_mode=DELTA_PAIRWISE_MODE, q=0,
-                                      initR=448,
-                                      initE=4, initI_pre=3, initI_sym=6,
-                                       initI_asym=3, initF=8,initH=1)
-        checkpointsVac = {'t':[45],
-                          'G': [G_baseline],
-                          'p': [P_GLOBALINTXN],
-                          'BETA': [BETA_LightMasking],
-                          'BETA_asym':[BETA__asym_LightMasking]}
-
-        model2.run(T=1,verbose=True,checkpoints=checkpointsVac)
-        model2.introduce_vaccined(num_new_vaccined=90)
-
-        model2.run(T=134,verbose=True,checkpoints=checkpointsVac)
-        if(plot):model2.figure_infections(ylim=60000,plot_percentages=False,vlines=checkpointsVac['t'],vline_labels = ['1/4 Lighter measures'])
-        vactimeSeries   = model2.tseries
-        vacSseries      = model2.numS
-        vacEseries      = model2.numE
-        vacI_preseries  = model2.numI_pre
-        vacI_symseries  = model2.numI_sym
-        vacI_asymseries = model2.numI_asym
-        vacRseries      = model2.numR
-        vacHseries      = model2.numH
-        vacFseries      = model2.numF
-
-    elif(scenario == 'lockdown'):
-        #Start vaccination model/phase 2
-        model2 = modelVac.ExtSEIRSNetworkModelVac(G=G_Lockdown2, p=p_NationalLockdown2,
-                                      beta=BETA_HeavyMaskingTeleworking,beta_asym=BETA_asym_HeavyMaskingTeleworking, sigma=SIGMA, lamda=LAMDA, gamma=GAMMA,
-                                      gamma_asym=GAMMA_asym, eta=ETA, gamma_H=GAMMA_H, mu_H=MU_H,
-                                      a=PCT_ASYMPTOMATIC, h=PCT_HOSPITALIZED, f=PCT_FATALITY,
-                                      alpha=ALPHA,beta_pairwise_mode=BETA_PAIRWISE_MODE, delta_pairwise_mode=DELTA_PAIRWISE_MODE, q=0,
-                                       initR=stateNumbers['recovered'],initE=stateNumbers['exposed'], initI_pre=stateNumbers['i_pre'], initI_sym=stateNumbers['i_sym'],
-                                        initI_asym=stateNumbers['i_asym'], initF=stateNumbers['fatalities'],initH=stateNumbers['hospitalized'])
-        checkpointsVac = {'t':[50],
-                          'G': [G_HeavyMaskingTeleworking],
-                          'p': [p_LeisureMass],
-                          'BETA': [BETA_HeavyMaskingTeleworking]}
-
-        model2.run(T=1,verbose=True,checkpoints=checkpointsVac)
-        model2.introduce_vaccined(num_new_vaccined=90)
-
-        model2.run(T=134)
-        if(plot):model2.figure_infections(ylim=15000,plot_percentages=False)
-
-        vactimeSeries   = model2.tseries
-        vacSseries      = model2.numS
-        vacEseries      = model2.numE
-        vacI_preseries  = model2.numI_pre
-        vacI_symseries  = model2.numI_sym
-        vacI_asymseries = model2.numI_asym
-        vacRseries      = model2.numR
-        vacHseries      = model2.numH
-        vacFseries      = model2.numF
-
-    return(timeSeries,Sseries,Eseries,I_preseries,I_symseries,I_asymseries,Rseries,Hseries,Fseries,
-            vactimeSeries,vacSseries,vacEseries,vacI_preseries,vacI_symseries,vacI_asymseries,vacRseries,vacHseries,vacFseries)
+    #Running the model through the calibration period (measures and confirmed imported cases) once
+    run_timeline(model, calibrationTimeline, timelineValues, verbose=True, snapshot_dir=snapshot_dir, bundle_cache=bundleCache)
+
+    results = {}
+    for scenarioName in scenarios:
+        preVaccinationTimeline, vaccinationTimeline = scenarioTimelines[scenarioName]
+
+        #Each scenario continues from its own fork of the calibrated model (the last one can take the model itself)
+        scenarioModel = fork_model(model) if scenarioName != scenarios[-1] else model
+        run_timeline(scenarioModel, preVaccinationTimeline, timelineValues, verbose=True, snapshot_dir=snapshot_dir, bundle_cache=bundleCache)
+
+        #Plotting number of nodes in each state along with the most important measures taken
+        checkpointsToPlot = [14, 17, 21, 26, 68, 216, 241, 255, 262]
+        if(plot):scenarioModel.figure_infections(vlines=checkpointsToPlot,vline_labels = ['11/03 Schools/Uni Closure','13-14/03 Leisure closure',
+        '18/03 Private enterprises closure','23/03 1st National Lockdown','04/05 End of lockdown',
+        '24/08 Leisure and mass gathering containment','29/09 Leisure closure','24/10 Heavy masking + 50% teleworking'
+        ,'07/11 2nd National Lockdown','14/11 Education closure'],plot_percentages=False,
+                                ylim=100000,vline_colors=['red','purple','green','black','black','orange','blue','lightblue','pink'],
+                                )
+
+        #Getting numbers for each state at the end of the model
+        timeSeries   = scenarioModel.tseries
+        Sseries      = scenarioModel.numS
+        Eseries      = scenarioModel.numE
+        I_preseries  = scenarioModel.numI_pre
+        I_symseries  = scenarioModel.numI_sym
+        I_asymseries = scenarioModel.numI_asym
+        Rseries      = scenarioModel.numR
+        Hseries      = scenarioModel.numH
+        Fseries      = scenarioModel.numF
+
+        #Scenarios without a vaccination phase have empty vaccination series
+        vactimeSeries = vacSseries = vacEseries = vacI_preseries = vacI_symseries = vacI_asymseries = vacRseries = vacHseries = vacFseries = np.array([])
+
+        if (scenarioName == 'semi'):
+            #Start vaccination model/phase 2
+            #(continuing from the node states the pre-vaccination phase ended with)
+            model2 = modelVac.ExtSEIRSNetworkModelVac.from_model(scenarioModel, G=G_HeavyMaskingTeleworking, p=p_LeisureMass,
+                                          beta=BETA_HeavyMaskingTeleworking,beta_asym=BETA_asym_HeavyMaskingTeleworking, sigma=SIGMA, lamda=LAMDA, gamma=GAMMA,
+                                          gamma_asym=GAMMA_asym, eta=ETA, gamma_H=GAMMA_H, mu_H=MU_H,
+                                          a=PCT_ASYMPTOMATIC, h=PCT_HOSPITALIZED, f=PCT_FATALITY,
+                                          alpha=ALPHA,beta_pairwise_mode=BETA_PAIRWISE_MODE, delta_pairwise_mode=DELTA_PAIRWISE_MODE, q=0)
+            run_timeline(model2, vaccinationTimeline, timelineValues, verbose=True, snapshot_dir=snapshot_dir, bundle_cache=bundleCache)
+            if(plot):model2.figure_infections(ylim=60000,plot_percentages=False,vlines=[event['t'] for event in vaccinationTimeline.checkpoints],vline_labels = ['1/4 Lighter measures'])
+            vactimeSeries   = model2.tseries
+            vacSseries      = model2.numS
+            vacEseries      = model2.numE
+            vacI_preseries  = model2.numI_pre
+            vacI_symseries  = model2.numI_sym
+            vacI_asymseries = model2.numI_asym
+            vacRseries      = model2.numR
+            vacHseries      = model2.numH
+            vacFseries      = model2.numF
+
+        elif(scenarioName == 'lockdown'):
+            #Start vaccination model/phase 2
+            #(continuing from the node states the pre-vaccination phase ended with)
+            model2 = modelVac.ExtSEIRSNetworkModelVac.from_model(scenarioModel, G=G_Lockdown2, p=p_NationalLockdown2,
+                                          beta=BETA_HeavyMaskingTeleworking,beta_asym=BETA_asym_HeavyMaskingTeleworking, sigma=SIGMA, lamda=LAMDA, gamma=GAMMA,
+                                          gamma_asym=GAMMA_asym, eta=ETA, gamma_H=GAMMA_H, mu_H=MU_H,
+                                          a=PCT_ASYMPTOMATIC, h=PCT_HOSPITALIZED, f=PCT_FATALITY,
+                                          alpha=ALPHA,beta_pairwise_mode=BETA_PAIRWISE_MODE, delta_pairwise_mode=DELTA_PAIRWISE_MODE, q=0)
+            run_timeline(model2, vaccinationTimeline, timelineValues, verbose=True, snapshot_dir=snapshot_dir, bundle_cache=bundleCache)
+            if(plot):model2.figure_infections(ylim=15000,plot_percentages=False)
+
+            vactimeSeries   = model2.tseries
+            vacSseries      = model2.numS
+            vacEseries      = model2.numE
+            vacI_preseries  = model2.numI_pre
+            vacI_symseries  = model2.numI_sym
+            vacI_asymseries = model2.numI_asym
+            vacRseries      = model2.numR
+            vacHseries      = model2.numH
+            vacFseries      = model2.numF
+
+        results[scenarioName] = (timeSeries,Sseries,Eseries,I_preseries,I_symseries,I_asymseries,Rseries,Hseries,Fseries,
+                                 vactimeSeries,vacSseries,vacEseries,vacI_preseries,vacI_symseries,vacI_asymseries,vacRseries,vacHseries,vacFseries)
+
+    #A dict of the series of every scenario for scenario 'all', otherwise the series of the scenario
+    return(results if scenario == 'all' else results[scenario])
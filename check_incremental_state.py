@@ -0,0 +1,114 @@
+import numpy as np
+import networkx
+import sys, getopt
+import modelVac
+
+#Consistency check of the incrementally maintained simulation state of the network models.
+#After every event the persistent propensities, transmission terms, state counts and propensity sum tree
+#(which the engines only update for the nodes affected by each event) are compared against the same
+#quantities calculated from scratch. Exits with status 1 at the first mismatch.
+
+RTOL = 1e-9
+ATOL = 1e-12
+
+def mismatch(name, incremental, fresh):
+   incremental = np.asarray(incremental, dtype=float)
+   fresh       = np.asarray(fresh, dtype=float)
+   if(incremental.shape != fresh.shape):
+      return name+': shape '+str(incremental.shape)+' != '+str(fresh.shape)
+   bad = ~np.isclose(incremental, fresh, rtol=RTOL, atol=ATOL)
+   if(np.any(bad)):
+      idx = tuple(np.argwhere(bad)[0])
+      return name+': '+str(np.count_nonzero(bad))+' entries differ, e.g. at '+str(idx)+': '+str(incremental[idx])+' != '+str(fresh[idx])
+   return None
+
+def check_tree(model):
+   problems = [mismatch('propensityTree column sums', [model.propensityTree.column_sum(c) for c in range(model.propensities.shape[1])], model.propensities.sum(axis=0)),
+               mismatch('propensityTree total', model.propensityTree.total(), (model.propensities.sum(axis=0)*model.calc_propensity_scales()).sum())]
+   return [problem for problem in problems if problem]
+
+def check_vac_model(model):
+   #Bring the persistent state up to date for the nodes changed by the last event(s), as the next iteration would:
+   model.update_propensities()
+   problems = [mismatch('stateCounts', model.stateCounts, np.bincount(model.X[:,0], minlength=model.Q_R+1))]
+   #Recalculate the transmission terms from scratch, then restore the incremental ones so they keep being tested:
+   incremental = (model.transmissionTerms_I, model.transmissionTerms_Q, model.transmissionTerms_IQ)
+   model.calc_transmission_terms()
+   problems += [mismatch('transmissionTerms_I', incremental[0], model.transmissionTerms_I),
+                mismatch('transmissionTerms_Q', incremental[1], model.transmissionTerms_Q),
+                mismatch('transmissionTerms_IQ', incremental[2], model.transmissionTerms_IQ)]
+   model.transmissionTerms_I, model.transmissionTerms_Q, model.transmissionTerms_IQ = incremental
+   ignoreTimers = (model.engine == 'next_reaction' and model.transition_mode == 'time_in_state')
+   problems += [mismatch('propensities', model.propensities, model.calc_propensities(ignore_timers=ignoreTimers)[0])]
+   return [problem for problem in problems if problem] + check_tree(model)
+
+def check_network_model(model):
+   #SEIRSNetworkModel only keeps persistent propensities with the next reaction engine:
+   model.update_next_reaction_queue()
+   ignoreTimers = (model.transition_mode == 'time_in_state')
+   problems = [mismatch('propensities', model.propensities, model.calc_propensities(ignore_timers=ignoreTimers)[0])]
+   return [problem for problem in problems if problem] + check_tree(model)
+
+def run_check(name, model, check, events):
+   model.tmax = 1000
+   for event in range(events):
+      running  = model.run_iteration()
+      problems = check(model)
+      if(problems):
+         print(name+': FAILED after event '+str(event+1)+' (t = %.3f)' % model.t)
+         for problem in problems:
+            print('   '+problem)
+         return False
+      if(not running):
+         break
+   print(name+': ok ('+str(event+1)+' events checked)')
+   return True
+
+def main(argv):
+   events = 2000
+   numNodes = 500
+   seed = 1
+   try:
+      opts, args = getopt.getopt(argv,"hn:N:",["help","events=","nodes=","seed="])
+   except getopt.GetoptError:
+      print ('check_incremental_state.py -n [number of events per check] -N [number of nodes] --seed [seed]')
+      sys.exit(2)
+   for opt, arg in opts:
+      if opt in("-h","--help"):
+         print ('check_incremental_state.py -n [number of events per check] -N [number of nodes] --seed [seed]')
+         sys.exit()
+      elif opt in ("-n", "--events"):
+         events = int(arg)
+      elif opt in ("-N", "--nodes"):
+         numNodes = int(arg)
+      elif opt in ("--seed"):
+         seed = int(arg)
+
+   G   = networkx.barabasi_albert_graph(numNodes, 4, seed=seed)
+   G_Q = networkx.barabasi_albert_graph(numNodes, 1, seed=seed+1)
+   #Parameters that exercise all transmission terms, the global interaction columns, isolation, contact tracing and vaccination:
+   vacParams = dict(G=G, G_Q=G_Q, beta=0.5, beta_asym=0.3, beta_Q=0.2, q=0.5, p=0.2, sigma=1/3, lamda=1/2, gamma=1/6, gamma_asym=1/5,
+                    eta=1/10, gamma_H=1/12, mu_H=1/20, a=0.3, h=0.1, f=0.1, xi=0.01,
+                    theta_E=0.05, theta_pre=0.05, theta_sym=0.2, theta_asym=0.05, phi_E=0.1, phi_pre=0.1, phi_sym=0.1, phi_asym=0.1,
+                    psi_E=1, psi_pre=1, psi_sym=1, psi_asym=1, isolation_time=7, initE=10, initI_sym=10, qu=0.3, fi=1/40)
+   checks = []
+   for engine in ['gillespie', 'next_reaction', 'tau_leap', 'daily', 'hybrid']:
+      for transitionMode in ['exponential_rates', 'time_in_state']:
+         checks.append(('ExtSEIRSNetworkModelVac('+engine+', '+transitionMode+')',
+                        lambda engine=engine, transitionMode=transitionMode: modelVac.ExtSEIRSNetworkModelVac(engine=engine, transition_mode=transitionMode, **vacParams),
+                        check_vac_model))
+   for transitionMode in ['exponential_rates', 'time_in_state']:
+      checks.append(('SEIRSNetworkModel(next_reaction, '+transitionMode+')',
+                     lambda transitionMode=transitionMode: modelVac.SEIRSNetworkModel(G=G, G_Q=G_Q, beta=0.5, beta_Q=0.2, sigma=1/3, gamma=1/6, mu_I=0.01, p=0.2, xi=0.01,
+                                                                                    theta_E=0.05, theta_I=0.1, phi_E=0.1, phi_I=0.1, psi_E=1, psi_I=1, q=0.5, initI=20,
+                                                                                    engine='next_reaction', transition_mode=transitionMode),
+                     check_network_model))
+
+   allOk = True
+   for name, buildModel, check in checks:
+      np.random.seed(seed)
+      allOk = run_check(name, buildModel(), check, events) and allOk
+   sys.exit(0 if allOk else 1)
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
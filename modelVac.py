@@ -2,12 +2,359 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import copy
+import heapq
+import inspect
 import networkx as networkx
 import numpy as numpy
 import scipy as scipy
 import scipy.integrate
 
 
+########################################################
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@#
+#@                                                    @#
+#@  SIMULATION DATA STRUCTURES                        @#
+#@                                                    @#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@#
+########################################################
+
+class PropensitySumTree():
+    """
+    A sum tree over a (nodes x transition types) propensity matrix, stored in a flat array
+    ===================================================
+    Each transition type (column) occupies a contiguous power-of-two block of leaves, and the
+    value of each block can be multiplied by a per-column scale factor (used for the global
+    interaction columns, whose rates are per-node weights times a count-dependent factor).
+    Point updates and sampling a (node, column) pair proportionally to its scaled propensity
+    both take O(log(numNodes*numColumns)) time, and the total rate is available at the root.
+    Params:
+            numRows     Number of rows (nodes) of the propensity matrix
+            numColumns  Number of columns (transition types) of the propensity matrix
+    """
+    def __init__(self, numRows, numColumns):
+        self.numRows    = int(numRows)
+        self.numColumns = int(numColumns)
+        self.blockSize  = 1 << int(numpy.ceil(numpy.log2(max(self.numRows, 2))))
+        self.numBlocks  = 1 << int(numpy.ceil(numpy.log2(max(self.numColumns, 2))))
+        self.numLeaves  = self.blockSize*self.numBlocks
+        # tree[1] is the root and the children of tree[i] are tree[2i] and tree[2i+1];
+        # leaves are stored in tree[numLeaves:], the block roots in tree[numBlocks:2*numBlocks].
+        # Nodes above the block roots hold scaled sums, nodes at or below them hold unscaled sums.
+        self.tree       = numpy.zeros(2*self.numLeaves)
+        self.scales     = numpy.zeros(self.numBlocks)
+        self.scales[:self.numColumns] = 1
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def build(self, values):
+        leaves = numpy.zeros((self.numBlocks, self.blockSize))
+        leaves[:self.numColumns, :self.numRows] = numpy.asarray(values).T
+        self.tree[self.numLeaves:] = leaves.ravel()
+        levelStart = self.numLeaves
+        while(levelStart > self.numBlocks):
+            self.tree[levelStart//2:levelStart] = self.tree[levelStart:2*levelStart:2] + self.tree[levelStart+1:2*levelStart:2]
+            levelStart = levelStart//2
+        self.update_scaled_sums()
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update(self, rows, columns, values):
+        # Set the given (row, column) entries to the given values and update the sums along their paths to the root:
+        if(len(rows) == 0):
+            return
+        treeIdx = self.numLeaves + numpy.asarray(columns)*self.blockSize + numpy.asarray(rows)
+        self.tree[treeIdx] = values
+        treeIdx = treeIdx//2
+        while(treeIdx[0] >= self.numBlocks):
+            self.tree[treeIdx] = self.tree[2*treeIdx] + self.tree[2*treeIdx+1]
+            treeIdx = treeIdx//2
+        self.update_scaled_sums()
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def set_scales(self, scales):
+        self.scales[:self.numColumns] = scales
+        self.update_scaled_sums()
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update_scaled_sums(self):
+        # Recompute the (few) tree nodes above the block roots from the scaled block sums:
+        levelSums  = self.tree[self.numBlocks:2*self.numBlocks]*self.scales
+        levelStart = self.numBlocks
+        while(levelStart > 1):
+            levelSums  = levelSums[0::2] + levelSums[1::2]
+            levelStart = levelStart//2
+            self.tree[levelStart:2*levelStart] = levelSums
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def total(self):
+        return self.tree[1]
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def column_total(self, column):
+        return self.tree[self.numBlocks+column]*self.scales[column]
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def column_sum(self, column):
+        # Unscaled sum of the given column:
+        return self.tree[self.numBlocks+column]
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def column_totals(self):
+        # Scaled totals of all columns:
+        return self.tree[self.numBlocks:self.numBlocks+self.numColumns]*self.scales[:self.numColumns]
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def value(self, row, column):
+        return self.tree[self.numLeaves + column*self.blockSize + row]*self.scales[column]
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def sample(self, u):
+        # Return the (row, column) entry at which the cumulative scaled propensity first exceeds u, for u in [0, total):
+        treeIdx = 1
+        while(treeIdx < self.numBlocks):
+            treeIdx   = 2*treeIdx
+            leftValue = self.tree[treeIdx]*self.scales[treeIdx-self.numBlocks] if treeIdx >= self.numBlocks else self.tree[treeIdx]
+            if(u >= leftValue):
+                rightValue = self.tree[treeIdx+1]*self.scales[treeIdx+1-self.numBlocks] if treeIdx >= self.numBlocks else self.tree[treeIdx+1]
+                if(rightValue > 0):
+                    u = u - leftValue
+                    treeIdx = treeIdx+1
+        column = treeIdx - self.numBlocks
+        return (self.sample_column(column, u/self.scales[column]), column)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def sample_column(self, column, u):
+        # Return the row within the given column at which the cumulative (unscaled) propensity first exceeds u:
+        treeIdx = self.numBlocks + column
+        while(treeIdx < self.numLeaves):
+            treeIdx   = 2*treeIdx
+            leftValue = self.tree[treeIdx]
+            if(u >= leftValue and self.tree[treeIdx+1] > 0):
+                u = u - leftValue
+                treeIdx = treeIdx+1
+        return treeIdx - self.numLeaves - column*self.blockSize
+
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+
+
+class IndexedPriorityQueue():
+    """
+    An indexed priority queue of putative firing times, used by the Next Reaction Method
+    ===================================================
+    Implemented as a tournament (minimum) tree stored in flat arrays, so that the times of
+    arbitrary items can be changed in O(log(numItems)) (vectorized over many items at once),
+    and the item with the earliest time is available at the root.
+    Params:
+            numItems    Number of items (reaction channels) in the queue
+    """
+    def __init__(self, numItems):
+        self.numItems   = int(numItems)
+        self.numLeaves  = 1 << int(numpy.ceil(numpy.log2(max(self.numItems, 2))))
+        # times[1] is the root and the children of times[i] are times[2i] and times[2i+1];
+        # argmin[i] holds the item with the earliest time in the subtree rooted at i.
+        self.times      = numpy.full(2*self.numLeaves, numpy.inf)
+        self.argmin     = numpy.zeros(2*self.numLeaves, dtype=int)
+        self.argmin[self.numLeaves:] = numpy.arange(self.numLeaves)
+        self.build(numpy.full(self.numItems, numpy.inf))
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def build(self, times):
+        self.times[self.numLeaves:self.numLeaves+self.numItems] = times
+        levelStart = self.numLeaves
+        while(levelStart > 1):
+            leftTimes   = self.times[levelStart:2*levelStart:2]
+            rightTimes  = self.times[levelStart+1:2*levelStart:2]
+            takeRight   = rightTimes < leftTimes
+            self.times[levelStart//2:levelStart]  = numpy.where(takeRight, rightTimes, leftTimes)
+            self.argmin[levelStart//2:levelStart] = numpy.where(takeRight, self.argmin[levelStart+1:2*levelStart:2], self.argmin[levelStart:2*levelStart:2])
+            levelStart = levelStart//2
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update(self, items, times):
+        # Set the times of the given items and restore the minima above them. The minimum of a subtree only
+        # changes if one of its children's did, so the update stops as soon as no minimum changes at a level
+        # (which is after a few levels for most items, whose times are far from the earliest ones).
+        if(len(items) == 0):
+            return
+        if(len(items) <= 4):
+            # A few items are cheaper to propagate up the tree one by one without array operations:
+            for item, time in zip(items, times):
+                treeIdx = self.numLeaves + int(item)
+                self.times[treeIdx] = time
+                treeIdx = treeIdx//2
+                while(treeIdx >= 1):
+                    childIdx = 2*treeIdx+1 if self.times[2*treeIdx+1] < self.times[2*treeIdx] else 2*treeIdx
+                    if(self.times[treeIdx] == self.times[childIdx] and self.argmin[treeIdx] == self.argmin[childIdx]):
+                        break
+                    self.times[treeIdx]  = self.times[childIdx]
+                    self.argmin[treeIdx] = self.argmin[childIdx]
+                    treeIdx = treeIdx//2
+            return
+        treeIdx = self.numLeaves + numpy.asarray(items)
+        self.times[treeIdx] = times
+        treeIdx = treeIdx//2
+        while(len(treeIdx) > 0 and treeIdx[0] >= 1):
+            leftTimes   = self.times[2*treeIdx]
+            rightTimes  = self.times[2*treeIdx+1]
+            takeRight   = rightTimes < leftTimes
+            newTimes    = numpy.where(takeRight, rightTimes, leftTimes)
+            newArgmin   = numpy.where(takeRight, self.argmin[2*treeIdx+1], self.argmin[2*treeIdx])
+            changed     = (newTimes != self.times[treeIdx]) | (newArgmin != self.argmin[treeIdx])
+            treeIdx     = treeIdx[changed]
+            self.times[treeIdx]  = newTimes[changed]
+            self.argmin[treeIdx] = newArgmin[changed]
+            treeIdx = treeIdx//2
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def peek(self):
+        # Return the earliest time in the queue and its item:
+        return (self.times[1], self.argmin[1])
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def time(self, items):
+        return self.times[self.numLeaves + numpy.asarray(items)]
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def reschedule(self, items, oldRates, newRates, t):
+        # Update the putative firing times of the given items after their rates changed at time t (Gibson & Bruck 2000):
+        # a pending time is rescaled by old/new rate, items without a pending time (or whose rate was zero)
+        # draw a new exponential waiting time, and items whose rate dropped to zero are never scheduled.
+        oldTimes    = self.time(items)
+        newTimes    = numpy.full(len(items), numpy.inf)
+        rescaled    = (oldRates > 0) & (newRates > 0) & (oldTimes < numpy.inf)
+        newTimes[rescaled] = t + (oldRates[rescaled]/newRates[rescaled])*(oldTimes[rescaled] - t)
+        drawn       = (newRates > 0) & ~rescaled
+        newTimes[drawn] = t + numpy.random.exponential(size=numpy.count_nonzero(drawn))/newRates[drawn]
+        self.update(items, newTimes)
+
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+
+
+class EdgeMaskedGraph():
+    """
+    A subgraph of a baseline network, given as a mask over the entries of the baseline's CSR adjacency matrix
+    ===================================================
+    All masked graphs derived from the same baseline share its adjacency matrix (data, indices and indptr arrays),
+    so each of them only adds one boolean per (directed) edge. Models accept an EdgeMaskedGraph wherever a graph is
+    expected; switching graphs (e.g., at a checkpoint) then selects another mask rather than building a new graph.
+    Params:
+            A           Baseline adjacency matrix (scipy.sparse matrix, symmetric)
+            mask        Boolean array over the entries of A (A.data) marking the edges kept (default: all edges)
+    """
+    def __init__(self, A, mask=None):
+        self.A = A if (scipy.sparse.isspmatrix_csr(A) and A.has_sorted_indices) else scipy.sparse.csr_matrix(A, copy=True)
+        self.A.sort_indices()
+        self.mask = numpy.ones(self.A.nnz, dtype=bool) if mask is None else numpy.asarray(mask, dtype=bool)
+        self.numNodes = int(self.A.shape[0])
+        self.reverseEntries = None
+        self.networkxGraph  = None
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def adjacency(self):
+        # Adjacency matrix of the masked graph, sharing the baseline's sparsity structure
+        # (masked edges are kept as explicit zeros):
+        return scipy.sparse.csr_matrix((self.A.data*self.mask, self.A.indices, self.A.indptr), shape=self.A.shape)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def edge_rows(self):
+        return numpy.repeat(numpy.arange(self.numNodes), numpy.diff(self.A.indptr))
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def reverse_entries(self):
+        # Position of the (j,i) entry for every (i,j) entry of the (symmetric, sorted) baseline adjacency matrix;
+        # computed once and shared by all masks derived from this one:
+        if(self.reverseEntries is None):
+            self.reverseEntries = numpy.empty(self.A.nnz, dtype=int)
+            self.reverseEntries[numpy.lexsort((self.edge_rows(), self.A.indices))] = numpy.arange(self.A.nnz)
+        return self.reverseEntries
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def neighbors(self, node):
+        entries = numpy.arange(self.A.indptr[node], self.A.indptr[node+1])
+        return self.A.indices[entries[self.mask[entries]]]
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def to_networkx(self):
+        # Networkx graph of the masked graph (for code that only accepts networkx graphs); built on the first call
+        # and returned again on later ones, so it must not be modified:
+        if(self.networkxGraph is None):
+            self.networkxGraph = networkx.Graph()
+            self.networkxGraph.add_nodes_from(range(self.numNodes))
+            self.networkxGraph.add_weighted_edges_from(zip(self.edge_rows()[self.mask], self.A.indices[self.mask], self.A.data[self.mask]))
+        return self.networkxGraph
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def custom_exponential_graph(self, scale=100, min_num_edges=0, m=9):
+        # Edge-mask counterpart of seirsplus' custom_exponential_graph(base_graph, scale, min_num_edges):
+        # each node keeps a random subset of its edges, of exponentially distributed size with mean scale
+        # (a single value, or one value per node), and an edge is kept if both of its nodes keep it.
+        # Unlike seirsplus, which goes through the nodes in order (each choosing among the edges left by the
+        # preceding ones), all nodes choose at once: the subset sizes are drawn for all nodes in one step, and every
+        # node keeps its edges with the lowest random keys. m is only used by seirsplus when no base graph is given.
+        # Returns a new EdgeMaskedGraph over the same baseline.
+        scale   = numpy.broadcast_to(numpy.asarray(scale, dtype=float), (self.numNodes,))
+        reverse = self.reverse_entries()
+        rows    = self.edge_rows()
+        entries = numpy.flatnonzero(self.mask)
+        degree  = numpy.bincount(rows[entries], minlength=self.numNodes)
+        numKeep = numpy.maximum(numpy.minimum(numpy.random.exponential(scale=scale), degree), min_num_edges).astype(int)
+        # Edges sorted by node and, within each node, by a random key; an edge is kept by its node if its rank is below numKeep:
+        entries = entries[numpy.lexsort((numpy.random.rand(len(entries)), rows[entries]))]
+        rank    = numpy.arange(len(entries)) - numpy.repeat(numpy.cumsum(degree)-degree, degree)
+        kept    = numpy.zeros(self.A.nnz, dtype=bool)
+        kept[entries[rank < numKeep[rows[entries]]]] = True
+        mask    = kept & kept[reverse]
+        maskedGraph = EdgeMaskedGraph(self.A, mask)
+        maskedGraph.reverseEntries = reverse
+        return maskedGraph
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def group_contact_matrix(self, groups):
+        # Collapse the masked graph into a contact matrix between groups of nodes (e.g. the age groups of the
+        # demographic network, one label per node): entry (i,j) is the mean number of contacts that a member of
+        # group i has with members of group j. Returns the group labels (sorted), the matrix and the group sizes.
+        groupNames, groupIdx = numpy.unique(numpy.asarray(groups), return_inverse=True)
+        membership  = scipy.sparse.csr_matrix((numpy.ones(self.numNodes), (numpy.arange(self.numNodes), groupIdx)), shape=(self.numNodes, len(groupNames)))
+        edges       = scipy.sparse.csr_matrix(((self.A.data != 0) & self.mask, self.A.indices, self.A.indptr), shape=self.A.shape, dtype=float)
+        groupSizes  = numpy.bincount(groupIdx, minlength=len(groupNames)).astype(float)
+        groupEdges  = numpy.asarray((membership.T @ edges @ membership).todense())
+        return groupNames, groupEdges/groupSizes[:,None], groupSizes
+
+
+
+
 ########################################################
 #@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@#
 #@                                                    @#
@@ -562,6 +909,12 @@ class SEIRSNetworkModel():
             initQ_I         Initial number of isolated infectious individuals
             initQ_R         Initial number of isolated recovered individuals
                             (all remaining nodes initialized susceptible)
+
+            engine          Stochastic simulation algorithm: 'gillespie' (direct method) or 'next_reaction' (Gibson-Bruck;
+                            only the propensities affected by each event are recalculated, and time_in_state
+                            transitions are scheduled at fixed times); the queue upkeep costs more per event than
+                            the direct method's sum tree, so 'gillespie' is the faster exact engine (about 1.8x at
+                            N=1000, mean degree 10); choose 'next_reaction' for its fixed-time transitions, not for speed
     """
     def __init__(self, G, beta, sigma, gamma,
                     mu_I=0, alpha=1.0, xi=0, mu_0=0, nu=0, f=0, p=0,
@@ -569,7 +922,7 @@ class SEIRSNetworkModel():
                     G_Q=None, beta_Q=None, beta_Q_local=None, sigma_Q=None, gamma_Q=None, mu_Q=None, alpha_Q=None, delta_Q=None,
                     theta_E=0, theta_I=0, phi_E=0, phi_I=0, psi_E=1, psi_I=1, q=0, isolation_time=14,
                     initE=0, initI=0, initR=0, initF=0, initQ_E=0, initQ_I=0,
-                    transition_mode='exponential_rates', node_groups=None, store_Xseries=False, seed=None):
+                    transition_mode='exponential_rates', node_groups=None, store_Xseries=False, seed=None, engine='gillespie'):
 
         if(seed is not None):
             numpy.random.seed(seed)
@@ -668,6 +1021,10 @@ class SEIRSNetworkModel():
 
         self.transition_mode = transition_mode
 
+        # Stochastic simulation algorithm ('gillespie' direct method or 'next_reaction' method):
+        self.engine = engine
+        assert(self.engine in ['gillespie', 'next_reaction']), "Unknown simulation engine "+str(self.engine)+"."
+
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         # Initialize other node metadata:
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -920,8 +1277,16 @@ class SEIRSNetworkModel():
         #----------------------------------------
         # Pre-calculate the pairwise delta*beta values:
         #----------------------------------------
-        self.A_deltabeta          = scipy.sparse.csr_matrix.multiply(self.A_delta_pairwise, self.A_beta_pairwise)
-        self.A_Q_deltabeta_Q      = scipy.sparse.csr_matrix.multiply(self.A_Q_delta_Q_pairwise, self.A_Q_beta_Q_pairwise)
+        self.A_deltabeta          = scipy.sparse.csr_matrix(scipy.sparse.csr_matrix.multiply(self.A_delta_pairwise, self.A_beta_pairwise))
+        self.A_Q_deltabeta_Q      = scipy.sparse.csr_matrix(scipy.sparse.csr_matrix.multiply(self.A_Q_delta_Q_pairwise, self.A_Q_beta_Q_pairwise))
+
+        # Columns of the adjacency matrices, i.e. the nodes whose exposure propensities depend on a given node:
+        self.A_csc                = scipy.sparse.csc_matrix(self.A)
+        self.A_Q_csc              = scipy.sparse.csc_matrix(self.A_Q)
+
+        # Next reaction times must be rescheduled from scratch with the updated parameters:
+        self.nextReactionQueue    = None
+        self.dirtyNodes           = []
 
 
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
@@ -984,84 +1349,128 @@ class SEIRSNetworkModel():
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-    def calc_propensities(self):
+    def calc_neighbor_sums(self, Amat, states, nodes, positive_only=False):
+        # Weighted sum (by Amat) over the neighbors of each node that are in one of the given states
+        # (or, with positive_only=True, over the neighbors that are positive and in none of the given states).
+        if(isinstance(nodes, slice)):
+            if(positive_only):
+                nbrMask = self.positive & ~numpy.isin(self.X, states)
+            else:
+                nbrMask = numpy.isin(self.X, states)
+            return numpy.asarray(scipy.sparse.csr_matrix.dot(Amat, nbrMask))
+        # Only evaluate the rows of the given nodes; cost is proportional to the number of their neighbors.
+        # Gather the positions of the given rows' entries in the CSR data/indices arrays:
+        rowStarts   = Amat.indptr[nodes]
+        rowLengths  = Amat.indptr[nodes+1] - rowStarts
+        rowIds      = numpy.repeat(numpy.arange(len(nodes)), rowLengths)
+        entries     = numpy.arange(rowLengths.sum()) + numpy.repeat(rowStarts - (numpy.cumsum(rowLengths) - rowLengths), rowLengths)
+        nbrs        = Amat.indices[entries]
+        if(positive_only):
+            nbrMask = self.positive[nbrs,0] & ~numpy.isin(self.X[nbrs,0], states)
+        else:
+            nbrMask = numpy.isin(self.X[nbrs,0], states)
+        # (bincount returns integers when the rows have no entries at all, hence the cast)
+        return numpy.bincount(rowIds, weights=Amat.data[entries]*nbrMask, minlength=len(nodes)).astype(float).reshape((len(nodes),1))
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def calc_propensities(self, nodes=None, ignore_timers=False):
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Propensities are calculated for all nodes (nodes=None), or only for the given array of node indices
+        # when the next reaction engine refreshes the rows affected by a state change.
+        # With ignore_timers=True, time_in_state transitions are given their (nonzero) propensity regardless of
+        # the time spent in the state, marking which transitions the node is eligible for once its time is up.
+        #------------------------------------
+        if(nodes is None):
+            nodes = slice(None)
+        X = self.X[nodes]
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         # Pre-calculate matrix multiplication terms that may be used in multiple propensity calculations,
         # and check to see if their computation is necessary before doing the multiplication
+        # (for given nodes only their rows are evaluated, see calc_neighbor_sums)
         #------------------------------------
 
-        self.transmissionTerms_I = numpy.zeros(shape=(self.numNodes,1))
+        transmissionTerms_I = numpy.zeros(shape=X.shape)
         if(numpy.any(self.numI[self.tidx])):
-            self.transmissionTerms_I = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_deltabeta, self.X==self.I))
+            transmissionTerms_I = self.calc_neighbor_sums(self.A_deltabeta, [self.I], nodes)
 
         #------------------------------------
 
-        self.transmissionTerms_Q = numpy.zeros(shape=(self.numNodes,1))
+        transmissionTerms_Q = numpy.zeros(shape=X.shape)
         if(numpy.any(self.numQ_I[self.tidx])):
-            self.transmissionTerms_Q = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_Q_deltabeta_Q, self.X==self.Q_I))
+            transmissionTerms_Q = self.calc_neighbor_sums(self.A_Q_deltabeta_Q, [self.Q_I], nodes)
 
         #------------------------------------
 
-        numContacts_Q = numpy.zeros(shape=(self.numNodes,1))
+        numContacts_Q = numpy.zeros(shape=X.shape)
         if(numpy.any(self.positive) and (numpy.any(self.phi_E) or numpy.any(self.phi_I))):
-            numContacts_Q = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A, ((self.positive)&(self.X!=self.R)&(self.X!=self.F))))
+            numContacts_Q = self.calc_neighbor_sums(self.A, [self.R, self.F], nodes, positive_only=True)
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        propensities_StoE       = (self.alpha *
-                                    (self.p*((self.beta_global*self.numI[self.tidx] + self.q*self.beta_Q_global*self.numQ_I[self.tidx])/self.N[self.tidx])
-                                     + (1-self.p)*(numpy.divide(self.transmissionTerms_I, self.degree, out=numpy.zeros_like(self.degree), where=self.degree!=0)
-                                                  +numpy.divide(self.transmissionTerms_Q, self.degree_Q, out=numpy.zeros_like(self.degree_Q), where=self.degree_Q!=0)))
-                                  )*(self.X==self.S)
+        # The global (mean-field) interaction terms depend on the current numbers of infectious individuals,
+        # which change with every event. They are therefore kept in separate columns holding only the per-node weights;
+        # the count-dependent factors are applied as per-column scales (see calc_propensity_scales).
+        propensities_StoE       = (self.alpha[nodes] *
+                                     (1-self.p[nodes])*(numpy.divide(transmissionTerms_I, self.degree[nodes], out=numpy.zeros_like(transmissionTerms_I), where=self.degree[nodes]!=0)
+                                                  +numpy.divide(transmissionTerms_Q, self.degree_Q[nodes], out=numpy.zeros_like(transmissionTerms_Q), where=self.degree_Q[nodes]!=0))
+                                  )*(X==self.S)
+
+        propensities_StoE_I     = self.alpha[nodes]*self.p[nodes]*self.beta_global[nodes]*(X==self.S)
+
+        propensities_StoE_Q     = self.alpha[nodes]*self.p[nodes]*self.q[nodes]*self.beta_Q_global[nodes]*(X==self.S)
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
         if(self.transition_mode == 'time_in_state'):
 
-            propensities_EtoI     = 1e5 * ((self.X==self.E) & numpy.greater(self.timer_state, 1/self.sigma))
+            timer_state = self.timer_state[nodes] if not ignore_timers else numpy.full(X.shape, numpy.inf)
 
-            propensities_ItoR     = 1e5 * ((self.X==self.I) & numpy.greater(self.timer_state, 1/self.gamma) & numpy.greater_equal(self.rand_f, self.f))
+            propensities_EtoI     = 1e5 * ((X==self.E) & numpy.greater(timer_state, 1/self.sigma[nodes]))
 
-            propensities_ItoF     = 1e5 * ((self.X==self.I) & numpy.greater(self.timer_state, 1/self.mu_I) & numpy.less(self.rand_f, self.f))
+            propensities_ItoR     = 1e5 * ((X==self.I) & numpy.greater(timer_state, 1/self.gamma[nodes]) & numpy.greater_equal(self.rand_f[nodes], self.f[nodes]))
+
+            propensities_ItoF     = 1e5 * ((X==self.I) & numpy.greater(timer_state, 1/self.mu_I[nodes]) & numpy.less(self.rand_f[nodes], self.f[nodes]))
 
             propensities_EtoQE    = numpy.zeros_like(propensities_StoE)
 
             propensities_ItoQI    = numpy.zeros_like(propensities_StoE)
 
-            propensities_QEtoQI   = 1e5 * ((self.X==self.Q_E) & numpy.greater(self.timer_state, 1/self.sigma_Q))
+            propensities_QEtoQI   = 1e5 * ((X==self.Q_E) & numpy.greater(timer_state, 1/self.sigma_Q[nodes]))
 
-            propensities_QItoR    = 1e5 * ((self.X==self.Q_I) & numpy.greater(self.timer_state, 1/self.gamma_Q) & numpy.greater_equal(self.rand_f, self.f))
+            propensities_QItoR    = 1e5 * ((X==self.Q_I) & numpy.greater(timer_state, 1/self.gamma_Q[nodes]) & numpy.greater_equal(self.rand_f[nodes], self.f[nodes]))
 
-            propensities_QItoF    = 1e5 * ((self.X==self.Q_I) & numpy.greater(self.timer_state, 1/self.mu_Q) & numpy.less(self.rand_f, self.f))
+            propensities_QItoF    = 1e5 * ((X==self.Q_I) & numpy.greater(timer_state, 1/self.mu_Q[nodes]) & numpy.less(self.rand_f[nodes], self.f[nodes]))
 
-            propensities_RtoS     = 1e5 * ((self.X==self.R) & numpy.greater(self.timer_state, 1/self.xi))
+            propensities_RtoS     = 1e5 * ((X==self.R) & numpy.greater(timer_state, 1/self.xi[nodes]))
 
-            propensities__toS     = 1e5 * ((self.X!=self.F) & numpy.greater(self.timer_state, 1/self.nu))
+            propensities__toS     = 1e5 * ((X!=self.F) & numpy.greater(timer_state, 1/self.nu[nodes]))
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
         else: # exponential_rates
 
-            propensities_EtoI        = self.sigma * (self.X==self.E)
+            propensities_EtoI        = self.sigma[nodes] * (X==self.E)
 
-            propensities_ItoR        = self.gamma * ((self.X==self.I) & (numpy.greater_equal(self.rand_f, self.f)))
+            propensities_ItoR        = self.gamma[nodes] * ((X==self.I) & (numpy.greater_equal(self.rand_f[nodes], self.f[nodes])))
 
-            propensities_ItoF        = self.mu_I * ((self.X==self.I) & (numpy.less(self.rand_f, self.f)))
+            propensities_ItoF        = self.mu_I[nodes] * ((X==self.I) & (numpy.less(self.rand_f[nodes], self.f[nodes])))
 
-            propensities_EtoQE       = (self.theta_E + self.phi_E*numContacts_Q)*self.psi_E * (self.X==self.E)
+            propensities_EtoQE       = (self.theta_E[nodes] + self.phi_E[nodes]*numContacts_Q)*self.psi_E[nodes] * (X==self.E)
 
-            propensities_ItoQI       = (self.theta_I + self.phi_I*numContacts_Q)*self.psi_I * (self.X==self.I)
+            propensities_ItoQI       = (self.theta_I[nodes] + self.phi_I[nodes]*numContacts_Q)*self.psi_I[nodes] * (X==self.I)
 
-            propensities_QEtoQI      = self.sigma_Q * (self.X==self.Q_E)
+            propensities_QEtoQI      = self.sigma_Q[nodes] * (X==self.Q_E)
 
-            propensities_QItoR       = self.gamma_Q * ((self.X==self.Q_I) & (numpy.greater_equal(self.rand_f, self.f)))
+            propensities_QItoR       = self.gamma_Q[nodes] * ((X==self.Q_I) & (numpy.greater_equal(self.rand_f[nodes], self.f[nodes])))
 
-            propensities_QItoF       = self.mu_Q * ((self.X==self.Q_I) & (numpy.less(self.rand_f, self.f)))
+            propensities_QItoF       = self.mu_Q[nodes] * ((X==self.Q_I) & (numpy.less(self.rand_f[nodes], self.f[nodes])))
 
-            propensities_RtoS        = self.xi * (self.X==self.R)
+            propensities_RtoS        = self.xi[nodes] * (X==self.R)
 
-            propensities__toS        = self.nu * (self.X!=self.F)
+            propensities__toS        = self.nu[nodes] * (X!=self.F)
 
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -1070,12 +1479,59 @@ class SEIRSNetworkModel():
                                      propensities_ItoR, propensities_ItoF,
                                      propensities_EtoQE, propensities_ItoQI, propensities_QEtoQI,
                                      propensities_QItoR, propensities_QItoF,
-                                     propensities_RtoS, propensities__toS])
+                                     propensities_RtoS, propensities__toS,
+                                     propensities_StoE_I, propensities_StoE_Q])
 
-        columns = ['StoE', 'EtoI', 'ItoR', 'ItoF', 'EtoQE', 'ItoQI', 'QEtoQI', 'QItoR', 'QItoF', 'RtoS', '_toS']
+        columns = ['StoE', 'EtoI', 'ItoR', 'ItoF', 'EtoQE', 'ItoQI', 'QEtoQI', 'QItoR', 'QItoF', 'RtoS', '_toS', 'StoE', 'StoE']
 
         return propensities, columns
 
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def calc_propensity_scales(self):
+        # Per-column multipliers of the propensity matrix: 1 for the node-local columns, and the current
+        # (infectious count)/N factors for the global interaction columns (infectious, isolated infectious).
+        scales = numpy.ones(13)
+        if(self.N[self.tidx] > 0):
+            scales[11] = self.numI[self.tidx]/self.N[self.tidx]
+            scales[12] = self.numQ_I[self.tidx]/self.N[self.tidx]
+        else:
+            scales[11:13] = 0
+        return scales
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def calc_transition_delays(self, nodes):
+        # Time in state after which each time_in_state transition occurs (nan for transitions driven by rates):
+        delays = numpy.full((len(nodes), len(self.propensityTypes)), numpy.nan)
+        transitionDelayParams = {'EtoI':self.sigma, 'ItoR':self.gamma, 'ItoF':self.mu_I, 'QEtoQI':self.sigma_Q,
+                                 'QItoR':self.gamma_Q, 'QItoF':self.mu_Q, 'RtoS':self.xi, '_toS':self.nu}
+        with numpy.errstate(divide='ignore'):
+            for col, transitionType in enumerate(self.propensityTypes):
+                if(transitionType in transitionDelayParams):
+                    delays[:,col] = 1/transitionDelayParams[transitionType][nodes,0]
+        return delays
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def set_node_state(self, node, state):
+        prevState = self.X[node,0]
+        if(prevState == state):
+            return
+        self.X[node] = state
+        if(self.nextReactionQueue is None):
+            # (all rows are recalculated when the next reaction queue is built)
+            return
+        # The node's own propensities always change:
+        self.dirtyNodes.append(node)
+        # Neighbors' exposure propensities change if the node started or stopped being infectious:
+        if((prevState == self.I) != (state == self.I)):
+            self.dirtyNodes.append(self.A_csc.indices[self.A_csc.indptr[node]:self.A_csc.indptr[node+1]])
+        if((prevState == self.Q_I) != (state == self.Q_I)):
+            self.dirtyNodes.append(self.A_Q_csc.indices[self.A_Q_csc.indptr[node]:self.A_Q_csc.indptr[node+1]])
+        # Neighbors' contact tracing testing propensities change if the node stopped/started counting as a positive contact:
+        if(self.positive[node,0] and ((prevState in (self.R, self.F)) != (state in (self.R, self.F)))):
+            self.dirtyNodes.append(self.A_csc.indices[self.A_csc.indptr[node]:self.A_csc.indptr[node+1]])
 
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
@@ -1084,14 +1540,14 @@ class SEIRSNetworkModel():
         # Move this node in/out of the appropriate isolation state:
         if(isolate == True):
             if(self.X[node] == self.E):
-                self.X[node] = self.Q_E
+                self.set_node_state(node, self.Q_E)
             elif(self.X[node] == self.I):
-                self.X[node] = self.Q_I
+                self.set_node_state(node, self.Q_I)
         elif(isolate == False):
             if(self.X[node] == self.Q_E):
-                self.X[node] = self.E
+                self.set_node_state(node, self.E)
             elif(self.X[node] == self.Q_I):
-                self.X[node] = self.I
+                self.set_node_state(node, self.I)
         # Reset the isolation timer:
         self.timer_isolation[node] = 0
 
@@ -1104,6 +1560,9 @@ class SEIRSNetworkModel():
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
     def set_positive(self, node, positive):
+        if(self.nextReactionQueue is not None and self.positive[node,0] != positive and self.X[node,0] not in (self.R, self.F)):
+            # Neighbors' contact tracing testing propensities depend on this node's positive status:
+            self.dirtyNodes.append(self.A_csc.indices[self.A_csc.indptr[node]:self.A_csc.indptr[node+1]])
         self.positive[node] = positive
 
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
@@ -1112,7 +1571,7 @@ class SEIRSNetworkModel():
         exposedNodes = numpy.random.choice(range(self.numNodes), size=num_new_exposures, replace=False)
         for exposedNode in exposedNodes:
             if(self.X[exposedNode]==self.S):
-                self.X[exposedNode] = self.E
+                self.set_node_state(exposedNode, self.E)
 
 
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
@@ -1185,11 +1644,9 @@ class SEIRSNetworkModel():
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-    def run_iteration(self):
-
-        if(self.tidx >= len(self.tseries)-1):
-            # Room has run out in the timeseries storage arrays; double the size of these arrays:
-            self.increase_data_series_length()
+    def gillespie_step(self, propensities, transitionTypes):
+        # Select the next event by Gillespie's direct method.
+        # Returns the time until the event and the node and type of the transition (None if no event can occur).
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         # Generate 2 random numbers uniformly distributed in (0,1)
@@ -1197,39 +1654,160 @@ class SEIRSNetworkModel():
         r1 = numpy.random.rand()
         r2 = numpy.random.rand()
 
+        if(propensities.sum() <= 0):
+            return (0.01, None, None)
+
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        # Calculate propensities
+        # Calculate alpha
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        propensities, transitionTypes = self.calc_propensities()
+        propensities_flat   = propensities.ravel(order='F')
+        cumsum              = propensities_flat.cumsum()
+        alpha               = propensities_flat.sum()
 
-        if(propensities.sum() > 0):
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Compute the time until the next event takes place
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        tau = (1/alpha)*numpy.log(float(1/r1))
 
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            # Calculate alpha
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            propensities_flat   = propensities.ravel(order='F')
-            cumsum              = propensities_flat.cumsum()
-            alpha               = propensities_flat.sum()
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Compute which event takes place
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        transitionIdx   = numpy.searchsorted(cumsum,r2*alpha)
+        transitionNode  = transitionIdx % self.numNodes
+        transitionType  = transitionTypes[ int(transitionIdx/self.numNodes) ]
 
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            # Compute the time until the next event takes place
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            tau = (1/alpha)*numpy.log(float(1/r1))
-            self.t += tau
-            self.timer_state += tau
+        return (tau, transitionNode, transitionType)
 
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            # Compute which event takes place
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            transitionIdx   = numpy.searchsorted(cumsum,r2*alpha)
-            transitionNode  = transitionIdx % self.numNodes
-            transitionType  = transitionTypes[ int(transitionIdx/self.numNodes) ]
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update_next_reaction_queue(self):
+        # Bring the propensities and the next reaction queue up to date with the state changes since the previous event:
+        # only the rows of the nodes affected by them (the fired node, and its neighbors if it started or stopped
+        # being infectious or a positive contact) are recalculated, and only their channels rescheduled.
+        # Everything is rebuilt after a parameter update.
+        # Each node-local (node, transition) pair is a reaction channel; the global interaction columns are handled
+        # as one channel per column (with the column total as its rate), since their rates change with every event,
+        # and the firing node is drawn within the column when such a channel fires.
+        # In time_in_state mode, the delayed transitions are scheduled at the fixed time (time of entering the state
+        # + delay) instead of being triggered by timer-dependent pseudo-propensities.
+        ignoreTimers = (self.transition_mode == 'time_in_state')
+        if(self.nextReactionQueue is None):
+            self.propensities, self.propensityTypes = self.calc_propensities(ignore_timers=ignoreTimers)
+            self.propensityTree     = PropensitySumTree(self.numNodes, self.propensities.shape[1])
+            self.propensityTree.build(self.propensities)
+            numColumns              = self.propensities.shape[1]
+            self.nextReactionQueue  = IndexedPriorityQueue(numColumns*self.numNodes + numColumns)
+            self.channelRates       = numpy.zeros(numColumns)
+            nodes                   = numpy.arange(self.numNodes)
+            prevPropensities        = numpy.zeros_like(self.propensities)
+            newPropensities         = self.propensities
+        elif(len(self.dirtyNodes) > 0):
+            nodes                   = numpy.unique(numpy.hstack(self.dirtyNodes))
+            prevPropensities        = self.propensities[nodes,:]
+            newPropensities         = self.calc_propensities(nodes=nodes, ignore_timers=ignoreTimers)[0]
+            changedRows, changedCols = numpy.nonzero(newPropensities != prevPropensities)
+            self.propensities[nodes,:] = newPropensities
+            self.propensityTree.update(nodes[changedRows], changedCols, newPropensities[changedRows, changedCols])
+        else:
+            nodes                   = numpy.array([], dtype=int)
+        self.dirtyNodes = []
+        self.propensityTree.set_scales(self.calc_propensity_scales())
+
+        numColumns      = self.propensities.shape[1]
+        globalColumns   = numpy.array([11, 12])
+        localColumns    = numpy.arange(11)
+        #----------------------------------------
+        # Node-local channels of the updated nodes:
+        if(len(nodes) > 0):
+            channels    = (localColumns*self.numNodes)[None,:] + nodes[:,None]
+            newRates    = newPropensities[:,localColumns]
+            prevRates   = prevPropensities[:,localColumns]
+            if(ignoreTimers):
+                delays      = self.calc_transition_delays(nodes)[:,localColumns]
+                delayed     = numpy.broadcast_to(~numpy.isnan(delays[:1,:]), delays.shape)
+                entryTimes  = self.t - self.timer_state[nodes]
+                fireTimes   = numpy.where(newRates > 0, numpy.maximum(self.t, entryTimes + delays), numpy.inf)
+                self.nextReactionQueue.update(channels[delayed], fireTimes[delayed])
+            else:
+                delayed     = numpy.zeros_like(newRates, dtype=bool)
+            changed     = ~delayed & ((newRates != prevRates) | ((newRates > 0) & (self.nextReactionQueue.time(channels) == numpy.inf)))
+            localUpdates = (channels[changed], prevRates[changed], newRates[changed])
+        else:
+            localUpdates = (numpy.zeros(0, dtype=int), numpy.zeros(0), numpy.zeros(0))
+        #----------------------------------------
+        # Aggregate channels of the global interaction columns:
+        channels        = numColumns*self.numNodes + globalColumns
+        newRates        = numpy.array([self.propensityTree.column_total(col) for col in globalColumns])
+        prevRates       = self.channelRates[globalColumns]
+        changed         = (newRates != prevRates) | ((newRates > 0) & (self.nextReactionQueue.time(channels) == numpy.inf))
+        self.channelRates[globalColumns] = newRates
+        #----------------------------------------
+        # Only the channels whose rates changed are rescheduled, all in one update of the queue:
+        self.nextReactionQueue.reschedule(numpy.concatenate([localUpdates[0], channels[changed]]),
+                                          numpy.concatenate([localUpdates[1], prevRates[changed]]),
+                                          numpy.concatenate([localUpdates[2], newRates[changed]]), self.t)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def next_reaction_step(self):
+        # Select the next event by the next reaction method (Gibson & Bruck 2000):
+        # the event is the reaction channel with the earliest putative firing time in the queue.
+        # Returns the time until the event and the node and type of the transition (None if no event can occur).
+        self.update_next_reaction_queue()
+
+        tNext, channel = self.nextReactionQueue.peek()
+
+        if(tNext == numpy.inf):
+            return (0.01, None, None)
+        if(tNext > self.tmax):
+            # (the event stays scheduled in case the run is continued)
+            return (self.tmax - self.t, None, None)
+
+        # The fired channel gets a new firing time when the queue is next updated:
+        self.nextReactionQueue.update(numpy.array([channel]), numpy.array([numpy.inf]))
+
+        numColumns = self.propensities.shape[1]
+        if(channel >= numColumns*self.numNodes):
+            # Aggregate channel of a global interaction column; draw the transitioning node within the column:
+            transitionIdx  = channel - numColumns*self.numNodes
+            transitionNode = self.propensityTree.sample_column(transitionIdx, numpy.random.rand()*self.propensityTree.column_sum(transitionIdx))
+            self.channelRates[transitionIdx] = 0
+        else:
+            transitionIdx, transitionNode = divmod(channel, self.numNodes)
+        # (the node's channels are revisited even if the transition leaves its state unchanged)
+        self.dirtyNodes.append(transitionNode)
+
+        return (tNext - self.t, transitionNode, self.propensityTypes[transitionIdx])
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def run_iteration(self):
+
+        if(self.tidx >= len(self.tseries)-1):
+            # Room has run out in the timeseries storage arrays; double the size of these arrays:
+            self.increase_data_series_length()
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Calculate propensities and compute when the next event takes place and which event it is
+        # (the next reaction engine only recalculates the propensities affected by the previous event)
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        if(self.engine == 'next_reaction'):
+            tau, transitionNode, transitionType = self.next_reaction_step()
+        else:
+            propensities, transitionTypes = self.calc_propensities()
+            tau, transitionNode, transitionType = self.gillespie_step(propensities*self.calc_propensity_scales(), transitionTypes)
+
+        self.t += tau
+        self.timer_state += tau
+
+        if(transitionType is not None):
 
             #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             # Perform updates triggered by rate propensities:
             #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
             assert(self.X[transitionNode] == self.transitions[transitionType]['currentState'] and self.X[transitionNode]!=self.F), "Assertion error: Node "+str(transitionNode)+" has unexpected current state "+str(self.X[transitionNode])+" given the intended transition of "+str(transitionType)+"."
-            self.X[transitionNode] = self.transitions[transitionType]['newState']
+            self.set_node_state(transitionNode, self.transitions[transitionType]['newState'])
 
             self.testedInCurrentState[transitionNode] = False
 
@@ -1257,14 +1835,6 @@ class SEIRSNetworkModel():
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        else:
-
-            tau = 0.01
-            self.t += tau
-            self.timer_state += tau
-
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-
         self.tidx += 1
 
         self.tseries[self.tidx]     = self.t
@@ -1287,7 +1857,7 @@ class SEIRSNetworkModel():
         self.timer_isolation[isolatedNodes] = self.timer_isolation[isolatedNodes] + tau
 
         nodesExitingIsolation = numpy.argwhere(self.timer_isolation >= self.isolationTime)
-        for isoNode in nodesExitingIsolation:
+        for isoNode in nodesExitingIsolation[:,0]:
             self.set_isolation(node=isoNode, isolate=False)
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -1702,6 +2272,8 @@ class ExtSEIRSNetworkModelVac ():
             psi_asym        Probability of positive test for infectious asymptomatic individuals
             q               Probability of isolated individuals interacting with global population
             isolation_time  Time to remain in isolation upon positive test, self-isolation, etc.
+            qu              Fraction of vaccinated individuals (0 turns vaccination off)
+            fi              Rate of vaccination (inverse of the time to immunity)
 
             initE           Initial number of exposed individuals
             initI_pre       Initial number of infectious pre-symptomatic individuals
@@ -1717,6 +2289,21 @@ class ExtSEIRSNetworkModelVac ():
             initQ_asym      Initial number of isolated infectious asymptomatic individuals
             initQ_R         Initial number of isolated recovered individuals
                             (all remaining nodes initialized susceptible)
+
+            engine          Stochastic simulation algorithm: 'gillespie' (direct method), 'next_reaction' (Gibson-Bruck),
+                            'tau_leap' (approximate, for ensembles), 'daily' (approximate, chain-binomial steps of daily_dt days)
+                            or 'hybrid' (gillespie while few are infected, hybrid_engine otherwise);
+                            may also be chosen per call of run(). The engine that took each step is recorded in engineSeries.
+                            Both exact engines give the same trajectories in distribution, but 'gillespie' is the faster
+                            one (about 1.4x over 'next_reaction' at N=1500, mean degree 10), since the next reaction
+                            queue must also reschedule the channels of the global rates (see update_next_reaction_queue).
+            tau_leap_epsilon  Bound on the relative change of compartment sizes within one leap (tau_leap engine)
+            daily_dt        Length of the steps of the daily engine (in days; longer steps are faster but biased, see daily_step)
+            hybrid_threshold  Number of infected individuals from which the hybrid engine leaves exact simulation
+                            (it returns to it once the number falls below half the threshold)
+            hybrid_engine   Approximate engine used by the hybrid engine above the threshold: 'tau_leap' (default) or 'daily'
+            init_X          Initial node states (numNodes x 1 array of state values), adopted as is instead of placing
+                            the initial numbers of individuals at random (the init counts must match it, see from_model)
     """
     def __init__(self, G, beta, sigma, lamda, gamma,
                     gamma_asym=None, eta=0, gamma_H=None, mu_H=0, alpha=1.0, xi=0, mu_0=0, nu=0, a=0, h=0, f=0, p=0,
@@ -1726,8 +2313,9 @@ class ExtSEIRSNetworkModelVac ():
                     psi_S=0, psi_E=1, psi_pre=1, psi_sym=1, psi_asym=1, q=0, isolation_time=14,
                     initE=0, initI_pre=0, initI_sym=0, initI_asym=0, initH=0, initR=0, initF=0,
                     initQ_S=0, initQ_E=0, initQ_pre=0, initQ_sym=0, initQ_asym=0, initQ_R=0,
-                    o=0, prevalence_ext=0,
-                    transition_mode='exponential_rates', node_groups=None, store_Xseries=False, seed=None):
+                    o=0, prevalence_ext=0, qu=0.63, fi=1/40,
+                    transition_mode='exponential_rates', node_groups=None, store_Xseries=False, seed=None, engine='gillespie', tau_leap_epsilon=0.03,
+                    daily_dt=0.25, hybrid_threshold=100, hybrid_engine='tau_leap', init_X=None):
 
         if(seed is not None):
             numpy.random.seed(seed)
@@ -1751,7 +2339,7 @@ class ExtSEIRSNetworkModelVac ():
                             'initH':initH, 'initR':initR, 'initF':initF,
                             'initQ_S':initQ_S, 'initQ_E':initQ_E, 'initQ_pre':initQ_pre,
                             'initQ_sym':initQ_sym, 'initQ_asym':initQ_asym, 'initQ_R':initQ_R,
-                            'o':o, 'prevalence_ext':prevalence_ext}
+                            'o':o, 'prevalence_ext':prevalence_ext, 'qu':qu, 'fi':fi}
         self.update_parameters()
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -1783,10 +2371,14 @@ class ExtSEIRSNetworkModelVac ():
         self.tidx       = 0
         self.tseries[0] = 0
 
-        # Vectors holding the time that each node has been in a given state or in isolation:
-        self.timer_state     = numpy.zeros((self.numNodes,1))
-        self.timer_isolation = numpy.zeros(self.numNodes)
-        self.isolationTime   = isolation_time
+        # Engine that took each step (the initial state is attributed to the engine the run starts with):
+        self.engineSeries = numpy.full(6*self.numNodes, '', dtype='<U13')
+
+        # Vectors holding the time at which each node entered its current state and its current isolation
+        # (inf if not isolated); the time spent in a state or in isolation is derived from the current time:
+        self.stateEntryTime     = numpy.zeros((self.numNodes,1))
+        self.isolationEntryTime = numpy.full(self.numNodes, numpy.inf)
+        self.isolationTime      = isolation_time
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         # Initialize Counts of inidividuals with each state:
@@ -1826,14 +2418,26 @@ class ExtSEIRSNetworkModelVac ():
         self.Q_asym     = 15
         self.Q_R        = 17
 
-        self.X = numpy.array( [self.S]*int(self.numS[0]) + [self.E]*int(self.numE[0])
-                               + [self.I_pre]*int(self.numI_pre[0]) + [self.I_sym]*int(self.numI_sym[0]) + [self.I_asym]*int(self.numI_asym[0])
-                               + [self.H]*int(self.numH[0]) + [self.R]*int(self.numR[0]) + [self.F]*int(self.numF[0])
-                               + [self.Q_S]*int(self.numQ_S[0]) + [self.Q_E]*int(self.numQ_E[0])
-                               + [self.Q_pre]*int(self.numQ_pre[0]) + [self.Q_sym]*int(self.numQ_sym[0]) + [self.Q_asym]*int(self.numQ_asym[0])
-                               + [self.Q_R]*int(self.numQ_R[0])
-                            ).reshape((self.numNodes,1))
-        numpy.random.shuffle(self.X)
+        if(init_X is not None):
+            self.X = init_X
+        else:
+            self.X = numpy.array( [self.S]*int(self.numS[0]) + [self.E]*int(self.numE[0])
+                                   + [self.I_pre]*int(self.numI_pre[0]) + [self.I_sym]*int(self.numI_sym[0]) + [self.I_asym]*int(self.numI_asym[0])
+                                   + [self.H]*int(self.numH[0]) + [self.R]*int(self.numR[0]) + [self.F]*int(self.numF[0])
+                                   + [self.Q_S]*int(self.numQ_S[0]) + [self.Q_E]*int(self.numQ_E[0])
+                                   + [self.Q_pre]*int(self.numQ_pre[0]) + [self.Q_sym]*int(self.numQ_sym[0]) + [self.Q_asym]*int(self.numQ_asym[0])
+                                   + [self.Q_R]*int(self.numQ_R[0])
+                                ).reshape((self.numNodes,1))
+            numpy.random.shuffle(self.X)
+
+        # Running counts of nodes in each state (indexed by state value), updated as nodes change state:
+        self.stateCounts = numpy.bincount(self.X[:,0], minlength=self.Q_R+1)
+
+        self.isolatedStates = (self.Q_S, self.Q_E, self.Q_pre, self.Q_sym, self.Q_asym, self.Q_R)
+        self.isolationEntryTime[numpy.isin(self.X[:,0], self.isolatedStates)] = 0
+
+        # Min-heap of (isolation entry time, node), from which nodes are released once their isolation time is up:
+        self.isolationQueue = [(0, node) for node in numpy.flatnonzero(self.isolationEntryTime == 0)]
 
         self.store_Xseries = store_Xseries
         if(store_Xseries):
@@ -1872,8 +2476,29 @@ class ExtSEIRSNetworkModelVac ():
                                 '_toS':         {'currentState':True,         'newState':self.S},
                             }
 
+        # Node states that exert infection pressure on neighbors, by the transmission term they contribute to:
+        self.infectiousClass = { self.I_sym:1, self.I_pre:2, self.I_asym:2, self.Q_pre:3, self.Q_sym:3, self.Q_asym:3 }
+
         self.transition_mode = transition_mode
 
+        # Stochastic simulation algorithm ('gillespie' direct method, 'next_reaction' method, 'tau_leap', 'daily' or 'hybrid'):
+        self.engine = engine
+        assert(self.engine in ['gillespie', 'next_reaction', 'tau_leap', 'daily', 'hybrid']), "Unknown simulation engine "+str(self.engine)+"."
+        self.tau_leap_epsilon = tau_leap_epsilon
+        self.daily_dt = daily_dt
+        self.hybrid_threshold = hybrid_threshold
+        self.hybrid_engine = hybrid_engine
+        assert(self.hybrid_engine in ['tau_leap', 'daily']), "Unknown approximate engine "+str(self.hybrid_engine)+" for the hybrid engine."
+        # Engine taking the steps at present (the hybrid engine switches between gillespie and hybrid_engine):
+        self.activeEngine = 'gillespie' if self.engine == 'hybrid' else self.engine
+        self.engineSeries[0] = self.activeEngine
+
+        # Time of the next scheduled parameter change (checkpoint), which leaps must not step over:
+        self.nextCheckpointTime = numpy.inf
+
+        # Columns of the propensity matrix for global interactions, which are scaled by the current infectious counts:
+        self.globalPropensityColumns = list(range(26, 32))
+
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         # Initialize other node metadata:
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -1882,6 +2507,10 @@ class ExtSEIRSNetworkModelVac ():
         self.numTested   = numpy.zeros(6*self.numNodes)
         self.numPositive = numpy.zeros(6*self.numNodes)
 
+        # Running counts of tested and positive nodes:
+        self.testedCount   = 0
+        self.positiveCount = 0
+
         self.testedInCurrentState = numpy.array([False]*self.numNodes).reshape((self.numNodes,1))
 
         self.infectionsLog = []
@@ -1933,275 +2562,140 @@ class ExtSEIRSNetworkModelVac ():
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
     def update_parameters(self):
+        # Build the parameter data structures for the current parameter values and swap them in
+        # (only the structures that depend on parameters changed since the last update are rebuilt):
+        self.set_parameter_bundle(ExtSEIRSParameterBundle(self.parameters, base=getattr(self, 'parameterBundle', None)))
 
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        # Model graphs:
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        self.G = self.parameters['G']
-        # Adjacency matrix:
-        if type(self.G)==numpy.ndarray:
-            self.A = scipy.sparse.csr_matrix(self.G)
-        elif type(self.G)==networkx.classes.graph.Graph:
-            self.A = networkx.adj_matrix(self.G) # adj_matrix gives scipy.sparse csr_matrix
-        else:
-            raise BaseException("Input an adjacency matrix or networkx object only.")
-        self.numNodes   = int(self.A.shape[1])
-        self.degree     = numpy.asarray(self.node_degrees(self.A)).astype(float)
-        #----------------------------------------
-        if(self.parameters['G_Q'] is None):
-            self.G_Q = self.G # If no Q graph is provided, use G in its place
-        else:
-            self.G_Q = self.parameters['G_Q']
-        # Quarantine Adjacency matrix:
-        if type(self.G_Q)==numpy.ndarray:
-            self.A_Q = scipy.sparse.csr_matrix(self.G_Q)
-        elif type(self.G_Q)==networkx.classes.graph.Graph:
-            self.A_Q = networkx.adj_matrix(self.G_Q) # adj_matrix gives scipy.sparse csr_matrix
-        else:
-            raise BaseException("Input an adjacency matrix or networkx object only.")
-        self.numNodes_Q   = int(self.A_Q.shape[1])
-        self.degree_Q     = numpy.asarray(self.node_degrees(self.A_Q)).astype(float)
-        #----------------------------------------
-        assert(self.numNodes == self.numNodes_Q), "The normal and quarantine adjacency graphs must be of the same size."
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        # Model parameters:
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        self.beta           = numpy.array(self.parameters['beta']).reshape((self.numNodes, 1))          if isinstance(self.parameters['beta'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['beta'], shape=(self.numNodes,1))
-        self.beta_asym      = (numpy.array(self.parameters['beta_asym']).reshape((self.numNodes, 1))    if isinstance(self.parameters['beta_asym'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['beta_asym'], shape=(self.numNodes,1))) if self.parameters['beta_asym'] is not None else self.beta
-        self.sigma          = numpy.array(self.parameters['sigma']).reshape((self.numNodes, 1))         if isinstance(self.parameters['sigma'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['sigma'], shape=(self.numNodes,1))
-        self.lamda          = numpy.array(self.parameters['lamda']).reshape((self.numNodes, 1))         if isinstance(self.parameters['lamda'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['lamda'], shape=(self.numNodes,1))
-        self.gamma          = numpy.array(self.parameters['gamma']).reshape((self.numNodes, 1))         if isinstance(self.parameters['gamma'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['gamma'], shape=(self.numNodes,1))
-        self.eta            = numpy.array(self.parameters['eta']).reshape((self.numNodes, 1))           if isinstance(self.parameters['eta'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['eta'], shape=(self.numNodes,1))
-        self.gamma_asym     = (numpy.array(self.parameters['gamma_asym']).reshape((self.numNodes, 1))   if isinstance(self.parameters['gamma_asym'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['gamma_asym'], shape=(self.numNodes,1))) if self.parameters['gamma_asym'] is not None else self.gamma
-        self.gamma_H        = (numpy.array(self.parameters['gamma_H']).reshape((self.numNodes, 1))      if isinstance(self.parameters['gamma_H'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['gamma_H'], shape=(self.numNodes,1))) if self.parameters['gamma_H'] is not None else self.gamma
-        self.mu_H           = numpy.array(self.parameters['mu_H']).reshape((self.numNodes, 1))          if isinstance(self.parameters['mu_H'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['mu_H'], shape=(self.numNodes,1))
-        self.alpha          = numpy.array(self.parameters['alpha']).reshape((self.numNodes, 1))         if isinstance(self.parameters['alpha'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['alpha'], shape=(self.numNodes,1))
-        self.xi             = numpy.array(self.parameters['xi']).reshape((self.numNodes, 1))            if isinstance(self.parameters['xi'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['xi'], shape=(self.numNodes,1))
-        self.mu_0           = numpy.array(self.parameters['mu_0']).reshape((self.numNodes, 1))          if isinstance(self.parameters['mu_0'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['mu_0'], shape=(self.numNodes,1))
-        self.nu             = numpy.array(self.parameters['nu']).reshape((self.numNodes, 1))            if isinstance(self.parameters['nu'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['nu'], shape=(self.numNodes,1))
-        self.a              = numpy.array(self.parameters['a']).reshape((self.numNodes, 1))             if isinstance(self.parameters['a'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['a'], shape=(self.numNodes,1))
-        self.h              = numpy.array(self.parameters['h']).reshape((self.numNodes, 1))             if isinstance(self.parameters['h'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['h'], shape=(self.numNodes,1))
-        self.f              = numpy.array(self.parameters['f']).reshape((self.numNodes, 1))             if isinstance(self.parameters['f'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['f'], shape=(self.numNodes,1))
-        self.p              = numpy.array(self.parameters['p']).reshape((self.numNodes, 1))             if isinstance(self.parameters['p'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['p'], shape=(self.numNodes,1))
-        self.o              = numpy.array(self.parameters['o']).reshape((self.numNodes, 1))             if isinstance(self.parameters['o'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['o'], shape=(self.numNodes,1))
+    def set_parameter_bundle(self, bundle):
+        # Swap in the parameter data structures of a (prebuilt) ExtSEIRSParameterBundle by reference.
+        # The bundle itself is never modified, so the same bundle may be set on any number of models.
+        for attr, value in bundle.__dict__.items():
+            if(attr != 'parameters'):
+                setattr(self, attr, value)
+        self.parameters      = dict(bundle.parameters)
+        self.parameterBundle = bundle
 
-        self.rand_a = numpy.random.rand(self.a.shape[0], self.a.shape[1])
-        self.rand_h = numpy.random.rand(self.h.shape[0], self.h.shape[1])
-        self.rand_f = numpy.random.rand(self.f.shape[0], self.f.shape[1])
+        # Outcome draws are specific to each model (replicate), and are kept over parameter updates:
+        if(getattr(self, 'rand_a', None) is None or self.rand_a.shape != self.a.shape):
+            self.rand_a = numpy.random.rand(self.a.shape[0], self.a.shape[1])
+            self.rand_h = numpy.random.rand(self.h.shape[0], self.h.shape[1])
+            self.rand_f = numpy.random.rand(self.f.shape[0], self.f.shape[1])
 
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        # External infection introduction variables:
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        self.prevalence_ext     = numpy.array(self.parameters['prevalence_ext']).reshape((self.numNodes, 1)) if isinstance(self.parameters['prevalence_ext'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['prevalence_ext'], shape=(self.numNodes,1))
 
-        #----------------------------------------
-        # Testing-related parameters:
-        #----------------------------------------
-        self.beta_Q         = (numpy.array(self.parameters['beta_Q']).reshape((self.numNodes, 1))       if isinstance(self.parameters['beta_Q'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['beta_Q'], shape=(self.numNodes,1))) if self.parameters['beta_Q'] is not None else self.beta
-        self.sigma_Q        = (numpy.array(self.parameters['sigma_Q']).reshape((self.numNodes, 1))      if isinstance(self.parameters['sigma_Q'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['sigma_Q'], shape=(self.numNodes,1))) if self.parameters['sigma_Q'] is not None else self.sigma
-        self.lamda_Q        = (numpy.array(self.parameters['lamda_Q']).reshape((self.numNodes, 1))      if isinstance(self.parameters['lamda_Q'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['lamda_Q'], shape=(self.numNodes,1))) if self.parameters['lamda_Q'] is not None else self.lamda
-        self.gamma_Q_sym    = (numpy.array(self.parameters['gamma_Q_sym']).reshape((self.numNodes, 1))  if isinstance(self.parameters['gamma_Q_sym'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['gamma_Q_sym'], shape=(self.numNodes,1))) if self.parameters['gamma_Q_sym'] is not None else self.gamma
-        self.gamma_Q_asym   = (numpy.array(self.parameters['gamma_Q_asym']).reshape((self.numNodes, 1)) if isinstance(self.parameters['gamma_Q_asym'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['gamma_Q_asym'], shape=(self.numNodes,1))) if self.parameters['gamma_Q_asym'] is not None else self.gamma
-        self.eta_Q          = (numpy.array(self.parameters['eta_Q']).reshape((self.numNodes, 1))        if isinstance(self.parameters['eta_Q'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['eta_Q'], shape=(self.numNodes,1))) if self.parameters['eta_Q'] is not None else self.eta
-        self.alpha_Q        = (numpy.array(self.parameters['alpha_Q']).reshape((self.numNodes, 1))      if isinstance(self.parameters['alpha_Q'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['alpha_Q'], shape=(self.numNodes,1))) if self.parameters['alpha_Q'] is not None else self.alpha
-        self.theta_S        = numpy.array(self.parameters['theta_S']).reshape((self.numNodes, 1))       if isinstance(self.parameters['theta_S'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['theta_S'], shape=(self.numNodes,1))
-        self.theta_E        = numpy.array(self.parameters['theta_E']).reshape((self.numNodes, 1))       if isinstance(self.parameters['theta_E'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['theta_E'], shape=(self.numNodes,1))
-        self.theta_pre      = numpy.array(self.parameters['theta_pre']).reshape((self.numNodes, 1))     if isinstance(self.parameters['theta_pre'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['theta_pre'], shape=(self.numNodes,1))
-        self.theta_sym      = numpy.array(self.parameters['theta_sym']).reshape((self.numNodes, 1))     if isinstance(self.parameters['theta_sym'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['theta_sym'], shape=(self.numNodes,1))
-        self.theta_asym     = numpy.array(self.parameters['theta_asym']).reshape((self.numNodes, 1))    if isinstance(self.parameters['theta_asym'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['theta_asym'], shape=(self.numNodes,1))
-        self.phi_S          = numpy.array(self.parameters['phi_S']).reshape((self.numNodes, 1))         if isinstance(self.parameters['phi_S'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['phi_S'], shape=(self.numNodes,1))
-        self.phi_E          = numpy.array(self.parameters['phi_E']).reshape((self.numNodes, 1))         if isinstance(self.parameters['phi_E'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['phi_E'], shape=(self.numNodes,1))
-        self.phi_pre        = numpy.array(self.parameters['phi_pre']).reshape((self.numNodes, 1))       if isinstance(self.parameters['phi_pre'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['phi_pre'], shape=(self.numNodes,1))
-        self.phi_sym        = numpy.array(self.parameters['phi_sym']).reshape((self.numNodes, 1))       if isinstance(self.parameters['phi_sym'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['phi_sym'], shape=(self.numNodes,1))
-        self.phi_asym       = numpy.array(self.parameters['phi_asym']).reshape((self.numNodes, 1))      if isinstance(self.parameters['phi_asym'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['phi_asym'], shape=(self.numNodes,1))
-        self.psi_S            = numpy.array(self.parameters['psi_S']).reshape((self.numNodes, 1))           if isinstance(self.parameters['psi_S'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['psi_S'], shape=(self.numNodes,1))
-        self.psi_E            = numpy.array(self.parameters['psi_E']).reshape((self.numNodes, 1))           if isinstance(self.parameters['psi_E'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['psi_E'], shape=(self.numNodes,1))
-        self.psi_pre          = numpy.array(self.parameters['psi_pre']).reshape((self.numNodes, 1))         if isinstance(self.parameters['psi_pre'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['psi_pre'], shape=(self.numNodes,1))
-        self.psi_sym          = numpy.array(self.parameters['psi_sym']).reshape((self.numNodes, 1))         if isinstance(self.parameters['psi_sym'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['psi_sym'], shape=(self.numNodes,1))
-        self.psi_asym         = numpy.array(self.parameters['psi_asym']).reshape((self.numNodes, 1))        if isinstance(self.parameters['psi_asym'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['psi_asym'], shape=(self.numNodes,1))
-        self.q              = numpy.array(self.parameters['q']).reshape((self.numNodes, 1))             if isinstance(self.parameters['q'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['q'], shape=(self.numNodes,1))
+        # Propensities (and next reaction times, and transmission terms) must be fully recalculated with the updated parameters:
+        self.propensities         = None
+        self.nextReactionQueue    = None
+        self.timerQueue           = None
+        self.transmissionTerms_I  = None
+        self.transmissionTerms_Q  = None
+        self.transmissionTerms_IQ = None
+        self.dirtyNodes           = []
 
-        #----------------------------------------
-
-        self.beta_pairwise_mode = self.parameters['beta_pairwise_mode']
 
-        #----------------------------------------
-        # Global transmission parameters:
-        #----------------------------------------
-        if(self.beta_pairwise_mode == 'infected' or self.beta_pairwise_mode is None):
-            self.beta_global         = numpy.full_like(self.beta, fill_value=numpy.mean(self.beta))
-            self.beta_Q_global       = numpy.full_like(self.beta_Q, fill_value=numpy.mean(self.beta_Q))
-            self.beta_asym_global    = numpy.full_like(self.beta_asym, fill_value=numpy.mean(self.beta_asym))
-        elif(self.beta_pairwise_mode == 'infectee'):
-            self.beta_global         = self.beta
-            self.beta_Q_global       = self.beta_Q
-            self.beta_asym_global    = self.beta_asym
-        elif(self.beta_pairwise_mode == 'min'):
-            self.beta_global         = numpy.minimum(self.beta, numpy.mean(beta))
-            self.beta_Q_global       = numpy.minimum(self.beta_Q, numpy.mean(beta_Q))
-            self.beta_asym_global    = numpy.minimum(self.beta_asym, numpy.mean(beta_asym))
-        elif(self.beta_pairwise_mode == 'max'):
-            self.beta_global         = numpy.maximum(self.beta, numpy.mean(beta))
-            self.beta_Q_global       = numpy.maximum(self.beta_Q, numpy.mean(beta_Q))
-            self.beta_asym_global    = numpy.maximum(self.beta_asym, numpy.mean(beta_asym))
-        elif(self.beta_pairwise_mode == 'mean'):
-            self.beta_global         = (self.beta + numpy.full_like(self.beta, fill_value=numpy.mean(self.beta)))/2
-            self.beta_Q_global       = (self.beta_Q + numpy.full_like(self.beta_Q, fill_value=numpy.mean(self.beta_Q)))/2
-            self.beta_asym_global    = (self.beta_asym + numpy.full_like(self.beta_asym, fill_value=numpy.mean(self.beta_asym)))/2
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-        #----------------------------------------
-        # Local transmission parameters:
-        #----------------------------------------
-        self.beta_local         = self.beta      if self.parameters['beta_local'] is None      else numpy.array(self.parameters['beta_local'])      if isinstance(self.parameters['beta_local'], (list, numpy.ndarray))      else numpy.full(fill_value=self.parameters['beta_local'], shape=(self.numNodes,1))
-        self.beta_Q_local       = self.beta_Q    if self.parameters['beta_Q_local'] is None    else numpy.array(self.parameters['beta_Q_local'])    if isinstance(self.parameters['beta_Q_local'], (list, numpy.ndarray))    else numpy.full(fill_value=self.parameters['beta_Q_local'], shape=(self.numNodes,1))
-        self.beta_asym_local    = None           if self.parameters['beta_asym_local'] is None else numpy.array(self.parameters['beta_asym_local']) if isinstance(self.parameters['beta_asym_local'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['beta_asym_local'], shape=(self.numNodes,1))
-        #----------------------------------------
-        if(self.beta_local.ndim == 2 and self.beta_local.shape[0] == self.numNodes and self.beta_local.shape[1] == self.numNodes):
-            self.A_beta_pairwise = self.beta_local
-        elif((self.beta_local.ndim == 1 and self.beta_local.shape[0] == self.numNodes) or (self.beta_local.ndim == 2 and (self.beta_local.shape[0] == self.numNodes or self.beta_local.shape[1] == self.numNodes))):
-            self.beta_local = self.beta_local.reshape((self.numNodes,1))
-            # Pre-multiply beta values by the adjacency matrix ("transmission weight connections")
-            A_beta_pairwise_byInfected = scipy.sparse.csr_matrix.multiply(self.A, self.beta_local.T).tocsr()
-            A_beta_pairwise_byInfectee = scipy.sparse.csr_matrix.multiply(self.A, self.beta_local).tocsr()
-            #------------------------------
-            # Compute the effective pairwise beta values as a function of the infected/infectee pair:
-            if(self.beta_pairwise_mode == 'infected'):
-                self.A_beta_pairwise = A_beta_pairwise_byInfected
-            elif(self.beta_pairwise_mode == 'infectee'):
-                self.A_beta_pairwise = A_beta_pairwise_byInfectee
-            elif(self.beta_pairwise_mode == 'min'):
-                self.A_beta_pairwise = scipy.sparse.csr_matrix.minimum(A_beta_pairwise_byInfected, A_beta_pairwise_byInfectee)
-            elif(self.beta_pairwise_mode == 'max'):
-                self.A_beta_pairwise = scipy.sparse.csr_matrix.maximum(A_beta_pairwise_byInfected, A_beta_pairwise_byInfectee)
-            elif(self.beta_pairwise_mode == 'mean' or self.beta_pairwise_mode is None):
-                self.A_beta_pairwise = (A_beta_pairwise_byInfected + A_beta_pairwise_byInfectee)/2
-            else:
-                print("Unrecognized beta_pairwise_mode value (support for 'infected', 'infectee', 'min', 'max', and 'mean').")
-        else:
-            print("Invalid values given for beta_local (expected 1xN list/array or NxN 2d array)")
-        #----------------------------------------
-        if(self.beta_Q_local.ndim == 2 and self.beta_Q_local.shape[0] == self.numNodes and self.beta_Q_local.shape[1] == self.numNodes):
-            self.A_Q_beta_Q_pairwise = self.beta_Q_local
-        elif((self.beta_Q_local.ndim == 1 and self.beta_Q_local.shape[0] == self.numNodes) or (self.beta_Q_local.ndim == 2 and (self.beta_Q_local.shape[0] == self.numNodes or self.beta_Q_local.shape[1] == self.numNodes))):
-            self.beta_Q_local = self.beta_Q_local.reshape((self.numNodes,1))
-            # Pre-multiply beta_Q values by the isolation adjacency matrix ("transmission weight connections")
-            A_Q_beta_Q_pairwise_byInfected      = scipy.sparse.csr_matrix.multiply(self.A_Q, self.beta_Q_local.T).tocsr()
-            A_Q_beta_Q_pairwise_byInfectee      = scipy.sparse.csr_matrix.multiply(self.A_Q, self.beta_Q_local).tocsr()
-            #------------------------------
-            # Compute the effective pairwise beta values as a function of the infected/infectee pair:
-            if(self.beta_pairwise_mode == 'infected'):
-                self.A_Q_beta_Q_pairwise = A_Q_beta_Q_pairwise_byInfected
-            elif(self.beta_pairwise_mode == 'infectee'):
-                self.A_Q_beta_Q_pairwise = A_Q_beta_Q_pairwise_byInfectee
-            elif(self.beta_pairwise_mode == 'min'):
-                self.A_Q_beta_Q_pairwise = scipy.sparse.csr_matrix.minimum(A_Q_beta_Q_pairwise_byInfected, A_Q_beta_Q_pairwise_byInfectee)
-            elif(self.beta_pairwise_mode == 'max'):
-                self.A_Q_beta_Q_pairwise = scipy.sparse.csr_matrix.maximum(A_Q_beta_Q_pairwise_byInfected, A_Q_beta_Q_pairwise_byInfectee)
-            elif(self.beta_pairwise_mode == 'mean' or self.beta_pairwise_mode is None):
-                self.A_Q_beta_Q_pairwise = (A_Q_beta_Q_pairwise_byInfected + A_Q_beta_Q_pairwise_byInfectee)/2
-            else:
-                print("Unrecognized beta_pairwise_mode value (support for 'infected', 'infectee', 'min', 'max', and 'mean').")
-        else:
-            print("Invalid values given for beta_Q_local (expected 1xN list/array or NxN 2d array)")
-        #----------------------------------------
-        if(self.beta_asym_local is None):
-            self.A_beta_asym_pairwise = None
-        elif(self.beta_asym_local.ndim == 2 and self.beta_asym_local.shape[0] == self.numNodes and self.beta_asym_local.shape[1] == self.numNodes):
-            self.A_beta_asym_pairwise = self.beta_asym_local
-        elif((self.beta_asym_local.ndim == 1 and self.beta_asym_local.shape[0] == self.numNodes) or (self.beta_asym_local.ndim == 2 and (self.beta_asym_local.shape[0] == self.numNodes or self.beta_asym_local.shape[1] == self.numNodes))):
-            self.beta_asym_local = self.beta_asym_local.reshape((self.numNodes,1))
-            # Pre-multiply beta_asym values by the adjacency matrix ("transmission weight connections")
-            A_beta_asym_pairwise_byInfected      = scipy.sparse.csr_matrix.multiply(self.A, self.beta_asym_local.T).tocsr()
-            A_beta_asym_pairwise_byInfectee      = scipy.sparse.csr_matrix.multiply(self.A, self.beta_asym_local).tocsr()
-            #------------------------------
-            # Compute the effective pairwise beta values as a function of the infected/infectee pair:
-            if(self.beta_pairwise_mode == 'infected'):
-                self.A_beta_asym_pairwise = A_beta_asym_pairwise_byInfected
-            elif(self.beta_pairwise_mode == 'infectee'):
-                self.A_beta_asym_pairwise = A_beta_asym_pairwise_byInfectee
-            elif(self.beta_pairwise_mode == 'min'):
-                self.A_beta_asym_pairwise = scipy.sparse.csr_matrix.minimum(A_beta_asym_pairwise_byInfected, A_beta_asym_pairwise_byInfectee)
-            elif(self.beta_pairwise_mode == 'max'):
-                self.A_beta_asym_pairwise = scipy.sparse.csr_matrix.maximum(A_beta_asym_pairwise_byInfected, A_beta_asym_pairwise_byInfectee)
-            elif(self.beta_pairwise_mode == 'mean' or self.beta_pairwise_mode is None):
-                self.A_beta_asym_pairwise = (A_beta_asym_pairwise_byInfected + A_beta_asym_pairwise_byInfectee)/2
+    def compile_checkpoints(self, checkpoints, bundle_cache=None, cache_keys=None):
+        # Build the parameter bundles of all checkpoints once, ahead of the run. Parameters not given for a checkpoint
+        # keep the value they have at the preceding checkpoint (or the model's current value), as when the checkpoint
+        # values are applied during the run. The returned checkpoints dict (times and bundles) can be passed to run()
+        # of this and any other model over the same network, switching parameters at each checkpoint by reference.
+        # With a bundle_cache dict, the bundle of each checkpoint is stored in it under the corresponding entry of
+        # cache_keys (one hashable key per checkpoint that identifies the parameter values in effect, e.g. by the names
+        # of the values) and taken from it if already built, so that checkpoint configurations shared by several runs
+        # (e.g. the scenarios branching off a common model) are only built once.
+        # Each bundle is built from the bundle of the preceding checkpoint, rebuilding only what the checkpoint changes.
+        assert(bundle_cache is None or (cache_keys is not None and len(cache_keys) == len(checkpoints['t']))), "A bundle cache requires one cache key per checkpoint."
+        numCheckpoints = len(checkpoints['t'])
+        parameters     = dict(self.parameters)
+        bundle         = getattr(self, 'parameterBundle', None)
+        bundles        = []
+        for checkpointIdx in range(numCheckpoints):
+            for param in list(parameters.keys()):
+                if(param in list(checkpoints.keys())):
+                    parameters.update({param: checkpoints[param][checkpointIdx]})
+            if(bundle_cache is not None and cache_keys[checkpointIdx] in bundle_cache):
+                bundle = bundle_cache[cache_keys[checkpointIdx]]
             else:
-                print("Unrecognized beta_pairwise_mode value (support for 'infected', 'infectee', 'min', 'max', and 'mean').")
-        else:
-            print("Invalid values given for beta_asym_local (expected 1xN list/array or NxN 2d array)")
+                bundle = ExtSEIRSParameterBundle(parameters, base=bundle)
+                if(bundle_cache is not None):
+                    bundle_cache[cache_keys[checkpointIdx]] = bundle
+            bundles.append(bundle)
+        return {'t': list(checkpoints['t']), 'bundles': bundles}
 
-        #----------------------------------------
-        # Degree-based transmission scaling parameters:
-        #----------------------------------------
-        self.delta_pairwise_mode = self.parameters['delta_pairwise_mode']
-        with numpy.errstate(divide='ignore'): # ignore log(0) warning, then convert log(0) = -inf -> 0.0
-            self.delta               = numpy.log(self.degree)/numpy.log(numpy.mean(self.degree))     if self.parameters['delta'] is None   else numpy.array(self.parameters['delta'])   if isinstance(self.parameters['delta'], (list, numpy.ndarray))   else numpy.full(fill_value=self.parameters['delta'], shape=(self.numNodes,1))
-            self.delta_Q             = numpy.log(self.degree_Q)/numpy.log(numpy.mean(self.degree_Q)) if self.parameters['delta_Q'] is None else numpy.array(self.parameters['delta_Q']) if isinstance(self.parameters['delta_Q'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['delta_Q'], shape=(self.numNodes,1))
-        self.delta[numpy.isneginf(self.delta)] = 0.0
-        self.delta_Q[numpy.isneginf(self.delta_Q)] = 0.0
-        #----------------------------------------
-        if(self.delta.ndim == 2 and self.delta.shape[0] == self.numNodes and self.delta.shape[1] == self.numNodes):
-            self.A_delta_pairwise = self.delta
-        elif((self.delta.ndim == 1 and self.delta.shape[0] == self.numNodes) or (self.delta.ndim == 2 and (self.delta.shape[0] == self.numNodes or self.delta.shape[1] == self.numNodes))):
-            self.delta = self.delta.reshape((self.numNodes,1))
-            # Pre-multiply delta values by the adjacency matrix ("transmission weight connections")
-            A_delta_pairwise_byInfected = scipy.sparse.csr_matrix.multiply(self.A, self.delta.T).tocsr()
-            A_delta_pairwise_byInfectee = scipy.sparse.csr_matrix.multiply(self.A, self.delta).tocsr()
-            #------------------------------
-            # Compute the effective pairwise delta values as a function of the infected/infectee pair:
-            if(self.delta_pairwise_mode == 'infected'):
-                self.A_delta_pairwise = A_delta_pairwise_byInfected
-            elif(self.delta_pairwise_mode == 'infectee'):
-                self.A_delta_pairwise = A_delta_pairwise_byInfectee
-            elif(self.delta_pairwise_mode == 'min'):
-                self.A_delta_pairwise = scipy.sparse.csr_matrix.minimum(A_delta_pairwise_byInfected, A_delta_pairwise_byInfectee)
-            elif(self.delta_pairwise_mode == 'max'):
-                self.A_delta_pairwise = scipy.sparse.csr_matrix.maximum(A_delta_pairwise_byInfected, A_delta_pairwise_byInfectee)
-            elif(self.delta_pairwise_mode == 'mean'):
-                self.A_delta_pairwise = (A_delta_pairwise_byInfected + A_delta_pairwise_byInfectee)/2
-            elif(self.delta_pairwise_mode is None):
-                self.A_delta_pairwise = self.A
-            else:
-                print("Unrecognized delta_pairwise_mode value (support for 'infected', 'infectee', 'min', 'max', and 'mean').")
-        else:
-            print("Invalid values given for delta (expected 1xN list/array or NxN 2d array)")
-        #----------------------------------------
-        if(self.delta_Q.ndim == 2 and self.delta_Q.shape[0] == self.numNodes and self.delta_Q.shape[1] == self.numNodes):
-            self.A_Q_delta_Q_pairwise = self.delta_Q
-        elif((self.delta_Q.ndim == 1 and self.delta_Q.shape[0] == self.numNodes) or (self.delta_Q.ndim == 2 and (self.delta_Q.shape[0] == self.numNodes or self.delta_Q.shape[1] == self.numNodes))):
-            self.delta_Q = self.delta_Q.reshape((self.numNodes,1))
-            # Pre-multiply delta_Q values by the isolation adjacency matrix ("transmission weight connections")
-            A_Q_delta_Q_pairwise_byInfected      = scipy.sparse.csr_matrix.multiply(self.A_Q, self.delta_Q).tocsr()
-            A_Q_delta_Q_pairwise_byInfectee      = scipy.sparse.csr_matrix.multiply(self.A_Q, self.delta_Q.T).tocsr()
-            #------------------------------
-            # Compute the effective pairwise delta values as a function of the infected/infectee pair:
-            if(self.delta_pairwise_mode == 'infected'):
-                self.A_Q_delta_Q_pairwise = A_Q_delta_Q_pairwise_byInfected
-            elif(self.delta_pairwise_mode == 'infectee'):
-                self.A_Q_delta_Q_pairwise = A_Q_delta_Q_pairwise_byInfectee
-            elif(self.delta_pairwise_mode == 'min'):
-                self.A_Q_delta_Q_pairwise = scipy.sparse.csr_matrix.minimum(A_Q_delta_Q_pairwise_byInfected, A_Q_delta_Q_pairwise_byInfectee)
-            elif(self.delta_pairwise_mode == 'max'):
-                self.A_Q_delta_Q_pairwise = scipy.sparse.csr_matrix.maximum(A_Q_delta_Q_pairwise_byInfected, A_Q_delta_Q_pairwise_byInfectee)
-            elif(self.delta_pairwise_mode == 'mean'):
-                self.A_Q_delta_Q_pairwise = (A_Q_delta_Q_pairwise_byInfected + A_Q_delta_Q_pairwise_byInfectee)/2
-            elif(self.delta_pairwise_mode is None):
-                self.A_Q_delta_Q_pairwise = self.A
-            else:
-                print("Unrecognized delta_pairwise_mode value (support for 'infected', 'infectee', 'min', 'max', and 'mean').")
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def apply_checkpoint(self, checkpoints, checkpointIdx):
+        if('bundles' in checkpoints):
+            # Precompiled checkpoints (see compile_checkpoints()), switch to the prebuilt parameter bundle:
+            self.set_parameter_bundle(checkpoints['bundles'][checkpointIdx])
         else:
-            print("Invalid values given for delta_Q (expected 1xN list/array or NxN 2d array)")
+            for param in list(self.parameters.keys()):
+                if(param in list(checkpoints.keys())):
+                    self.parameters.update({param: checkpoints[param][checkpointIdx]})
+            # Update parameter data structures and scenario flags:
+            self.update_parameters()
 
-        #----------------------------------------
-        # Pre-calculate the pairwise delta*beta values:
-        #----------------------------------------
-        self.A_deltabeta          = scipy.sparse.csr_matrix.multiply(self.A_delta_pairwise, self.A_beta_pairwise)
-        self.A_Q_deltabeta_Q      = scipy.sparse.csr_matrix.multiply(self.A_Q_delta_Q_pairwise, self.A_Q_beta_Q_pairwise)
-        if(self.A_beta_asym_pairwise is not None):
-            self.A_deltabeta_asym = scipy.sparse.csr_matrix.multiply(self.A_delta_pairwise, self.A_beta_asym_pairwise)
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def fork(self):
+        # Copy of the model in its current state, which continues independently of this one (e.g. to branch
+        # several scenarios off a simulated common prefix). The dynamic state (node states, timers, data series,
+        # propensities, ...) is copied, while the parameter bundle, the parameter values and the outcome draws,
+        # which are never modified in place, are shared by reference. Later parameter updates of either model
+        # swap in new structures rather than modifying the shared ones.
+        shared = [self.parameterBundle, self.rand_a, self.rand_h, self.rand_f]
+        shared += list(self.parameterBundle.__dict__.values()) + list(self.parameterBundle.parameters.values()) + list(self.parameters.values())
+        return copy.deepcopy(self, {id(obj): obj for obj in shared})
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    @classmethod
+    def from_model(cls, model, **kwargs):
+        # Model that continues from the current state of another (e.g. the vaccination phase continuing the
+        # pre-vaccination phase run with the seirsplus ExtSEIRSNetworkModel, or with this model). The node states,
+        # the times spent in them and in isolation, the testing statuses and the outcome draws are adopted by
+        # reference where possible, rather than placing the same numbers of individuals at random on the network,
+        # so the given model should not be run any further. The time of the new model starts at 0.
+        # Parameters not given as keyword arguments keep the values of the given model (where this model has them).
+        modelParams = inspect.signature(cls.__init__).parameters
+        params = {param: value for param, value in model.parameters.items() if param in modelParams and not param.startswith('init')}
+        params.update(kwargs)
+
+        X = model.X.astype(int, copy=False)
+        stateCounts = numpy.bincount(X[:,0], minlength=18)
+        newModel = cls(initE=stateCounts[2], initI_pre=stateCounts[3], initI_sym=stateCounts[4], initI_asym=stateCounts[5],
+                       initH=stateCounts[6], initR=stateCounts[7], initF=stateCounts[8],
+                       initQ_S=stateCounts[11], initQ_E=stateCounts[12], initQ_pre=stateCounts[13],
+                       initQ_sym=stateCounts[14], initQ_asym=stateCounts[15], initQ_R=stateCounts[17],
+                       init_X=X, **params)
+
+        # Entry times relative to the start of the new model (the seirsplus models keep the time spent instead):
+        if(hasattr(model, 'stateEntryTime')):
+            newModel.stateEntryTime = model.stateEntryTime - model.t
+            isolationEntryTime      = model.isolationEntryTime - model.t
         else:
-            self.A_deltabeta_asym = None
+            newModel.stateEntryTime = -model.timer_state
+            isolationEntryTime      = numpy.where(numpy.isin(X[:,0], newModel.isolatedStates), -numpy.ravel(model.timer_isolation), numpy.inf)
+        newModel.isolationEntryTime = isolationEntryTime
+        newModel.isolationQueue     = [(isolationEntryTime[node], node) for node in numpy.flatnonzero(numpy.isfinite(isolationEntryTime))]
+        heapq.heapify(newModel.isolationQueue)
+
+        newModel.tested               = model.tested
+        newModel.positive             = model.positive
+        newModel.testedInCurrentState = model.testedInCurrentState
+        newModel.testedCount          = int(numpy.count_nonzero(model.tested))
+        newModel.positiveCount        = int(numpy.count_nonzero(model.positive))
+        newModel.numTested[0]         = newModel.testedCount
+        newModel.numPositive[0]       = newModel.positiveCount
+
+        # Which individuals become asymptomatic, hospitalized or fatalities stays as drawn for the given model:
+        for attr in ['rand_a', 'rand_h', 'rand_f']:
+            if(getattr(model, attr, None) is not None and getattr(model, attr).shape == getattr(newModel, attr).shape):
+                setattr(newModel, attr, getattr(model, attr))
+        return newModel
 
 
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
@@ -2266,82 +2760,97 @@ class ExtSEIRSNetworkModelVac ():
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-    def calc_propensities(self):
+    def calc_propensities(self, nodes=None, ignore_timers=False):
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        # Pre-calculate matrix multiplication terms that may be used in multiple propensity calculations,
-        # and check to see if their computation is necessary before doing the multiplication
+        # Propensities are calculated for all nodes (nodes=None), or only for the given array of node indices
+        # when refreshing the rows of the persistent propensity matrix that were affected by a state change.
+        # With ignore_timers=True, time_in_state transitions are given their (nonzero) propensity regardless of
+        # the time spent in the state, marking which transitions the node is eligible for once its time is up.
         #------------------------------------
+        if(nodes is None):
+            nodes = slice(None)
+        X = self.X[nodes]
 
-        self.transmissionTerms_I = numpy.zeros(shape=(self.numNodes,1))
-        if(numpy.any(self.numI_sym[self.tidx]) or numpy.any(self.numI_asym[self.tidx]) or numpy.any(self.numI_pre[self.tidx])):
-            if(self.A_deltabeta_asym is not None):
-                self.transmissionTerms_sym  = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_deltabeta, self.X==self.I_sym))
-                self.transmissionTerms_asym = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_deltabeta_asym, ((self.X==self.I_pre)|(self.X==self.I_asym))))
-                self.transmissionTerms_I    = self.transmissionTerms_sym+self.transmissionTerms_asym
-            else:
-                self.transmissionTerms_I    = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_deltabeta, ((self.X==self.I_sym)|(self.X==self.I_pre)|(self.X==self.I_asym))))
-
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Transmission terms (infection pressure from infectious neighbors) are kept up to date
+        # as nodes change state (see update_transmission_terms)
         #------------------------------------
+        if(self.transmissionTerms_I is None):
+            self.calc_transmission_terms()
 
-        self.transmissionTerms_Q = numpy.zeros(shape=(self.numNodes,1))
-        if(numpy.any(self.numQ_pre[self.tidx]) or numpy.any(self.numQ_sym[self.tidx]) or numpy.any(self.numQ_asym[self.tidx])):
-            self.transmissionTerms_Q = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_Q_deltabeta_Q, ((self.X==self.Q_pre)|(self.X==self.Q_sym)|(self.X==self.Q_asym))))
+        transmissionTerms_I  = self.transmissionTerms_I[nodes]
+        transmissionTerms_Q  = self.transmissionTerms_Q[nodes]
+        transmissionTerms_IQ = self.transmissionTerms_IQ[nodes]
 
         #------------------------------------
 
-        self.transmissionTerms_IQ = numpy.zeros(shape=(self.numNodes,1))
-        if(numpy.any(self.numQ_S[self.tidx]) and (numpy.any(self.numI_sym[self.tidx]) or numpy.any(self.numI_asym[self.tidx]) or numpy.any(self.numI_pre[self.tidx]))):
-            self.transmissionTerms_IQ = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_Q_deltabeta_Q, ((self.X==self.I_sym)|(self.X==self.I_pre)|(self.X==self.I_asym))))
+        numContacts_Q = numpy.zeros(shape=X.shape)
+        if(numpy.any(self.positive) and self.contact_tracing_active()):
+            numContacts_Q = self.calc_neighbor_sums(self.A, [self.R, self.Q_R, self.F], nodes, positive_only=True)
 
-        #------------------------------------
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        qu = self.qu[nodes]
+        fi = self.fi[nodes]
 
-        numContacts_Q = numpy.zeros(shape=(self.numNodes,1))
-        if(numpy.any(self.positive) and (numpy.any(self.phi_S) or numpy.any(self.phi_E) or numpy.any(self.phi_pre) or numpy.any(self.phi_sym) or numpy.any(self.phi_asym))):
-            numContacts_Q = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A, ((self.positive)&(self.X!=self.R)&(self.X!=self.Q_R)&(self.X!=self.F))))
+        # The global (mean-field) interaction terms depend on the current compartment counts, which change with every event.
+        # They are therefore kept in separate columns holding only the per-node weights; the count-dependent factors
+        # are applied as per-column scales (see calc_propensity_scales), so that a change in the counts
+        # does not require recalculating the rows of every susceptible node.
+        propensities_StoE       = (1-qu)*( self.alpha[nodes] *
+                                        (self.o[nodes]*(self.beta_global[nodes]*self.prevalence_ext[nodes])
+                                        + (1-self.o[nodes])*(
+                                            (1-self.p[nodes])*(numpy.divide(transmissionTerms_I, self.degree[nodes], out=numpy.zeros_like(transmissionTerms_I), where=self.degree[nodes]!=0)
+                                                               + numpy.divide(transmissionTerms_Q, self.degree_Q[nodes], out=numpy.zeros_like(transmissionTerms_Q), where=self.degree_Q[nodes]!=0))))
+                                  )*(X==self.S)
 
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        qu = 0.63
-        fi = 1/40
+        globalWeights_StoE      = (1-qu)*self.alpha[nodes]*(1-self.o[nodes])*self.p[nodes]*(X==self.S)
+        propensities_StoE_sym   = globalWeights_StoE*self.beta_global[nodes]
+        propensities_StoE_asym  = globalWeights_StoE*self.beta_asym_global[nodes]
+        propensities_StoE_Q     = globalWeights_StoE*self.q[nodes]*self.beta_Q_global[nodes]
 
-        propensities_StoE       = (1-qu)*( self.alpha *
-                                        (self.o*(self.beta_global*self.prevalence_ext)
-                                        + (1-self.o)*(
-                                            self.p*((self.beta_global*self.numI_sym[self.tidx] + self.beta_asym_global*(self.numI_pre[self.tidx] + self.numI_asym[self.tidx])
-                                            + self.q*self.beta_Q_global*(self.numQ_pre[self.tidx] + self.numQ_sym[self.tidx] + self.numQ_asym[self.tidx]))/self.N[self.tidx])
-                                            + (1-self.p)*(numpy.divide(self.transmissionTerms_I, self.degree, out=numpy.zeros_like(self.degree), where=self.degree!=0)
-                                                          + numpy.divide(self.transmissionTerms_Q, self.degree_Q, out=numpy.zeros_like(self.degree_Q), where=self.degree_Q!=0))))
-                                  )*(self.X==self.S)
+        propensities_QStoQE     = ( self.alpha_Q[nodes] *
+                                        (self.o[nodes]*(self.q[nodes]*self.beta_global[nodes]*self.prevalence_ext[nodes])
+                                        + (1-self.o[nodes])*(
+                                            (1-self.p[nodes])*(numpy.divide(transmissionTerms_IQ+transmissionTerms_Q, self.degree_Q[nodes], out=numpy.zeros_like(transmissionTerms_Q), where=self.degree_Q[nodes]!=0))))
+                                  )*(X==self.Q_S)
 
-        propensities_QStoQE = numpy.zeros_like(propensities_StoE)
-        if(numpy.any(self.X==self.Q_S)):
-            propensities_QStoQE = ( self.alpha_Q *
-                                        (self.o*(self.q*self.beta_global*self.prevalence_ext)
-                                        + (1-self.o)*(
-                                            self.p*(self.q*(self.beta_global*self.numI_sym[self.tidx] + self.beta_asym_global*(self.numI_pre[self.tidx] + self.numI_asym[self.tidx])
-                                            + self.beta_Q_global*(self.numQ_pre[self.tidx] + self.numQ_sym[self.tidx] + self.numQ_asym[self.tidx]))/self.N[self.tidx])
-                                            + (1-self.p)*(numpy.divide(self.transmissionTerms_IQ+self.transmissionTerms_Q, self.degree_Q, out=numpy.zeros_like(self.degree_Q), where=self.degree_Q!=0))))
-                                   )*(self.X==self.Q_S)
+        globalWeights_QStoQE    = self.alpha_Q[nodes]*(1-self.o[nodes])*self.p[nodes]*(X==self.Q_S)
+        propensities_QStoQE_sym = globalWeights_QStoQE*self.q[nodes]*self.beta_global[nodes]
+        propensities_QStoQE_asym= globalWeights_QStoQE*self.q[nodes]*self.beta_asym_global[nodes]
+        propensities_QStoQE_Q   = globalWeights_QStoQE*self.q[nodes]*self.beta_Q_global[nodes]
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
+        #Vaccination propensities
+
+        propensities_StoR        = qu*fi*(X==self.S)
+
+        propensities_EtoR        = qu*fi*(X==self.E)
+
+        propensities_IPREtoR     = qu*fi*(X==self.I_pre)
+
+        #-------------------------
+
         if(self.transition_mode == 'time_in_state'):
 
-            propensities_EtoIPRE     = 1e5 * ((self.X==self.E) & numpy.greater(self.timer_state, 1/self.sigma))
+            timer_state = (self.t - self.stateEntryTime[nodes]) if not ignore_timers else numpy.full(X.shape, numpy.inf)
+
+            propensities_EtoIPRE     = 1e5 * ((X==self.E) & numpy.greater(timer_state, 1/self.sigma[nodes]))
 
-            propensities_IPREtoISYM  = 1e5 * ((self.X==self.I_pre) & numpy.greater(self.timer_state, 1/self.lamda) & numpy.greater_equal(self.rand_a, self.a))
+            propensities_IPREtoISYM  = 1e5 * ((X==self.I_pre) & numpy.greater(timer_state, 1/self.lamda[nodes]) & numpy.greater_equal(self.rand_a[nodes], self.a[nodes]))
 
-            propensities_IPREtoIASYM = 1e5 * ((self.X==self.I_pre) & numpy.greater(self.timer_state, 1/self.lamda) & numpy.less(self.rand_a, self.a))
+            propensities_IPREtoIASYM = 1e5 * ((X==self.I_pre) & numpy.greater(timer_state, 1/self.lamda[nodes]) & numpy.less(self.rand_a[nodes], self.a[nodes]))
 
-            propensities_ISYMtoR     = 1e5 * ((self.X==self.I_sym) & numpy.greater(self.timer_state, 1/self.gamma) & numpy.greater_equal(self.rand_h, self.h))
+            propensities_ISYMtoR     = 1e5 * ((X==self.I_sym) & numpy.greater(timer_state, 1/self.gamma[nodes]) & numpy.greater_equal(self.rand_h[nodes], self.h[nodes]))
 
-            propensities_ISYMtoH     = 1e5 * ((self.X==self.I_sym) & numpy.greater(self.timer_state, 1/self.eta) & numpy.less(self.rand_h, self.h))
+            propensities_ISYMtoH     = 1e5 * ((X==self.I_sym) & numpy.greater(timer_state, 1/self.eta[nodes]) & numpy.less(self.rand_h[nodes], self.h[nodes]))
 
-            propensities_IASYMtoR    = 1e5 * ((self.X==self.I_asym) & numpy.greater(self.timer_state, 1/self.gamma))
+            propensities_IASYMtoR    = 1e5 * ((X==self.I_asym) & numpy.greater(timer_state, 1/self.gamma[nodes]))
 
-            propensities_HtoR        = 1e5 * ((self.X==self.H) & numpy.greater(self.timer_state, 1/self.gamma_H) & numpy.greater_equal(self.rand_f, self.f))
+            propensities_HtoR        = 1e5 * ((X==self.H) & numpy.greater(timer_state, 1/self.gamma_H[nodes]) & numpy.greater_equal(self.rand_f[nodes], self.f[nodes]))
 
-            propensities_HtoF        = 1e5 * ((self.X==self.H) & numpy.greater(self.timer_state, 1/self.mu_H) & numpy.less(self.rand_f, self.f))
+            propensities_HtoF        = 1e5 * ((X==self.H) & numpy.greater(timer_state, 1/self.mu_H[nodes]) & numpy.less(self.rand_f[nodes], self.f[nodes]))
 
             propensities_StoQS       = numpy.zeros_like(propensities_StoE)
 
@@ -2353,79 +2862,82 @@ class ExtSEIRSNetworkModelVac ():
 
             propensities_IASYMtoQASYM = numpy.zeros_like(propensities_StoE)
 
-            propensities_QEtoQPRE    = 1e5 * ((self.X==self.Q_E) & numpy.greater(self.timer_state, 1/self.sigma_Q))
+            propensities_QEtoQPRE    = 1e5 * ((X==self.Q_E) & numpy.greater(timer_state, 1/self.sigma_Q[nodes]))
 
-            propensities_QPREtoQSYM  = 1e5 * ((self.X==self.Q_pre) & numpy.greater(self.timer_state, 1/self.lamda_Q) & numpy.greater_equal(self.rand_a, self.a))
+            propensities_QPREtoQSYM  = 1e5 * ((X==self.Q_pre) & numpy.greater(timer_state, 1/self.lamda_Q[nodes]) & numpy.greater_equal(self.rand_a[nodes], self.a[nodes]))
 
-            propensities_QPREtoQASYM = 1e5 * ((self.X==self.Q_pre) & numpy.greater(self.timer_state, 1/self.lamda_Q) & numpy.less(self.rand_a, self.a))
+            propensities_QPREtoQASYM = 1e5 * ((X==self.Q_pre) & numpy.greater(timer_state, 1/self.lamda_Q[nodes]) & numpy.less(self.rand_a[nodes], self.a[nodes]))
 
-            propensities_QSYMtoQR    = 1e5 * ((self.X==self.Q_sym) & numpy.greater(self.timer_state, 1/self.gamma_Q_sym) & numpy.greater_equal(self.rand_h, self.h))
+            propensities_QSYMtoQR    = 1e5 * ((X==self.Q_sym) & numpy.greater(timer_state, 1/self.gamma_Q_sym[nodes]) & numpy.greater_equal(self.rand_h[nodes], self.h[nodes]))
 
-            propensities_QSYMtoH     = 1e5 * ((self.X==self.Q_sym) & numpy.greater(self.timer_state, 1/self.eta_Q) & numpy.less(self.rand_h, self.h))
+            propensities_QSYMtoH     = 1e5 * ((X==self.Q_sym) & numpy.greater(timer_state, 1/self.eta_Q[nodes]) & numpy.less(self.rand_h[nodes], self.h[nodes]))
 
-            propensities_QASYMtoQR   = 1e5 * ((self.X==self.Q_asym) & numpy.greater(self.timer_state, 1/self.gamma_Q_asym))
+            propensities_QASYMtoQR   = 1e5 * ((X==self.Q_asym) & numpy.greater(timer_state, 1/self.gamma_Q_asym[nodes]))
 
-            propensities_RtoS        = 1e5 * ((self.X==self.R) & numpy.greater(self.timer_state, 1/self.xi))
+            propensities_RtoS        = 1e5 * ((X==self.R) & numpy.greater(timer_state, 1/self.xi[nodes]))
 
-            propensities__toS        = 1e5 * ((self.X!=self.F) & numpy.greater(self.timer_state, 1/self.nu))
+            propensities__toS        = 1e5 * ((X!=self.F) & numpy.greater(timer_state, 1/self.nu[nodes]))
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
         else: # exponential_rates
 
 
-            propensities_EtoIPRE     = (1-qu)*self.sigma * (self.X==self.E)
+            propensities_EtoIPRE     = (1-qu)*self.sigma[nodes] * (X==self.E)
 
-            propensities_IPREtoISYM  = (1-qu)*self.lamda * ((self.X==self.I_pre) & (numpy.greater_equal(self.rand_a, self.a)))
+            propensities_IPREtoISYM  = (1-qu)*self.lamda[nodes] * ((X==self.I_pre) & (numpy.greater_equal(self.rand_a[nodes], self.a[nodes])))
 
-            propensities_IPREtoIASYM = (1-qu)*self.lamda * ((self.X==self.I_pre) & (numpy.less(self.rand_a, self.a)))
+            propensities_IPREtoIASYM = (1-qu)*self.lamda[nodes] * ((X==self.I_pre) & (numpy.less(self.rand_a[nodes], self.a[nodes])))
 
-            propensities_ISYMtoR     = self.gamma * ((self.X==self.I_sym) & (numpy.greater_equal(self.rand_h, self.h)))
+            propensities_ISYMtoR     = self.gamma[nodes] * ((X==self.I_sym) & (numpy.greater_equal(self.rand_h[nodes], self.h[nodes])))
 
-            propensities_ISYMtoH     = self.eta * ((self.X==self.I_sym) & (numpy.less(self.rand_h, self.h)))
+            propensities_ISYMtoH     = self.eta[nodes] * ((X==self.I_sym) & (numpy.less(self.rand_h[nodes], self.h[nodes])))
 
-            propensities_IASYMtoR    = ((1-qu)*self.gamma_asym * (self.X==self.I_asym))+qu*fi*(self.X==self.I_asym)
+            propensities_IASYMtoR    = ((1-qu)*self.gamma_asym[nodes] * (X==self.I_asym))+qu*fi*(X==self.I_asym)
 
-            propensities_HtoR        = self.gamma_H * ((self.X==self.H) & (numpy.greater_equal(self.rand_f, self.f)))
+            propensities_HtoR        = self.gamma_H[nodes] * ((X==self.H) & (numpy.greater_equal(self.rand_f[nodes], self.f[nodes])))
 
-            propensities_HtoF        = self.mu_H * ((self.X==self.H) & (numpy.less(self.rand_f, self.f)))
+            propensities_HtoF        = self.mu_H[nodes] * ((X==self.H) & (numpy.less(self.rand_f[nodes], self.f[nodes])))
 
-            #Vaccination propensities
+            # Groups of transition types that cannot currently occur (their rate parameters are zero for all nodes,
+            # or no node is in their source states) are not evaluated:
+            if(self.testingActive):
 
-            propensities_StoR        = qu*fi*(self.X==self.S)
+                propensities_StoQS       = (self.theta_S[nodes] + self.phi_S[nodes]*numContacts_Q)*self.psi_S[nodes] * (X==self.S)
 
-            propensities_EtoR        = qu*fi*(self.X==self.E)
+                propensities_EtoQE       = (self.theta_E[nodes] + self.phi_E[nodes]*numContacts_Q)*self.psi_E[nodes] * (X==self.E)
 
-            propensities_IPREtoR     = qu*fi*(self.X==self.I_pre)
+                propensities_IPREtoQPRE  = (self.theta_pre[nodes] + self.phi_pre[nodes]*numContacts_Q)*self.psi_pre[nodes] * (X==self.I_pre)
 
-            #-------------------------
+                propensities_ISYMtoQSYM  = (self.theta_sym[nodes] + self.phi_sym[nodes]*numContacts_Q)*self.psi_sym[nodes] * (X==self.I_sym)
 
+                propensities_IASYMtoQASYM = (self.theta_asym[nodes] + self.phi_asym[nodes]*numContacts_Q)*self.psi_asym[nodes] * (X==self.I_asym)
 
-            propensities_StoQS       = (self.theta_S + self.phi_S*numContacts_Q)*self.psi_S * (self.X==self.S)
+            else:
 
-            propensities_EtoQE       = (self.theta_E + self.phi_E*numContacts_Q)*self.psi_E * (self.X==self.E)
+                propensities_StoQS = propensities_EtoQE = propensities_IPREtoQPRE = propensities_ISYMtoQSYM = propensities_IASYMtoQASYM = numpy.zeros_like(propensities_StoE)
 
-            propensities_IPREtoQPRE  = (self.theta_pre + self.phi_pre*numContacts_Q)*self.psi_pre * (self.X==self.I_pre)
+            if(numpy.any(self.stateCounts[[self.Q_E, self.Q_pre, self.Q_sym, self.Q_asym]])):
 
-            propensities_ISYMtoQSYM  = (self.theta_sym + self.phi_sym*numContacts_Q)*self.psi_sym * (self.X==self.I_sym)
+                propensities_QEtoQPRE    = self.sigma_Q[nodes] * (X==self.Q_E)
 
-            propensities_IASYMtoQASYM = (self.theta_asym + self.phi_asym*numContacts_Q)*self.psi_asym * (self.X==self.I_asym)
+                propensities_QPREtoQSYM  = self.lamda_Q[nodes] * ((X==self.Q_pre) & (numpy.greater_equal(self.rand_a[nodes], self.a[nodes])))
 
-            propensities_QEtoQPRE    = self.sigma_Q * (self.X==self.Q_E)
+                propensities_QPREtoQASYM = self.lamda_Q[nodes] * ((X==self.Q_pre) & (numpy.less(self.rand_a[nodes], self.a[nodes])))
 
-            propensities_QPREtoQSYM  = self.lamda_Q * ((self.X==self.Q_pre) & (numpy.greater_equal(self.rand_a, self.a)))
+                propensities_QSYMtoQR    = self.gamma_Q_sym[nodes] * ((X==self.Q_sym) & (numpy.greater_equal(self.rand_h[nodes], self.h[nodes])))
 
-            propensities_QPREtoQASYM = self.lamda_Q * ((self.X==self.Q_pre) & (numpy.less(self.rand_a, self.a)))
+                propensities_QSYMtoH     = self.eta_Q[nodes] * ((X==self.Q_sym) & (numpy.less(self.rand_h[nodes], self.h[nodes])))
 
-            propensities_QSYMtoQR    = self.gamma_Q_sym * ((self.X==self.Q_sym) & (numpy.greater_equal(self.rand_h, self.h)))
+                propensities_QASYMtoQR   = self.gamma_Q_asym[nodes] * (X==self.Q_asym)
 
-            propensities_QSYMtoH     = self.eta_Q * ((self.X==self.Q_sym) & (numpy.less(self.rand_h, self.h)))
+            else:
 
-            propensities_QASYMtoQR   = self.gamma_Q_asym * (self.X==self.Q_asym)
+                propensities_QEtoQPRE = propensities_QPREtoQSYM = propensities_QPREtoQASYM = propensities_QSYMtoQR = propensities_QSYMtoH = propensities_QASYMtoQR = numpy.zeros_like(propensities_StoE)
 
-            propensities_RtoS        = self.xi * (self.X==self.R)
+            propensities_RtoS        = self.xi[nodes] * (X==self.R) if self.rebirthActive else numpy.zeros_like(propensities_StoE)
 
-            propensities__toS        = self.nu * (self.X!=self.F)
+            propensities__toS        = self.nu[nodes] * (X!=self.F) if self.rebirthActive else numpy.zeros_like(propensities_StoE)
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -2434,17 +2946,293 @@ class ExtSEIRSNetworkModelVac ():
                                      propensities_StoR,propensities_EtoR,propensities_IPREtoR,
                                      propensities_StoQS, propensities_EtoQE, propensities_IPREtoQPRE, propensities_ISYMtoQSYM, propensities_IASYMtoQASYM,
                                      propensities_QStoQE, propensities_QEtoQPRE, propensities_QPREtoQSYM, propensities_QPREtoQASYM,
-                                     propensities_QSYMtoQR, propensities_QSYMtoH, propensities_QASYMtoQR, propensities_RtoS, propensities__toS])
+                                     propensities_QSYMtoQR, propensities_QSYMtoH, propensities_QASYMtoQR, propensities_RtoS, propensities__toS,
+                                     propensities_StoE_sym, propensities_StoE_asym, propensities_StoE_Q,
+                                     propensities_QStoQE_sym, propensities_QStoQE_asym, propensities_QStoQE_Q])
 
         columns = [ 'StoE', 'EtoIPRE', 'IPREtoISYM', 'IPREtoIASYM',
                     'ISYMtoR', 'ISYMtoH', 'IASYMtoR', 'HtoR', 'HtoF',
                     'StoR','EtoR','IPREtoR',
                     'StoQS', 'EtoQE', 'IPREtoQPRE', 'ISYMtoQSYM', 'IASYMtoQASYM',
                     'QStoQE', 'QEtoQPRE', 'QPREtoQSYM', 'QPREtoQASYM',
-                    'QSYMtoQR', 'QSYMtoH', 'QASYMtoQR', 'RtoS', '_toS' ]
+                    'QSYMtoQR', 'QSYMtoH', 'QASYMtoQR', 'RtoS', '_toS',
+                    'StoE', 'StoE', 'StoE',
+                    'QStoQE', 'QStoQE', 'QStoQE' ]
 
         return propensities, columns
 
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def calc_transmission_terms(self):
+        # Calculate the infection pressure on every node from its infectious neighbors:
+        # (I) from non-isolated infectious neighbors, (Q) from isolated infectious neighbors in the isolation graph,
+        # and (IQ) from non-isolated infectious neighbors in the isolation graph (for isolated susceptible nodes).
+        isSym   = (self.X==self.I_sym)
+        isAsym  = (self.X==self.I_pre)|(self.X==self.I_asym)
+        if(self.A_deltabeta_asym is not None):
+            self.transmissionTerms_I = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_deltabeta, isSym)) + numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_deltabeta_asym, isAsym))
+        else:
+            self.transmissionTerms_I = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_deltabeta, isSym|isAsym))
+        self.transmissionTerms_Q  = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_Q_deltabeta_Q, (self.X==self.Q_pre)|(self.X==self.Q_sym)|(self.X==self.Q_asym)))
+        self.transmissionTerms_IQ = numpy.asarray(scipy.sparse.csr_matrix.dot(self.A_Q_deltabeta_Q, isSym|isAsym))
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update_transmission_terms(self, node, infectious_class, sign):
+        # Add (sign=1) or remove (sign=-1) the infection pressure that the node exerts on its neighbors
+        # as a member of the given infectious class (see infectiousClass), i.e., the node's column
+        # of the pairwise transmission matrices:
+        if(self.transmissionTerms_I is None or infectious_class == 0):
+            return
+        if(infectious_class == 3):
+            updates = [(self.transmissionTerms_Q, self.A_Q_deltabeta_Q_csc)]
+        else:
+            A_I_csc = self.A_deltabeta_asym_csc if (infectious_class == 2 and self.A_deltabeta_asym_csc is not None) else self.A_deltabeta_csc
+            updates = [(self.transmissionTerms_I, A_I_csc), (self.transmissionTerms_IQ, self.A_Q_deltabeta_Q_csc)]
+        for transmissionTerms, Amat in updates:
+            nbrs  = Amat.indices[Amat.indptr[node]:Amat.indptr[node+1]]
+            terms = transmissionTerms[nbrs,0] + sign*Amat.data[Amat.indptr[node]:Amat.indptr[node+1]]
+            # Clear the round-off left over when the last infectious neighbor is removed:
+            transmissionTerms[nbrs,0] = numpy.where(terms > 1e-12, terms, 0)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def calc_propensity_scales(self):
+        # Per-column multipliers of the propensity matrix: 1 for the node-local columns, and the current
+        # (infectious count)/N factors for the global interaction columns (sym, pre+asym, isolated infectious).
+        scales = numpy.ones(32)
+        if(self.N[self.tidx] > 0):
+            globalScales = numpy.array([self.numI_sym[self.tidx],
+                                        self.numI_pre[self.tidx] + self.numI_asym[self.tidx],
+                                        self.numQ_pre[self.tidx] + self.numQ_sym[self.tidx] + self.numQ_asym[self.tidx]])/self.N[self.tidx]
+        else:
+            globalScales = numpy.zeros(3)
+        scales[26:29] = globalScales
+        scales[29:32] = globalScales
+        return scales
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def calc_neighbor_sums(self, Amat, states, nodes, positive_only=False):
+        # Weighted sum (by Amat) over the neighbors of each node that are in one of the given states
+        # (or, with positive_only=True, over the neighbors that are positive and in none of the given states).
+        if(isinstance(nodes, slice)):
+            if(positive_only):
+                nbrMask = self.positive & ~numpy.isin(self.X, states)
+            else:
+                nbrMask = numpy.isin(self.X, states)
+            return numpy.asarray(scipy.sparse.csr_matrix.dot(Amat, nbrMask))
+        # Only evaluate the rows of the given nodes; cost is proportional to the number of their neighbors.
+        # Gather the positions of the given rows' entries in the CSR data/indices arrays:
+        rowStarts   = Amat.indptr[nodes]
+        rowLengths  = Amat.indptr[nodes+1] - rowStarts
+        rowIds      = numpy.repeat(numpy.arange(len(nodes)), rowLengths)
+        entries     = numpy.arange(rowLengths.sum()) + numpy.repeat(rowStarts - (numpy.cumsum(rowLengths) - rowLengths), rowLengths)
+        nbrs        = Amat.indices[entries]
+        if(positive_only):
+            nbrMask = self.positive[nbrs,0] & ~numpy.isin(self.X[nbrs,0], states)
+        else:
+            nbrMask = numpy.isin(self.X[nbrs,0], states)
+        # (bincount returns integers when the rows have no entries at all, hence the cast)
+        return numpy.bincount(rowIds, weights=Amat.data[entries]*nbrMask, minlength=len(nodes)).astype(float).reshape((len(nodes),1))
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def contact_tracing_active(self):
+        return (numpy.any(self.phi_S) or numpy.any(self.phi_E) or numpy.any(self.phi_pre) or numpy.any(self.phi_sym) or numpy.any(self.phi_asym))
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update_propensities(self):
+        # Bring the persistent propensity matrix up to date: recalculate it entirely if it has been invalidated
+        # (e.g., by a parameter update), otherwise only recalculate the rows of nodes affected by state changes
+        # since the last update.
+        # The propensity sum tree used for event selection (and the next reaction queue, when that engine is used)
+        # is kept in sync with the matrix.
+        # With the next reaction engine, time_in_state transitions are scheduled at fixed times rather than
+        # triggered by timer-dependent pseudo-propensities, so the timers are not part of the propensities.
+        # With the other engines, the timer-dependent propensities of a node only change when its time in state
+        # runs out, so the nodes are kept in the timer queue until then (see schedule_state_timers).
+        nextReaction    = (self.engine == 'next_reaction')
+        ignoreTimers    = (nextReaction and self.transition_mode == 'time_in_state')
+        timers          = (self.transition_mode == 'time_in_state' and not ignoreTimers)
+        updatedNodes    = None
+        if(timers and self.propensities is not None):
+            self.pop_state_timers()
+        if(self.propensities is None):
+            self.propensities, self.propensityTypes = self.calc_propensities(ignore_timers=ignoreTimers)
+            self.propensityTree = PropensitySumTree(self.numNodes, self.propensities.shape[1])
+            self.propensityTree.build(self.propensities)
+            self.nextReactionQueue = None
+            self.timerQueue = None
+            if(timers):
+                self.schedule_state_timers(numpy.arange(self.numNodes))
+        elif(len(self.dirtyNodes) > 0):
+            dirtyNodes = numpy.unique(numpy.hstack(self.dirtyNodes))
+            if(timers):
+                self.schedule_state_timers(dirtyNodes)
+            if(len(dirtyNodes) > self.numNodes/4):
+                prevPropensities  = self.propensities
+                self.propensities = self.calc_propensities(ignore_timers=ignoreTimers)[0]
+                self.propensityTree.build(self.propensities)
+                updatedNodes      = numpy.arange(self.numNodes)
+            else:
+                dirtyPropensities = self.calc_propensities(nodes=dirtyNodes, ignore_timers=ignoreTimers)[0]
+                prevPropensities  = self.propensities[dirtyNodes,:]
+                changedRows, changedCols = numpy.nonzero(dirtyPropensities != prevPropensities)
+                self.propensities[dirtyNodes,:] = dirtyPropensities
+                self.propensityTree.update(dirtyNodes[changedRows], changedCols, dirtyPropensities[changedRows, changedCols])
+                updatedNodes      = dirtyNodes
+        self.dirtyNodes = []
+        self.propensityTree.set_scales(self.calc_propensity_scales())
+
+        if(nextReaction):
+            if(self.nextReactionQueue is None):
+                self.update_next_reaction_queue()
+            else:
+                self.update_next_reaction_queue(updatedNodes, prevPropensities if updatedNodes is not None else None)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update_next_reaction_queue(self, nodes=None, prevPropensities=None):
+        # Keep the putative firing times of the next reaction engine consistent with the current propensities.
+        # Each node-local (node, transition) pair is a reaction channel; the global interaction columns
+        # are handled as one channel per column (with the column total as its rate), since their rates
+        # change with every event, and the firing node is drawn within the column when such a channel fires.
+        numColumns      = self.propensities.shape[1]
+        localColumns    = [col for col in range(numColumns) if col not in self.globalPropensityColumns]
+        if(nodes is None):
+            self.nextReactionQueue  = IndexedPriorityQueue(numColumns*self.numNodes + numColumns)
+            self.channelRates       = numpy.zeros(numColumns)
+            nodes                   = numpy.arange(self.numNodes)
+            prevPropensities        = numpy.zeros_like(self.propensities)
+        #----------------------------------------
+        # Node-local channels of the updated nodes:
+        if(len(nodes) > 0):
+            channels    = (numpy.array(localColumns)*self.numNodes)[None,:] + nodes[:,None]
+            newRates    = self.propensities[nodes,:][:,localColumns]
+            prevRates   = prevPropensities[:,localColumns]
+            if(self.transition_mode == 'time_in_state'):
+                # Transitions that occur after a fixed time in state are scheduled at (time of entering the state + delay):
+                delays      = self.calc_transition_delays(nodes)[:,localColumns]
+                delayed     = numpy.broadcast_to(~numpy.isnan(delays[:1,:]), delays.shape)
+                entryTimes  = self.stateEntryTime[nodes]
+                fireTimes   = numpy.where(newRates > 0, numpy.maximum(self.t, entryTimes + delays), numpy.inf)
+                self.nextReactionQueue.update(channels[delayed], fireTimes[delayed])
+            else:
+                delayed     = numpy.zeros_like(newRates, dtype=bool)
+            changed     = ~delayed & ((newRates != prevRates) | ((newRates > 0) & (self.nextReactionQueue.time(channels) == numpy.inf)))
+            localUpdates = (channels[changed], prevRates[changed], newRates[changed])
+        else:
+            localUpdates = (numpy.zeros(0, dtype=int), numpy.zeros(0), numpy.zeros(0))
+        #----------------------------------------
+        # Aggregate channels of the global interaction columns:
+        globalColumns   = numpy.array(self.globalPropensityColumns)
+        channels        = numColumns*self.numNodes + globalColumns
+        newRates        = numpy.array([self.propensityTree.column_total(col) for col in globalColumns])
+        prevRates       = self.channelRates[globalColumns]
+        changed         = (newRates != prevRates) | ((newRates > 0) & (self.nextReactionQueue.time(channels) == numpy.inf))
+        self.channelRates[globalColumns] = newRates
+        #----------------------------------------
+        # Only the channels whose rates changed are rescheduled, all in one update of the queue:
+        self.nextReactionQueue.reschedule(numpy.concatenate([localUpdates[0], channels[changed]]),
+                                          numpy.concatenate([localUpdates[1], prevRates[changed]]),
+                                          numpy.concatenate([localUpdates[2], newRates[changed]]), self.t)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def schedule_state_timers(self, nodes):
+        # Push the times at which the time_in_state transitions open to the given nodes come due
+        # (time of entering the current state + delay) onto the timer queue, a min-heap of
+        # (due time, node, state, state entry time, delay). Only nodes whose state or state entry time changed
+        # since they were last scheduled are pushed; the entries scheduled before for them become stale.
+        if(self.timerQueue is None):
+            self.timerQueue         = []
+            self.timerStates        = numpy.full(self.numNodes, -1)
+            self.timerEntryTimes    = numpy.full(self.numNodes, numpy.nan)
+        states      = self.X[nodes,0]
+        entryTimes  = self.stateEntryTime[nodes,0]
+        changed     = (states != self.timerStates[nodes]) | (entryTimes != self.timerEntryTimes[nodes])
+        nodes, states, entryTimes = nodes[changed], states[changed], entryTimes[changed]
+        self.timerStates[nodes]     = states
+        self.timerEntryTimes[nodes] = entryTimes
+
+        delays          = self.calc_transition_delays(nodes)
+        currentStates   = numpy.array([-1 if transitionType == '_toS' else self.transitions[transitionType]['currentState'] for transitionType in self.propensityTypes])
+        eligible        = ((states[:,None] == currentStates[None,:]) | ((currentStates[None,:] == -1) & (states[:,None] != self.F))) & numpy.isfinite(delays)
+        rows, cols      = numpy.nonzero(eligible)
+        entries         = list(zip((entryTimes[rows] + delays[rows,cols]).tolist(), nodes[rows].tolist(), states[rows].tolist(),
+                                   entryTimes[rows].tolist(), delays[rows,cols].tolist()))
+        if(len(entries) > len(self.timerQueue)):
+            self.timerQueue.extend(entries)
+            heapq.heapify(self.timerQueue)
+        else:
+            for entry in entries:
+                heapq.heappush(self.timerQueue, entry)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def pop_state_timers(self):
+        # Mark the nodes whose time in state has run out since the last update (by the same comparison as the
+        # time_in_state propensities) for a refresh of their propensities. Stale entries are dropped.
+        pending = []
+        while(len(self.timerQueue) > 0 and self.timerQueue[0][0] <= self.t):
+            entry = heapq.heappop(self.timerQueue)
+            dueTime, node, state, entryTime, delay = entry
+            if(not self.timer_entry_valid(entry)):
+                continue
+            if(self.t - entryTime > delay):
+                self.dirtyNodes.append(node)
+            else:
+                pending.append(entry)
+        for entry in pending:
+            heapq.heappush(self.timerQueue, entry)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def timer_entry_valid(self, entry):
+        # An entry of the timer queue is stale if its node has changed state or restarted its clock since it was pushed:
+        dueTime, node, state, entryTime, delay = entry
+        return (self.timerStates[node] == state and self.timerEntryTimes[node] == entryTime)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def calc_transition_delays(self, nodes):
+        # Time in state after which each time_in_state transition occurs (nan for transitions driven by rates):
+        delays = numpy.full((len(nodes), len(self.propensityTypes)), numpy.nan)
+        transitionDelayParams = {'EtoIPRE':self.sigma, 'IPREtoISYM':self.lamda, 'IPREtoIASYM':self.lamda, 'ISYMtoR':self.gamma, 'ISYMtoH':self.eta,
+                                 'IASYMtoR':self.gamma, 'HtoR':self.gamma_H, 'HtoF':self.mu_H,
+                                 'QEtoQPRE':self.sigma_Q, 'QPREtoQSYM':self.lamda_Q, 'QPREtoQASYM':self.lamda_Q, 'QSYMtoQR':self.gamma_Q_sym,
+                                 'QSYMtoH':self.eta_Q, 'QASYMtoQR':self.gamma_Q_asym, 'RtoS':self.xi, '_toS':self.nu}
+        with numpy.errstate(divide='ignore'):
+            for col, transitionType in enumerate(self.propensityTypes):
+                if(transitionType in transitionDelayParams and col not in self.globalPropensityColumns):
+                    delays[:,col] = 1/transitionDelayParams[transitionType][nodes,0]
+        return delays
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def set_node_state(self, node, state):
+        prevState = self.X[node,0]
+        if(prevState == state):
+            return
+        self.X[node] = state
+        self.stateCounts[prevState] -= 1
+        self.stateCounts[state]     += 1
+        # Start or stop the isolation clock if the node entered or left isolation:
+        if((prevState in self.isolatedStates) != (state in self.isolatedStates)):
+            self.set_isolation_clock(node)
+        # The node's own propensities always change:
+        self.dirtyNodes.append(node)
+        # Neighbors' exposure propensities (and the transmission terms) change if the node's infectious class changed:
+        if(self.infectiousClass.get(prevState, 0) != self.infectiousClass.get(state, 0)):
+            self.update_transmission_terms(node, self.infectiousClass.get(prevState, 0), -1)
+            self.update_transmission_terms(node, self.infectiousClass.get(state, 0), +1)
+            self.dirtyNodes.append(self.A_csc.indices[self.A_csc.indptr[node]:self.A_csc.indptr[node+1]])
+            self.dirtyNodes.append(self.A_Q_csc.indices[self.A_Q_csc.indptr[node]:self.A_Q_csc.indptr[node+1]])
+        # Neighbors' contact tracing testing propensities change if the node stopped/started counting as a positive contact:
+        if(self.positive[node,0] and ((prevState in (self.R, self.Q_R, self.F)) != (state in (self.R, self.Q_R, self.F)))):
+            self.dirtyNodes.append(self.A_csc.indices[self.A_csc.indptr[node]:self.A_csc.indptr[node+1]])
 
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
@@ -2453,42 +3241,58 @@ class ExtSEIRSNetworkModelVac ():
         # Move this node in/out of the appropriate isolation state:
         if(isolate == True):
             if(self.X[node] == self.S):
-                self.X[node] = self.Q_S
+                self.set_node_state(node, self.Q_S)
             elif(self.X[node] == self.E):
-                self.X[node] = self.Q_E
+                self.set_node_state(node, self.Q_E)
             elif(self.X[node] == self.I_pre):
-                self.X[node] = self.Q_pre
+                self.set_node_state(node, self.Q_pre)
             elif(self.X[node] == self.I_sym):
-                self.X[node] = self.Q_sym
+                self.set_node_state(node, self.Q_sym)
             elif(self.X[node] == self.I_asym):
-                self.X[node] = self.Q_asym
+                self.set_node_state(node, self.Q_asym)
             elif(self.X[node] == self.R):
-                self.X[node] = self.Q_R
+                self.set_node_state(node, self.Q_R)
         elif(isolate == False):
             if(self.X[node] == self.Q_S):
-                self.X[node] = self.S
+                self.set_node_state(node, self.S)
             elif(self.X[node] == self.Q_E):
-                self.X[node] = self.E
+                self.set_node_state(node, self.E)
             elif(self.X[node] == self.Q_pre):
-                self.X[node] = self.I_pre
+                self.set_node_state(node, self.I_pre)
             elif(self.X[node] == self.Q_sym):
-                self.X[node] = self.I_sym
+                self.set_node_state(node, self.I_sym)
             elif(self.X[node] == self.Q_asym):
-                self.X[node] = self.I_asym
+                self.set_node_state(node, self.I_asym)
             elif(self.X[node] == self.Q_R):
-                self.X[node] = self.R
-        # Reset the isolation timer:
-        self.timer_isolation[node] = 0
+                self.set_node_state(node, self.R)
+        # Reset the isolation clock:
+        self.set_isolation_clock(node)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def set_isolation_clock(self, node):
+        # (Re)start the isolation clock of the node if it is isolated, and schedule its release;
+        # stop the clock otherwise. Queue entries made stale by a later (re)start or stop are skipped when popped.
+        if(self.X[node,0] in self.isolatedStates):
+            self.isolationEntryTime[node] = self.t
+            heapq.heappush(self.isolationQueue, (self.t, node))
+        else:
+            self.isolationEntryTime[node] = numpy.inf
 
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
     def set_tested(self, node, tested):
+        self.testedCount += int(tested) - int(self.tested[node,0])
         self.tested[node] = tested
         self.testedInCurrentState[node] = tested
 
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
     def set_positive(self, node, positive):
+        if(self.positive[node,0] != positive and self.contact_tracing_active() and self.X[node,0] not in (self.R, self.Q_R, self.F)):
+            # Neighbors' contact tracing testing propensities depend on this node's positive status:
+            self.dirtyNodes.append(self.A_csc.indices[self.A_csc.indptr[node]:self.A_csc.indptr[node+1]])
+        self.positiveCount += int(positive) - int(self.positive[node,0])
         self.positive[node] = positive
 
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
@@ -2497,14 +3301,14 @@ class ExtSEIRSNetworkModelVac ():
         exposedNodes = numpy.random.choice(range(self.numNodes), size=num_new_exposures, replace=False)
         for exposedNode in exposedNodes:
             if(self.X[exposedNode]==self.S):
-                self.X[exposedNode] = self.R
+                self.set_node_state(exposedNode, self.R)
             elif(self.X[exposedNode]==self.Q_S):
-                self.X[exposedNode] = self.Q_E
+                self.set_node_state(exposedNode, self.Q_E)
 
     def introduce_vaccined(self,num_new_vaccined):
          vaccinedNodes = numpy.random.choice(range(self.numNodes), size=num_new_vaccined, replace=False)
          for vaccinedNode in vaccinedNodes:
-            self.X[vaccinedNode] = self.R
+            self.set_node_state(vaccinedNode, self.R)
 
 
 
@@ -2530,6 +3334,7 @@ class ExtSEIRSNetworkModelVac ():
         self.N           = numpy.pad(self.N, [(0, 6*self.numNodes)], mode='constant', constant_values=0)
         self.numTested   = numpy.pad(self.numTested, [(0, 6*self.numNodes)], mode='constant', constant_values=0)
         self.numPositive = numpy.pad(self.numPositive, [(0, 6*self.numNodes)], mode='constant', constant_values=0)
+        self.engineSeries = numpy.pad(self.engineSeries, [(0, 6*self.numNodes)], mode='constant', constant_values='')
 
         if(self.store_Xseries):
             self.Xseries = numpy.pad(self.Xseries, [(0, 6*self.numNodes), (0,0)], mode='constant', constant_values=0)
@@ -2577,6 +3382,7 @@ class ExtSEIRSNetworkModelVac ():
         self.N           = numpy.array(self.N, dtype=float)[:self.tidx+1]
         self.numTested   = numpy.array(self.numTested, dtype=float)[:self.tidx+1]
         self.numPositive = numpy.array(self.numPositive, dtype=float)[:self.tidx+1]
+        self.engineSeries = self.engineSeries[:self.tidx+1]
 
         if(self.store_Xseries):
             self.Xseries = self.Xseries[:self.tidx+1, :]
@@ -2605,11 +3411,31 @@ class ExtSEIRSNetworkModelVac ():
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-    def run_iteration(self):
+    def time_to_next_scheduled_event(self):
+        # Time until the next change of the system that does not come from the propensities: the next checkpoint
+        # (or other event scheduled by the caller through nextCheckpointTime), the next release from isolation or
+        # the end of the run. The engines skip ahead to it in a single step when no event can occur.
+        # With timer-dependent time_in_state propensities, the step ends just after the earliest time in state
+        # to run out instead if that comes first (on the grid of 0.01 days of the idle steps it replaces).
+        tNext = min(self.tmax, self.nextCheckpointTime)
+        if(len(self.isolationQueue) > 0):
+            tNext = min(tNext, self.isolationQueue[0][0] + self.isolationTime)
+        tau = tNext - self.t
+
+        if(self.timerQueue is not None):
+            # (the head of the timer queue is the earliest time in state to run out, once stale entries are dropped)
+            while(len(self.timerQueue) > 0 and not self.timer_entry_valid(self.timerQueue[0])):
+                heapq.heappop(self.timerQueue)
+            if(len(self.timerQueue) > 0 and self.timerQueue[0][0] - self.t < tau):
+                tau = 0.01*(numpy.floor((self.timerQueue[0][0] - self.t)/0.01) + 1)
+
+        return tau if tau > 0 else 0.01
 
-        if(self.tidx >= len(self.tseries)-1):
-            # Room has run out in the timeseries storage arrays; double the size of these arrays:
-            self.increase_data_series_length()
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def gillespie_step(self):
+        # Select the next event by Gillespie's direct method.
+        # Returns the time until the event and the node and type of the transition (None if no event can occur).
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         # Generate 2 random numbers uniformly distributed in (0,1)
@@ -2618,49 +3444,205 @@ class ExtSEIRSNetworkModelVac ():
         r2 = numpy.random.rand()
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        # Calculate propensities
+        # Calculate alpha (the total propensity, kept at the root of the sum tree)
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        propensities, transitionTypes = self.calc_propensities()
+        alpha = self.propensityTree.total()
 
-        if(propensities.sum() > 0):
+        if(alpha <= 0):
+            return (self.time_to_next_scheduled_event(), None, None)
 
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            # Calculate alpha
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            propensities_flat   = propensities.ravel(order='F')
-            cumsum              = propensities_flat.cumsum()
-            alpha               = propensities_flat.sum()
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Compute the time until the next event takes place
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        tau = (1/alpha)*numpy.log(float(1/r1))
 
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            # Compute the time until the next event takes place
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            tau = (1/alpha)*numpy.log(float(1/r1))
-            self.t += tau
-            self.timer_state += tau
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Compute which event takes place
+        # (the transition type is picked first from the per-type totals at the top of the sum tree,
+        #  skipping types with zero total, then the node within the type)
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        transitionNode, transitionIdx = self.propensityTree.sample(r2*alpha)
 
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            # Compute which event takes place
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            transitionIdx   = numpy.searchsorted(cumsum,r2*alpha)
-            transitionNode  = transitionIdx % self.numNodes
-            transitionType  = transitionTypes[ int(transitionIdx/self.numNodes) ]
+        return (tau, transitionNode, self.propensityTypes[transitionIdx])
 
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            # Perform updates triggered by rate propensities:
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-            assert(self.X[transitionNode] == self.transitions[transitionType]['currentState'] and self.X[transitionNode]!=self.F), "Assertion error: Node "+str(transitionNode)+" has unexpected current state "+str(self.X[transitionNode])+" given the intended transition of "+str(transitionType)+"."
-            self.X[transitionNode] = self.transitions[transitionType]['newState']
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-            self.testedInCurrentState[transitionNode] = False
+    def next_reaction_step(self):
+        # Select the next event by the next reaction method (Gibson & Bruck 2000):
+        # the event is the reaction channel with the earliest putative firing time in the queue.
+        # Returns the time until the event and the node and type of the transition (None if no event can occur).
+        tNext, channel = self.nextReactionQueue.peek()
 
-            self.timer_state[transitionNode] = 0.0
+        if(tNext == numpy.inf):
+            return (self.time_to_next_scheduled_event(), None, None)
 
-            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # The fired channel gets a new firing time when the queue is next updated:
+        self.nextReactionQueue.update(numpy.array([channel]), numpy.array([numpy.inf]))
 
-            # Save information about infection events when they occur:
-            if(transitionType == 'StoE' or transitionType == 'QStoQE'):
-                transitionNode_GNbrs  = list(self.G[transitionNode].keys())
-                transitionNode_GQNbrs = list(self.G_Q[transitionNode].keys())
+        numColumns = self.propensities.shape[1]
+        if(channel >= numColumns*self.numNodes):
+            # Aggregate channel of a global interaction column; draw the transitioning node within the column:
+            transitionIdx  = channel - numColumns*self.numNodes
+            transitionNode = self.propensityTree.sample_column(transitionIdx, numpy.random.rand()*self.propensityTree.column_sum(transitionIdx))
+            self.channelRates[transitionIdx] = 0
+        else:
+            transitionIdx, transitionNode = divmod(channel, self.numNodes)
+            # (the node's channels are revisited even if the transition leaves its state unchanged)
+            self.dirtyNodes.append(transitionNode)
+
+        return (tNext - self.t, transitionNode, self.propensityTypes[transitionIdx])
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def tau_leap_step(self):
+        # Select the events of an approximate tau-leap: every node with a nonzero propensity fires one of its
+        # transitions within the leap with probability 1-exp(-(total node propensity)*tau).
+        # A node's own propensities are constant until it transitions, except for those that depend on the states
+        # of other nodes (exposure to infectious nodes), so the leap size follows Cao, Gillespie & Petzold (2006)
+        # for the infectious compartments: their expected change and standard deviation within the leap are bounded
+        # by a fraction epsilon of their size (and by one node for small compartments). When the leap would only
+        # cover a few events, an exact step is taken instead.
+        # Returns the leap size and the lists of transitioning nodes and their transition types.
+        alpha = self.propensityTree.total()
+
+        if(alpha <= 0):
+            return (self.time_to_next_scheduled_event(), [], [])
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Choose the leap size
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        columnTotals    = self.propensityTree.column_totals()
+        currentStates   = numpy.array([int(self.transitions[transitionType]['currentState']) for transitionType in self.propensityTypes])
+        newStates       = numpy.array([int(self.transitions[transitionType]['newState']) for transitionType in self.propensityTypes])
+        numStates       = len(self.stateCounts)
+        stateCounts     = self.stateCounts
+        meanChange      = numpy.bincount(newStates, weights=columnTotals, minlength=numStates) - numpy.bincount(currentStates, weights=columnTotals, minlength=numStates)
+        varChange       = numpy.bincount(newStates, weights=columnTotals, minlength=numStates) + numpy.bincount(currentStates, weights=columnTotals, minlength=numStates)
+        infectiousStates = list(self.infectiousClass.keys())
+        maxChange       = numpy.maximum(self.tau_leap_epsilon*stateCounts[infectiousStates], 1)
+        with numpy.errstate(divide='ignore'):
+            tau = min(numpy.min(maxChange/numpy.abs(meanChange[infectiousStates])), numpy.min(maxChange**2/varChange[infectiousStates]))
+        tau = min(tau, self.tmax - self.t, self.nextCheckpointTime - self.t)
+
+        if(tau*alpha < 10):
+            # Too few events to be worth leaping over:
+            tau, transitionNode, transitionType = self.gillespie_step()
+            return (tau, [transitionNode], [transitionType])
+
+        transitionNodes, transitionTypes = self.draw_transitions(tau)
+        return (tau, transitionNodes, transitionTypes)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def daily_step(self):
+        # Select the events of a chain-binomial step of fixed length (daily_dt, shortened so as not to step over
+        # the next checkpoint or tmax): every node leaves its state within the step with probability
+        # min((total node propensity)*dt, 1), with the propensities (infection pressure included) of the start of the step.
+        # The transitions take effect at the end of the step, so the time spent in a state is a whole number of steps;
+        # this exit probability keeps its mean at 1/propensity, where 1-exp(-propensity*dt) would lengthen it
+        # (to dt/(1-exp(-propensity*dt)), e.g. 2.05 instead of 1.5 days for lamda=1/1.5 at dt=1).
+        # Steps of a day remain biased even so: on an 8-regular graph (N=2000, 30 runs) the peak number of infected
+        # was 776 against 737 (SD 27) with gillespie, and 861 with 1-exp(-propensity*dt); at the default dt=0.25 it was 745.
+        # Returns the step size and the lists of transitioning nodes and their transition types.
+        tau = min(self.daily_dt, self.tmax - self.t, self.nextCheckpointTime - self.t)
+        if(tau <= 0):
+            tau = self.daily_dt
+
+        if(self.propensityTree.total() <= 0):
+            return (self.time_to_next_scheduled_event(), [], [])
+
+        transitionNodes, transitionTypes = self.draw_transitions(tau, fixed_step=True)
+        return (tau, transitionNodes, transitionTypes)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def draw_transitions(self, tau, fixed_step=False):
+        # Draw the nodes that transition within a step of length tau and which transition each of them takes
+        # (in proportion to its propensities). A node transitions with probability 1-exp(-(total node propensity)*tau),
+        # or min((total node propensity)*tau, 1) in the fixed steps of the daily engine (see daily_step):
+        nodePropensities    = self.propensities * self.propensityTree.scales[:self.propensities.shape[1]]
+        nodeTotals          = nodePropensities.sum(axis=1)
+        exitProbabilities   = numpy.minimum(nodeTotals*tau, 1) if fixed_step else -numpy.expm1(-nodeTotals*tau)
+        transitionNodes     = numpy.flatnonzero(numpy.random.rand(self.numNodes) < exitProbabilities)
+        cumPropensities     = nodePropensities[transitionNodes].cumsum(axis=1)
+        r                   = numpy.random.rand(len(transitionNodes)) * nodeTotals[transitionNodes]
+        transitionIdxs      = numpy.minimum(numpy.count_nonzero(cumPropensities <= r[:,None], axis=1), self.propensities.shape[1]-1)
+
+        return (list(transitionNodes), [self.propensityTypes[transitionIdx] for transitionIdx in transitionIdxs])
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update_hybrid_engine(self):
+        # Choose the engine of the next step of the hybrid engine from the current number of infected individuals:
+        # exact (gillespie) steps while few are infected, so that introductions and fade-outs are simulated event
+        # by event, and approximate steps (hybrid_engine) once the number reaches hybrid_threshold.
+        # The engine only switches back below half the threshold, so that it does not alternate at every step
+        # while the number of infected hovers around the threshold.
+        # (both engines keep the propensities in the same way, so no structures need to be rebuilt on a switch)
+        numInfected = self.total_num_infected(self.tidx)
+        if(self.activeEngine == 'gillespie' and numInfected >= self.hybrid_threshold):
+            self.activeEngine = self.hybrid_engine
+        elif(self.activeEngine != 'gillespie' and numInfected < self.hybrid_threshold/2):
+            self.activeEngine = 'gillespie'
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def run_iteration(self):
+
+        if(self.tidx >= len(self.tseries)-1):
+            # Room has run out in the timeseries storage arrays; double the size of these arrays:
+            self.increase_data_series_length()
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Calculate propensities
+        # (only the rows of nodes affected by previous events are recalculated)
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.update_propensities()
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Compute when the next event(s) take place and which events they are
+        # (a tau-leap or daily step may comprise many events, the exact engines give at most one)
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        if(self.engine == 'hybrid'):
+            self.update_hybrid_engine()
+
+        if(self.activeEngine == 'tau_leap'):
+            tau, transitionNodes, transitionTypes = self.tau_leap_step()
+        elif(self.activeEngine == 'daily'):
+            tau, transitionNodes, transitionTypes = self.daily_step()
+        else:
+            if(self.activeEngine == 'next_reaction'):
+                tau, transitionNode, transitionType = self.next_reaction_step()
+            else:
+                tau, transitionNode, transitionType = self.gillespie_step()
+            transitionNodes, transitionTypes = ([transitionNode], [transitionType])
+
+        self.t += tau
+
+        for transitionNode, transitionType in zip(transitionNodes, transitionTypes):
+
+            if(transitionType is None):
+                continue
+
+            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            # Perform updates triggered by rate propensities:
+            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            assert(self.X[transitionNode] == self.transitions[transitionType]['currentState'] and self.X[transitionNode]!=self.F), "Assertion error: Node "+str(transitionNode)+" has unexpected current state "+str(self.X[transitionNode])+" given the intended transition of "+str(transitionType)+"."
+            self.set_node_state(transitionNode, self.transitions[transitionType]['newState'])
+
+            self.testedInCurrentState[transitionNode] = False
+
+            self.stateEntryTime[transitionNode] = self.t
+            # (the clock restarts even on a transition back into the same state, which leaves the node's rows to refresh)
+            self.dirtyNodes.append(transitionNode)
+
+            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+            # Save information about infection events when they occur:
+            if(transitionType == 'StoE' or transitionType == 'QStoQE'):
+                transitionNode_GNbrs  = list(self.G.neighbors(transitionNode)) if isinstance(self.G, EdgeMaskedGraph) else list(self.G[transitionNode].keys())
+                transitionNode_GQNbrs = list(self.G_Q.neighbors(transitionNode)) if isinstance(self.G_Q, EdgeMaskedGraph) else list(self.G_Q[transitionNode].keys())
                 self.infectionsLog.append({ 't':                            self.t,
                                             'infected_node':                transitionNode,
                                             'infection_type':               transitionType,
@@ -2677,33 +3659,26 @@ class ExtSEIRSNetworkModelVac ():
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        else:
-
-            tau = 0.01
-            self.t += tau
-            self.timer_state += tau
-
-        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-
         self.tidx += 1
 
         self.tseries[self.tidx]     = self.t
-        self.numS[self.tidx]        = numpy.clip(numpy.count_nonzero(self.X==self.S), a_min=0, a_max=self.numNodes)
-        self.numE[self.tidx]        = numpy.clip(numpy.count_nonzero(self.X==self.E), a_min=0, a_max=self.numNodes)
-        self.numI_pre[self.tidx]    = numpy.clip(numpy.count_nonzero(self.X==self.I_pre), a_min=0, a_max=self.numNodes)
-        self.numI_sym[self.tidx]    = numpy.clip(numpy.count_nonzero(self.X==self.I_sym), a_min=0, a_max=self.numNodes)
-        self.numI_asym[self.tidx]   = numpy.clip(numpy.count_nonzero(self.X==self.I_asym), a_min=0, a_max=self.numNodes)
-        self.numH[self.tidx]        = numpy.clip(numpy.count_nonzero(self.X==self.H), a_min=0, a_max=self.numNodes)
-        self.numR[self.tidx]        = numpy.clip(numpy.count_nonzero(self.X==self.R), a_min=0, a_max=self.numNodes)
-        self.numF[self.tidx]        = numpy.clip(numpy.count_nonzero(self.X==self.F), a_min=0, a_max=self.numNodes)
-        self.numQ_S[self.tidx]      = numpy.clip(numpy.count_nonzero(self.X==self.Q_S), a_min=0, a_max=self.numNodes)
-        self.numQ_E[self.tidx]      = numpy.clip(numpy.count_nonzero(self.X==self.Q_E), a_min=0, a_max=self.numNodes)
-        self.numQ_pre[self.tidx]    = numpy.clip(numpy.count_nonzero(self.X==self.Q_pre), a_min=0, a_max=self.numNodes)
-        self.numQ_sym[self.tidx]    = numpy.clip(numpy.count_nonzero(self.X==self.Q_sym), a_min=0, a_max=self.numNodes)
-        self.numQ_asym[self.tidx]   = numpy.clip(numpy.count_nonzero(self.X==self.Q_asym), a_min=0, a_max=self.numNodes)
-        self.numQ_R[self.tidx]      = numpy.clip(numpy.count_nonzero(self.X==self.Q_R), a_min=0, a_max=self.numNodes)
-        self.numTested[self.tidx]   = numpy.clip(numpy.count_nonzero(self.tested), a_min=0, a_max=self.numNodes)
-        self.numPositive[self.tidx] = numpy.clip(numpy.count_nonzero(self.positive), a_min=0, a_max=self.numNodes)
+        self.engineSeries[self.tidx] = self.activeEngine
+        self.numS[self.tidx]        = self.stateCounts[self.S]
+        self.numE[self.tidx]        = self.stateCounts[self.E]
+        self.numI_pre[self.tidx]    = self.stateCounts[self.I_pre]
+        self.numI_sym[self.tidx]    = self.stateCounts[self.I_sym]
+        self.numI_asym[self.tidx]   = self.stateCounts[self.I_asym]
+        self.numH[self.tidx]        = self.stateCounts[self.H]
+        self.numR[self.tidx]        = self.stateCounts[self.R]
+        self.numF[self.tidx]        = self.stateCounts[self.F]
+        self.numQ_S[self.tidx]      = self.stateCounts[self.Q_S]
+        self.numQ_E[self.tidx]      = self.stateCounts[self.Q_E]
+        self.numQ_pre[self.tidx]    = self.stateCounts[self.Q_pre]
+        self.numQ_sym[self.tidx]    = self.stateCounts[self.Q_sym]
+        self.numQ_asym[self.tidx]   = self.stateCounts[self.Q_asym]
+        self.numQ_R[self.tidx]      = self.stateCounts[self.Q_R]
+        self.numTested[self.tidx]   = self.testedCount
+        self.numPositive[self.tidx] = self.positiveCount
 
         self.N[self.tidx]           = numpy.clip((self.numNodes - self.numF[self.tidx]), a_min=0, a_max=self.numNodes)
 
@@ -2711,12 +3686,10 @@ class ExtSEIRSNetworkModelVac ():
         # Update testing and isolation statuses
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        isolatedNodes = numpy.argwhere((self.X==self.Q_S)|(self.X==self.Q_E)|(self.X==self.Q_pre)|(self.X==self.Q_sym)|(self.X==self.Q_asym)|(self.X==self.Q_R))[:,0].flatten()
-        self.timer_isolation[isolatedNodes] = self.timer_isolation[isolatedNodes] + tau
-
-        nodesExitingIsolation = numpy.argwhere(self.timer_isolation >= self.isolationTime)
-        for isoNode in nodesExitingIsolation:
-            self.set_isolation(node=isoNode, isolate=False)
+        while(len(self.isolationQueue) > 0 and self.isolationQueue[0][0] + self.isolationTime <= self.t):
+            isolationEntryTime, isoNode = heapq.heappop(self.isolationQueue)
+            if(self.isolationEntryTime[isoNode] == isolationEntryTime):
+                self.set_isolation(node=isoNode, isolate=False)
 
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         # Store system states
@@ -2759,12 +3732,21 @@ class ExtSEIRSNetworkModelVac ():
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 #^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-    def run(self, T, checkpoints=None, print_interval=10, verbose='t'):
+    def run(self, T, checkpoints=None, print_interval=10, verbose='t', engine=None):
         if(T>0):
             self.tmax += T
         else:
             return False
 
+        if(engine is not None and engine != self.engine):
+            assert(engine in ['gillespie', 'next_reaction', 'tau_leap', 'daily', 'hybrid']), "Unknown simulation engine "+str(engine)+"."
+            self.engine = engine
+            self.activeEngine = 'gillespie' if self.engine == 'hybrid' else self.engine
+            # Propensities (and next reaction times) are kept differently by each engine:
+            self.propensities       = None
+            self.nextReactionQueue  = None
+            self.timerQueue         = None
+
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         # Pre-process checkpoint values:
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -2778,6 +3760,7 @@ class ExtSEIRSNetworkModelVac ():
                 checkpoints = None
             else:
                 checkpointTime = checkpoints['t'][checkpointIdx]
+        self.nextCheckpointTime = checkpointTime if checkpoints else numpy.inf
 
         #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
         # Run the simulation loop:
@@ -2794,12 +3777,8 @@ class ExtSEIRSNetworkModelVac ():
                 if(self.t >= checkpointTime):
                     if(verbose is not False):
                         print("[Checkpoint: Updating parameters]")
-                    # A checkpoint has been reached, update param values:
-                    for param in list(self.parameters.keys()):
-                        if(param in list(checkpoints.keys())):
-                            self.parameters.update({param: checkpoints[param][checkpointIdx]})
-                    # Update parameter data structures and scenario flags:
-                    self.update_parameters()
+                    # A checkpoint has been reached, update param values (and parameter data structures):
+                    self.apply_checkpoint(checkpoints, checkpointIdx)
                     # Update the next checkpoint time:
                     checkpointIdx  = numpy.searchsorted(checkpoints['t'], self.t) # Finds 1st index in list greater than given val
                     if(checkpointIdx >= numCheckpoints):
@@ -2807,6 +3786,7 @@ class ExtSEIRSNetworkModelVac ():
                         checkpoints = None
                     else:
                         checkpointTime = checkpoints['t'][checkpointIdx]
+                    self.nextCheckpointTime = checkpointTime if checkpoints else numpy.inf
             #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
             #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -3217,3 +4197,1508 @@ class ExtSEIRSNetworkModelVac ():
 
 #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+
+
+class ExtSEIRSParameterBundle():
+    """
+    Parameter data structures of the Extended SEIRS Network Model for one set of parameter values
+    ===================================================
+    Holds the adjacency matrices, per-node parameter arrays and pairwise transmission matrices derived from a parameters
+    dict (as ExtSEIRSNetworkModelVac.parameters). A bundle is built once and then set on models by reference
+    (ExtSEIRSNetworkModelVac.set_parameter_bundle), e.g. for all checkpoints of a run (compile_checkpoints),
+    and may be shared by any number of models over the same network. It is never modified after construction.
+    When a base bundle is given, only the structures that depend on parameters whose values differ from those of the
+    base bundle are rebuilt, the others are taken over from the base bundle by reference. Parameter values are compared
+    by identity (scalars and strings by value), so lists/arrays must be replaced rather than modified in place.
+    Params:
+            parameters      Dict of model parameter values
+            base            Bundle for preceding parameter values of the same model (optional)
+    """
+    def __init__(self, parameters, base=None):
+
+        self.parameters = dict(parameters)
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Changed parameters:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Names of the parameters (and, as they are rebuilt, of the derived structures) that differ from the base bundle:
+        if(base is not None):
+            self.__dict__.update({attr: value for attr, value in base.__dict__.items() if attr != 'parameters'})
+            changed = set(param for param in self.parameters if not self.same_value(self.parameters[param], base.parameters.get(param)))
+        else:
+            changed = set(self.parameters.keys())
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Model graphs:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        if('G' in changed):
+            self.G = self.parameters['G']
+            # Adjacency matrix:
+            if type(self.G)==numpy.ndarray:
+                self.A = scipy.sparse.csr_matrix(self.G)
+            elif type(self.G)==networkx.classes.graph.Graph:
+                self.A = networkx.adj_matrix(self.G) # adj_matrix gives scipy.sparse csr_matrix
+            elif isinstance(self.G, EdgeMaskedGraph):
+                self.A = self.G.adjacency()
+            else:
+                raise BaseException("Input an adjacency matrix, networkx object or EdgeMaskedGraph only.")
+            self.numNodes   = int(self.A.shape[1])
+            self.degree     = numpy.asarray(self.node_degrees(self.A)).astype(float)
+            self.A_csc      = scipy.sparse.csc_matrix(self.A)
+            changed.add('A')
+        #----------------------------------------
+        if('G_Q' in changed or ('A' in changed and self.parameters['G_Q'] is None)):
+            if(self.parameters['G_Q'] is None):
+                self.G_Q = self.G # If no Q graph is provided, use G in its place
+            else:
+                self.G_Q = self.parameters['G_Q']
+            # Quarantine Adjacency matrix:
+            if type(self.G_Q)==numpy.ndarray:
+                self.A_Q = scipy.sparse.csr_matrix(self.G_Q)
+            elif type(self.G_Q)==networkx.classes.graph.Graph:
+                self.A_Q = networkx.adj_matrix(self.G_Q) # adj_matrix gives scipy.sparse csr_matrix
+            elif isinstance(self.G_Q, EdgeMaskedGraph):
+                self.A_Q = self.G_Q.adjacency()
+            else:
+                raise BaseException("Input an adjacency matrix, networkx object or EdgeMaskedGraph only.")
+            self.numNodes_Q   = int(self.A_Q.shape[1])
+            self.degree_Q     = numpy.asarray(self.node_degrees(self.A_Q)).astype(float)
+            self.A_Q_csc      = scipy.sparse.csc_matrix(self.A_Q)
+            changed.add('A_Q')
+        #----------------------------------------
+        assert(self.numNodes == self.numNodes_Q), "The normal and quarantine adjacency graphs must be of the same size."
+        if(base is not None and self.numNodes != base.numNodes):
+            # Per-node structures of the base bundle do not apply to a graph of another size:
+            changed.update(self.parameters.keys())
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Model parameters:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Per-node parameter arrays (and the parameter whose array is used in place of a parameter given as None):
+        nodeParameters = [('beta', None), ('beta_asym', 'beta'), ('sigma', None), ('lamda', None), ('gamma', None), ('eta', None),
+                          ('gamma_asym', 'gamma'), ('gamma_H', 'gamma'), ('mu_H', None), ('alpha', None), ('xi', None), ('mu_0', None),
+                          ('nu', None), ('a', None), ('h', None), ('f', None), ('p', None), ('o', None),
+                          # External infection introduction variables:
+                          ('prevalence_ext', None),
+                          # Vaccination parameters:
+                          ('qu', None), ('fi', None),
+                          # Testing-related parameters:
+                          ('beta_Q', 'beta'), ('sigma_Q', 'sigma'), ('lamda_Q', 'lamda'), ('gamma_Q_sym', 'gamma'), ('gamma_Q_asym', 'gamma'),
+                          ('eta_Q', 'eta'), ('alpha_Q', 'alpha'),
+                          ('theta_S', None), ('theta_E', None), ('theta_pre', None), ('theta_sym', None), ('theta_asym', None),
+                          ('phi_S', None), ('phi_E', None), ('phi_pre', None), ('phi_sym', None), ('phi_asym', None),
+                          ('psi_S', None), ('psi_E', None), ('psi_pre', None), ('psi_sym', None), ('psi_asym', None), ('q', None)]
+        for param, default in nodeParameters:
+            value = self.parameters[param]
+            if(value is None and default is not None):
+                if(default in changed or param in changed):
+                    setattr(self, param, getattr(self, default))
+                    changed.add(param)
+            elif(param in changed):
+                setattr(self, param, numpy.array(value).reshape((self.numNodes, 1)) if isinstance(value, (list, numpy.ndarray)) else numpy.full(fill_value=value, shape=(self.numNodes,1)))
+                changed.add(param)
+
+        #----------------------------------------
+
+        self.beta_pairwise_mode = self.parameters['beta_pairwise_mode']
+
+        #----------------------------------------
+        # Global transmission parameters:
+        #----------------------------------------
+        if(changed & {'beta', 'beta_Q', 'beta_asym', 'beta_pairwise_mode'}):
+            if(self.beta_pairwise_mode == 'infected' or self.beta_pairwise_mode is None):
+                self.beta_global         = numpy.full_like(self.beta, fill_value=numpy.mean(self.beta))
+                self.beta_Q_global       = numpy.full_like(self.beta_Q, fill_value=numpy.mean(self.beta_Q))
+                self.beta_asym_global    = numpy.full_like(self.beta_asym, fill_value=numpy.mean(self.beta_asym))
+            elif(self.beta_pairwise_mode == 'infectee'):
+                self.beta_global         = self.beta
+                self.beta_Q_global       = self.beta_Q
+                self.beta_asym_global    = self.beta_asym
+            elif(self.beta_pairwise_mode == 'min'):
+                self.beta_global         = numpy.minimum(self.beta, numpy.mean(self.beta))
+                self.beta_Q_global       = numpy.minimum(self.beta_Q, numpy.mean(self.beta_Q))
+                self.beta_asym_global    = numpy.minimum(self.beta_asym, numpy.mean(self.beta_asym))
+            elif(self.beta_pairwise_mode == 'max'):
+                self.beta_global         = numpy.maximum(self.beta, numpy.mean(self.beta))
+                self.beta_Q_global       = numpy.maximum(self.beta_Q, numpy.mean(self.beta_Q))
+                self.beta_asym_global    = numpy.maximum(self.beta_asym, numpy.mean(self.beta_asym))
+            elif(self.beta_pairwise_mode == 'mean'):
+                self.beta_global         = (self.beta + numpy.full_like(self.beta, fill_value=numpy.mean(self.beta)))/2
+                self.beta_Q_global       = (self.beta_Q + numpy.full_like(self.beta_Q, fill_value=numpy.mean(self.beta_Q)))/2
+                self.beta_asym_global    = (self.beta_asym + numpy.full_like(self.beta_asym, fill_value=numpy.mean(self.beta_asym)))/2
+
+        #----------------------------------------
+        # Local transmission parameters:
+        #----------------------------------------
+        # (the pairwise matrices are rebuilt only when their local betas, their adjacency matrix or the pairwise mode change)
+        if(changed & {'beta_local', 'beta', 'A', 'beta_pairwise_mode'}):
+            self.beta_local         = self.beta      if self.parameters['beta_local'] is None      else numpy.array(self.parameters['beta_local'])      if isinstance(self.parameters['beta_local'], (list, numpy.ndarray))      else numpy.full(fill_value=self.parameters['beta_local'], shape=(self.numNodes,1))
+            if(self.beta_local.ndim == 2 and self.beta_local.shape[0] == self.numNodes and self.beta_local.shape[1] == self.numNodes):
+                self.A_beta_pairwise = self.beta_local
+            elif((self.beta_local.ndim == 1 and self.beta_local.shape[0] == self.numNodes) or (self.beta_local.ndim == 2 and (self.beta_local.shape[0] == self.numNodes or self.beta_local.shape[1] == self.numNodes))):
+                self.beta_local = self.beta_local.reshape((self.numNodes,1))
+                # Pre-multiply beta values by the adjacency matrix ("transmission weight connections")
+                A_beta_pairwise_byInfected = scipy.sparse.csr_matrix.multiply(self.A, self.beta_local.T).tocsr()
+                A_beta_pairwise_byInfectee = scipy.sparse.csr_matrix.multiply(self.A, self.beta_local).tocsr()
+                #------------------------------
+                # Compute the effective pairwise beta values as a function of the infected/infectee pair:
+                if(self.beta_pairwise_mode == 'infected'):
+                    self.A_beta_pairwise = A_beta_pairwise_byInfected
+                elif(self.beta_pairwise_mode == 'infectee'):
+                    self.A_beta_pairwise = A_beta_pairwise_byInfectee
+                elif(self.beta_pairwise_mode == 'min'):
+                    self.A_beta_pairwise = scipy.sparse.csr_matrix.minimum(A_beta_pairwise_byInfected, A_beta_pairwise_byInfectee)
+                elif(self.beta_pairwise_mode == 'max'):
+                    self.A_beta_pairwise = scipy.sparse.csr_matrix.maximum(A_beta_pairwise_byInfected, A_beta_pairwise_byInfectee)
+                elif(self.beta_pairwise_mode == 'mean' or self.beta_pairwise_mode is None):
+                    self.A_beta_pairwise = (A_beta_pairwise_byInfected + A_beta_pairwise_byInfectee)/2
+                else:
+                    print("Unrecognized beta_pairwise_mode value (support for 'infected', 'infectee', 'min', 'max', and 'mean').")
+            else:
+                print("Invalid values given for beta_local (expected 1xN list/array or NxN 2d array)")
+            changed.add('A_beta_pairwise')
+        #----------------------------------------
+        if(changed & {'beta_Q_local', 'beta_Q', 'A_Q', 'beta_pairwise_mode'}):
+            self.beta_Q_local       = self.beta_Q    if self.parameters['beta_Q_local'] is None    else numpy.array(self.parameters['beta_Q_local'])    if isinstance(self.parameters['beta_Q_local'], (list, numpy.ndarray))    else numpy.full(fill_value=self.parameters['beta_Q_local'], shape=(self.numNodes,1))
+            if(self.beta_Q_local.ndim == 2 and self.beta_Q_local.shape[0] == self.numNodes and self.beta_Q_local.shape[1] == self.numNodes):
+                self.A_Q_beta_Q_pairwise = self.beta_Q_local
+            elif((self.beta_Q_local.ndim == 1 and self.beta_Q_local.shape[0] == self.numNodes) or (self.beta_Q_local.ndim == 2 and (self.beta_Q_local.shape[0] == self.numNodes or self.beta_Q_local.shape[1] == self.numNodes))):
+                self.beta_Q_local = self.beta_Q_local.reshape((self.numNodes,1))
+                # Pre-multiply beta_Q values by the isolation adjacency matrix ("transmission weight connections")
+                A_Q_beta_Q_pairwise_byInfected      = scipy.sparse.csr_matrix.multiply(self.A_Q, self.beta_Q_local.T).tocsr()
+                A_Q_beta_Q_pairwise_byInfectee      = scipy.sparse.csr_matrix.multiply(self.A_Q, self.beta_Q_local).tocsr()
+                #------------------------------
+                # Compute the effective pairwise beta values as a function of the infected/infectee pair:
+                if(self.beta_pairwise_mode == 'infected'):
+                    self.A_Q_beta_Q_pairwise = A_Q_beta_Q_pairwise_byInfected
+                elif(self.beta_pairwise_mode == 'infectee'):
+                    self.A_Q_beta_Q_pairwise = A_Q_beta_Q_pairwise_byInfectee
+                elif(self.beta_pairwise_mode == 'min'):
+                    self.A_Q_beta_Q_pairwise = scipy.sparse.csr_matrix.minimum(A_Q_beta_Q_pairwise_byInfected, A_Q_beta_Q_pairwise_byInfectee)
+                elif(self.beta_pairwise_mode == 'max'):
+                    self.A_Q_beta_Q_pairwise = scipy.sparse.csr_matrix.maximum(A_Q_beta_Q_pairwise_byInfected, A_Q_beta_Q_pairwise_byInfectee)
+                elif(self.beta_pairwise_mode == 'mean' or self.beta_pairwise_mode is None):
+                    self.A_Q_beta_Q_pairwise = (A_Q_beta_Q_pairwise_byInfected + A_Q_beta_Q_pairwise_byInfectee)/2
+                else:
+                    print("Unrecognized beta_pairwise_mode value (support for 'infected', 'infectee', 'min', 'max', and 'mean').")
+            else:
+                print("Invalid values given for beta_Q_local (expected 1xN list/array or NxN 2d array)")
+            changed.add('A_Q_beta_Q_pairwise')
+        #----------------------------------------
+        if(changed & {'beta_asym_local', 'A', 'beta_pairwise_mode'}):
+            self.beta_asym_local    = None           if self.parameters['beta_asym_local'] is None else numpy.array(self.parameters['beta_asym_local']) if isinstance(self.parameters['beta_asym_local'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['beta_asym_local'], shape=(self.numNodes,1))
+            if(self.beta_asym_local is None):
+                self.A_beta_asym_pairwise = None
+            elif(self.beta_asym_local.ndim == 2 and self.beta_asym_local.shape[0] == self.numNodes and self.beta_asym_local.shape[1] == self.numNodes):
+                self.A_beta_asym_pairwise = self.beta_asym_local
+            elif((self.beta_asym_local.ndim == 1 and self.beta_asym_local.shape[0] == self.numNodes) or (self.beta_asym_local.ndim == 2 and (self.beta_asym_local.shape[0] == self.numNodes or self.beta_asym_local.shape[1] == self.numNodes))):
+                self.beta_asym_local = self.beta_asym_local.reshape((self.numNodes,1))
+                # Pre-multiply beta_asym values by the adjacency matrix ("transmission weight connections")
+                A_beta_asym_pairwise_byInfected      = scipy.sparse.csr_matrix.multiply(self.A, self.beta_asym_local.T).tocsr()
+                A_beta_asym_pairwise_byInfectee      = scipy.sparse.csr_matrix.multiply(self.A, self.beta_asym_local).tocsr()
+                #------------------------------
+                # Compute the effective pairwise beta values as a function of the infected/infectee pair:
+                if(self.beta_pairwise_mode == 'infected'):
+                    self.A_beta_asym_pairwise = A_beta_asym_pairwise_byInfected
+                elif(self.beta_pairwise_mode == 'infectee'):
+                    self.A_beta_asym_pairwise = A_beta_asym_pairwise_byInfectee
+                elif(self.beta_pairwise_mode == 'min'):
+                    self.A_beta_asym_pairwise = scipy.sparse.csr_matrix.minimum(A_beta_asym_pairwise_byInfected, A_beta_asym_pairwise_byInfectee)
+                elif(self.beta_pairwise_mode == 'max'):
+                    self.A_beta_asym_pairwise = scipy.sparse.csr_matrix.maximum(A_beta_asym_pairwise_byInfected, A_beta_asym_pairwise_byInfectee)
+                elif(self.beta_pairwise_mode == 'mean' or self.beta_pairwise_mode is None):
+                    self.A_beta_asym_pairwise = (A_beta_asym_pairwise_byInfected + A_beta_asym_pairwise_byInfectee)/2
+                else:
+                    print("Unrecognized beta_pairwise_mode value (support for 'infected', 'infectee', 'min', 'max', and 'mean').")
+            else:
+                print("Invalid values given for beta_asym_local (expected 1xN list/array or NxN 2d array)")
+            changed.add('A_beta_asym_pairwise')
+
+        #----------------------------------------
+        # Degree-based transmission scaling parameters:
+        #----------------------------------------
+        self.delta_pairwise_mode = self.parameters['delta_pairwise_mode']
+        if(changed & {'delta', 'A', 'delta_pairwise_mode'}):
+            with numpy.errstate(divide='ignore'): # ignore log(0) warning, then convert log(0) = -inf -> 0.0
+                self.delta               = numpy.log(self.degree)/numpy.log(numpy.mean(self.degree))     if self.parameters['delta'] is None   else numpy.array(self.parameters['delta'])   if isinstance(self.parameters['delta'], (list, numpy.ndarray))   else numpy.full(fill_value=self.parameters['delta'], shape=(self.numNodes,1))
+            self.delta[numpy.isneginf(self.delta)] = 0.0
+            if(self.delta.ndim == 2 and self.delta.shape[0] == self.numNodes and self.delta.shape[1] == self.numNodes):
+                self.A_delta_pairwise = self.delta
+            elif((self.delta.ndim == 1 and self.delta.shape[0] == self.numNodes) or (self.delta.ndim == 2 and (self.delta.shape[0] == self.numNodes or self.delta.shape[1] == self.numNodes))):
+                self.delta = self.delta.reshape((self.numNodes,1))
+                # Pre-multiply delta values by the adjacency matrix ("transmission weight connections")
+                A_delta_pairwise_byInfected = scipy.sparse.csr_matrix.multiply(self.A, self.delta.T).tocsr()
+                A_delta_pairwise_byInfectee = scipy.sparse.csr_matrix.multiply(self.A, self.delta).tocsr()
+                #------------------------------
+                # Compute the effective pairwise delta values as a function of the infected/infectee pair:
+                if(self.delta_pairwise_mode == 'infected'):
+                    self.A_delta_pairwise = A_delta_pairwise_byInfected
+                elif(self.delta_pairwise_mode == 'infectee'):
+                    self.A_delta_pairwise = A_delta_pairwise_byInfectee
+                elif(self.delta_pairwise_mode == 'min'):
+                    self.A_delta_pairwise = scipy.sparse.csr_matrix.minimum(A_delta_pairwise_byInfected, A_delta_pairwise_byInfectee)
+                elif(self.delta_pairwise_mode == 'max'):
+                    self.A_delta_pairwise = scipy.sparse.csr_matrix.maximum(A_delta_pairwise_byInfected, A_delta_pairwise_byInfectee)
+                elif(self.delta_pairwise_mode == 'mean'):
+                    self.A_delta_pairwise = (A_delta_pairwise_byInfected + A_delta_pairwise_byInfectee)/2
+                elif(self.delta_pairwise_mode is None):
+                    self.A_delta_pairwise = self.A
+                else:
+                    print("Unrecognized delta_pairwise_mode value (support for 'infected', 'infectee', 'min', 'max', and 'mean').")
+            else:
+                print("Invalid values given for delta (expected 1xN list/array or NxN 2d array)")
+            changed.add('A_delta_pairwise')
+        #----------------------------------------
+        if(changed & {'delta_Q', 'A_Q', 'A', 'delta_pairwise_mode'}):
+            with numpy.errstate(divide='ignore'): # ignore log(0) warning, then convert log(0) = -inf -> 0.0
+                self.delta_Q             = numpy.log(self.degree_Q)/numpy.log(numpy.mean(self.degree_Q)) if self.parameters['delta_Q'] is None else numpy.array(self.parameters['delta_Q']) if isinstance(self.parameters['delta_Q'], (list, numpy.ndarray)) else numpy.full(fill_value=self.parameters['delta_Q'], shape=(self.numNodes,1))
+            self.delta_Q[numpy.isneginf(self.delta_Q)] = 0.0
+            if(self.delta_Q.ndim == 2 and self.delta_Q.shape[0] == self.numNodes and self.delta_Q.shape[1] == self.numNodes):
+                self.A_Q_delta_Q_pairwise = self.delta_Q
+            elif((self.delta_Q.ndim == 1 and self.delta_Q.shape[0] == self.numNodes) or (self.delta_Q.ndim == 2 and (self.delta_Q.shape[0] == self.numNodes or self.delta_Q.shape[1] == self.numNodes))):
+                self.delta_Q = self.delta_Q.reshape((self.numNodes,1))
+                # Pre-multiply delta_Q values by the isolation adjacency matrix ("transmission weight connections")
+                A_Q_delta_Q_pairwise_byInfected      = scipy.sparse.csr_matrix.multiply(self.A_Q, self.delta_Q).tocsr()
+                A_Q_delta_Q_pairwise_byInfectee      = scipy.sparse.csr_matrix.multiply(self.A_Q, self.delta_Q.T).tocsr()
+                #------------------------------
+                # Compute the effective pairwise delta values as a function of the infected/infectee pair:
+                if(self.delta_pairwise_mode == 'infected'):
+                    self.A_Q_delta_Q_pairwise = A_Q_delta_Q_pairwise_byInfected
+                elif(self.delta_pairwise_mode == 'infectee'):
+                    self.A_Q_delta_Q_pairwise = A_Q_delta_Q_pairwise_byInfectee
+                elif(self.delta_pairwise_mode == 'min'):
+                    self.A_Q_delta_Q_pairwise = scipy.sparse.csr_matrix.minimum(A_Q_delta_Q_pairwise_byInfected, A_Q_delta_Q_pairwise_byInfectee)
+                elif(self.delta_pairwise_mode == 'max'):
+                    self.A_Q_delta_Q_pairwise = scipy.sparse.csr_matrix.maximum(A_Q_delta_Q_pairwise_byInfected, A_Q_delta_Q_pairwise_byInfectee)
+                elif(self.delta_pairwise_mode == 'mean'):
+                    self.A_Q_delta_Q_pairwise = (A_Q_delta_Q_pairwise_byInfected + A_Q_delta_Q_pairwise_byInfectee)/2
+                elif(self.delta_pairwise_mode is None):
+                    self.A_Q_delta_Q_pairwise = self.A
+                else:
+                    print("Unrecognized delta_pairwise_mode value (support for 'infected', 'infectee', 'min', 'max', and 'mean').")
+            else:
+                print("Invalid values given for delta_Q (expected 1xN list/array or NxN 2d array)")
+            changed.add('A_Q_delta_Q_pairwise')
+
+        #----------------------------------------
+        # Pre-calculate the pairwise delta*beta values:
+        #----------------------------------------
+        # (with their column-oriented copies, used to look up the infection pressure that a node exerts on its neighbors)
+        if(changed & {'A_delta_pairwise', 'A_beta_pairwise'}):
+            self.A_deltabeta          = scipy.sparse.csr_matrix(scipy.sparse.csr_matrix.multiply(self.A_delta_pairwise, self.A_beta_pairwise))
+            self.A_deltabeta_csc      = scipy.sparse.csc_matrix(self.A_deltabeta)
+        if(changed & {'A_Q_delta_Q_pairwise', 'A_Q_beta_Q_pairwise'}):
+            self.A_Q_deltabeta_Q      = scipy.sparse.csr_matrix(scipy.sparse.csr_matrix.multiply(self.A_Q_delta_Q_pairwise, self.A_Q_beta_Q_pairwise))
+            self.A_Q_deltabeta_Q_csc  = scipy.sparse.csc_matrix(self.A_Q_deltabeta_Q)
+        if(changed & {'A_delta_pairwise', 'A_beta_asym_pairwise'}):
+            if(self.A_beta_asym_pairwise is not None):
+                self.A_deltabeta_asym = scipy.sparse.csr_matrix(scipy.sparse.csr_matrix.multiply(self.A_delta_pairwise, self.A_beta_asym_pairwise))
+            else:
+                self.A_deltabeta_asym = None
+            self.A_deltabeta_asym_csc = scipy.sparse.csc_matrix(self.A_deltabeta_asym) if self.A_deltabeta_asym is not None else None
+
+        #----------------------------------------
+        # Flags for groups of transitions whose rate parameters are zero for all nodes (these are never evaluated):
+        #----------------------------------------
+        self.testingActive  = (numpy.any(self.theta_S) or numpy.any(self.theta_E) or numpy.any(self.theta_pre) or numpy.any(self.theta_sym) or numpy.any(self.theta_asym)
+                               or self.contact_tracing_active())
+        self.rebirthActive  = (numpy.any(self.xi) or numpy.any(self.nu))
+
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def node_degrees(self, Amat):
+        return Amat.sum(axis=0).reshape(self.numNodes,1)   # sums of adj matrix cols
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def contact_tracing_active(self):
+        return (numpy.any(self.phi_S) or numpy.any(self.phi_E) or numpy.any(self.phi_pre) or numpy.any(self.phi_sym) or numpy.any(self.phi_asym))
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    @staticmethod
+    def same_value(value, baseValue):
+        # Graphs, lists and arrays are compared by identity, scalars and strings by value:
+        if(value is baseValue):
+            return True
+        if(isinstance(value, (int, float, str, numpy.number)) and isinstance(baseValue, (int, float, str, numpy.number))):
+            return value == baseValue
+        return False
+
+
+
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+
+
+
+class ExtSEIRSNetworkModelVacBatch():
+    """
+    A class to simulate a batch of independent replicates of the Extended SEIRS Stochastic Network Model
+    ===================================================
+    The replicates share the networks and parameters of an ExtSEIRSNetworkModelVac instance and start from its current state.
+    Node states are kept in an (N x R) array and all replicates are advanced together in fixed time steps: the transmission
+    pressure on every node of every replicate is one sparse (N x N) by dense (N x R) matrix product per network, and a node
+    leaves its state within a step with probability 1-exp(-(total propensity)*dt), choosing its transition in proportion to
+    the propensities (exponential_rates transition mode; baseline births/deaths are not modelled).
+    Params:
+            model           ExtSEIRSNetworkModelVac instance to replicate (checkpoint parameter updates are applied to this model)
+            num_replicates  Number of replicates
+            dt              Time step
+            seed            Seed for the random number generator
+    """
+    def __init__(self, model, num_replicates, dt=0.1, seed=None):
+
+        if(seed is not None):
+            numpy.random.seed(seed)
+            self.seed = seed
+
+        assert(model.transition_mode == 'exponential_rates'), "Batched replicates are only supported for the exponential_rates transition mode."
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Model and batch dimensions:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.model          = model
+        self.numNodes       = model.numNodes
+        self.numReplicates  = int(num_replicates)
+        self.dt             = dt
+
+        self.t          = model.t
+        self.tmax       = model.t
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Replicate the model's current node states (one column per replicate):
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.X                  = numpy.repeat(model.X, self.numReplicates, axis=1)
+        self.tested             = numpy.repeat(model.tested, self.numReplicates, axis=1)
+        self.positive           = numpy.repeat(model.positive, self.numReplicates, axis=1)
+        self.isolationEntryTime = numpy.repeat(model.isolationEntryTime.reshape((self.numNodes,1)), self.numReplicates, axis=1)
+
+        # Each replicate draws its own outcomes (asymptomatic, hospitalized, fatal) for every node:
+        self.rand_a = numpy.random.rand(self.numNodes, self.numReplicates)
+        self.rand_h = numpy.random.rand(self.numNodes, self.numReplicates)
+        self.rand_f = numpy.random.rand(self.numNodes, self.numReplicates)
+
+        # Running compartment counts, one column per replicate:
+        self.stateCounts = numpy.zeros((model.Q_R+1, self.numReplicates), dtype=int)
+        for state in range(model.Q_R+1):
+            self.stateCounts[state] = numpy.count_nonzero(self.X==state, axis=0)
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Transition types by current state, in the order of the columns returned by calc_propensities:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.stateTransitions = { model.S:      ['StoE', 'StoQS', 'StoR'],
+                                  model.E:      ['EtoIPRE', 'EtoQE', 'EtoR'],
+                                  model.I_pre:  ['IPREtoISYM', 'IPREtoIASYM', 'IPREtoQPRE', 'IPREtoR'],
+                                  model.I_sym:  ['ISYMtoR', 'ISYMtoH', 'ISYMtoQSYM'],
+                                  model.I_asym: ['IASYMtoR', 'IASYMtoQASYM'],
+                                  model.H:      ['HtoR', 'HtoF'],
+                                  model.R:      ['RtoS'],
+                                  model.Q_S:    ['QStoQE'],
+                                  model.Q_E:    ['QEtoQPRE'],
+                                  model.Q_pre:  ['QPREtoQSYM', 'QPREtoQASYM'],
+                                  model.Q_sym:  ['QSYMtoQR', 'QSYMtoH'],
+                                  model.Q_asym: ['QASYMtoQR'] }
+
+        # State each state is released to at the end of its isolation period:
+        self.releaseStates = numpy.arange(model.Q_R+1)
+        self.releaseStates[[model.Q_S, model.Q_E, model.Q_pre, model.Q_sym, model.Q_asym, model.Q_R]] = [model.S, model.E, model.I_pre, model.I_sym, model.I_asym, model.R]
+
+        self.update_coefficients()
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Initialize timeseries (one row per time step, one column per replicate):
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.tseriesList        = [self.t]
+        self.stateCountsList    = [self.stateCounts.copy()]
+        self.numTestedList      = [numpy.count_nonzero(self.tested, axis=0)]
+        self.numPositiveList    = [numpy.count_nonzero(self.positive, axis=0)]
+        self.finalize_data_series()
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def calc_exposure(self):
+        # Infection pressure on every node of every replicate from its infectious neighbors, normalized by degree
+        # (see ExtSEIRSNetworkModelVac.calc_transmission_terms), computed with one sparse matrix by dense (N x R)
+        # matrix product per term: for susceptible nodes, and for isolated susceptible nodes.
+        m = self.model
+        isSym   = (self.X==m.I_sym)
+        isAsym  = (self.X==m.I_pre)|(self.X==m.I_asym)
+        if(m.A_deltabeta_asym is not None):
+            transmissionTerms_I = numpy.asarray(scipy.sparse.csr_matrix.dot(m.A_deltabeta, isSym)) + numpy.asarray(scipy.sparse.csr_matrix.dot(m.A_deltabeta_asym, isAsym))
+        else:
+            transmissionTerms_I = numpy.asarray(scipy.sparse.csr_matrix.dot(m.A_deltabeta, isSym|isAsym))
+        transmissionTerms_Q  = numpy.asarray(scipy.sparse.csr_matrix.dot(m.A_Q_deltabeta_Q, (self.X==m.Q_pre)|(self.X==m.Q_sym)|(self.X==m.Q_asym)))
+        transmissionTerms_IQ = numpy.asarray(scipy.sparse.csr_matrix.dot(m.A_Q_deltabeta_Q, isSym|isAsym))
+        return (transmissionTerms_I*self.invDegree + transmissionTerms_Q*self.invDegree_Q,
+                (transmissionTerms_IQ + transmissionTerms_Q)*self.invDegree_Q)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update_coefficients(self):
+        # Per-node factors of the exposure propensities that only depend on parameter values
+        # (see ExtSEIRSNetworkModelVac.calc_propensities); recalculated whenever the model's parameters are updated.
+        m = self.model
+        qu = m.qu
+        self.coeffs_StoE_ext        = ((1-qu)*m.alpha*m.o*m.beta_global*m.prevalence_ext).ravel()
+        self.coeffs_StoE_local      = ((1-qu)*m.alpha*(1-m.o)*(1-m.p)).ravel()
+        self.coeffs_StoE_global     = numpy.hstack([m.beta_global, m.beta_asym_global, m.q*m.beta_Q_global])*((1-qu)*m.alpha*(1-m.o)*m.p)
+        self.coeffs_QStoQE_ext      = (m.alpha_Q*m.o*m.q*m.beta_global*m.prevalence_ext).ravel()
+        self.coeffs_QStoQE_local    = (m.alpha_Q*(1-m.o)*(1-m.p)).ravel()
+        self.coeffs_QStoQE_global   = numpy.hstack([m.beta_global, m.beta_asym_global, m.beta_Q_global])*(m.alpha_Q*(1-m.o)*m.p*m.q)
+        self.invDegree              = numpy.divide(1, m.degree, out=numpy.zeros(m.degree.shape), where=m.degree!=0)
+        self.invDegree_Q            = numpy.divide(1, m.degree_Q, out=numpy.zeros(m.degree_Q.shape), where=m.degree_Q!=0)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def calc_propensities(self, state, nodes, reps, exposure, numContacts_Q, globalScales):
+        # Propensities of the transitions out of the given state (columns ordered as in self.stateTransitions)
+        # for the given (node, replicate) pairs, all of which are in that state.
+        # The rates are those of ExtSEIRSNetworkModelVac.calc_propensities (exponential_rates mode),
+        # with the local and global exposure columns combined into one.
+        m = self.model
+
+        param = lambda values: values[nodes,0]
+        qu    = param(m.qu)
+        fi    = param(m.fi)
+
+        if(numContacts_Q is not None):
+            numContacts_Q = numContacts_Q[nodes,reps]
+        else:
+            numContacts_Q = numpy.zeros(len(nodes))
+
+        testing = lambda theta, phi, psi: (param(theta) + param(phi)*numContacts_Q)*param(psi) if m.testingActive else numpy.zeros(len(nodes))
+
+        if(state == m.S):
+            propensities = [ self.coeffs_StoE_ext[nodes] + self.coeffs_StoE_local[nodes]*exposure[0][nodes,reps]
+                                + numpy.einsum('ij,ji->i', self.coeffs_StoE_global[nodes], globalScales[:,reps]),
+                             testing(m.theta_S, m.phi_S, m.psi_S),
+                             qu*fi ]
+
+        elif(state == m.E):
+            propensities = [ (1-qu)*param(m.sigma),
+                             testing(m.theta_E, m.phi_E, m.psi_E),
+                             qu*fi ]
+
+        elif(state == m.I_pre):
+            asym = self.rand_a[nodes,reps] < param(m.a)
+            propensities = [ (1-qu)*param(m.lamda)*~asym,
+                             (1-qu)*param(m.lamda)*asym,
+                             testing(m.theta_pre, m.phi_pre, m.psi_pre),
+                             qu*fi ]
+
+        elif(state == m.I_sym):
+            hosp = self.rand_h[nodes,reps] < param(m.h)
+            propensities = [ param(m.gamma)*~hosp,
+                             param(m.eta)*hosp,
+                             testing(m.theta_sym, m.phi_sym, m.psi_sym) ]
+
+        elif(state == m.I_asym):
+            propensities = [ (1-qu)*param(m.gamma_asym) + qu*fi,
+                             testing(m.theta_asym, m.phi_asym, m.psi_asym) ]
+
+        elif(state == m.H):
+            fatal = self.rand_f[nodes,reps] < param(m.f)
+            propensities = [ param(m.gamma_H)*~fatal,
+                             param(m.mu_H)*fatal ]
+
+        elif(state == m.R):
+            propensities = [ param(m.xi) ]
+
+        elif(state == m.Q_S):
+            propensities = [ self.coeffs_QStoQE_ext[nodes] + self.coeffs_QStoQE_local[nodes]*exposure[1][nodes,reps]
+                                + numpy.einsum('ij,ji->i', self.coeffs_QStoQE_global[nodes], globalScales[:,reps]) ]
+
+        elif(state == m.Q_E):
+            propensities = [ param(m.sigma_Q) ]
+
+        elif(state == m.Q_pre):
+            asym = self.rand_a[nodes,reps] < param(m.a)
+            propensities = [ param(m.lamda_Q)*~asym,
+                             param(m.lamda_Q)*asym ]
+
+        elif(state == m.Q_sym):
+            hosp = self.rand_h[nodes,reps] < param(m.h)
+            propensities = [ param(m.gamma_Q_sym)*~hosp,
+                             param(m.eta_Q)*hosp ]
+
+        elif(state == m.Q_asym):
+            propensities = [ param(m.gamma_Q_asym) ]
+
+        return numpy.column_stack(propensities)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def calc_global_scales(self):
+        # Per-replicate (infectious count)/N factors of the global interaction terms (sym, pre+asym, isolated infectious):
+        m = self.model
+        numAlive = self.numNodes - self.stateCounts[m.F]
+        globalCounts = numpy.array([self.stateCounts[m.I_sym],
+                                    self.stateCounts[m.I_pre] + self.stateCounts[m.I_asym],
+                                    self.stateCounts[m.Q_pre] + self.stateCounts[m.Q_sym] + self.stateCounts[m.Q_asym]])
+        return numpy.divide(globalCounts, numAlive, out=numpy.zeros(globalCounts.shape), where=numAlive>0)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def set_node_states(self, nodes, reps, states):
+        # Move the given (node, replicate) pairs to the given states, keeping the compartment counts
+        # and isolation clocks up to date:
+        m = self.model
+        prevStates = self.X[nodes,reps]
+        self.X[nodes,reps] = states
+        numpy.add.at(self.stateCounts, (prevStates, reps), -1)
+        numpy.add.at(self.stateCounts, (states, reps), 1)
+        wasIsolated = numpy.isin(prevStates, m.isolatedStates)
+        isIsolated  = numpy.isin(states, m.isolatedStates)
+        self.isolationEntryTime[nodes[isIsolated & ~wasIsolated], reps[isIsolated & ~wasIsolated]] = self.t
+        self.isolationEntryTime[nodes[~isIsolated], reps[~isIsolated]] = numpy.inf
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def introduce_exposures(self, num_new_exposures):
+        # Applied independently to each replicate, as in ExtSEIRSNetworkModelVac.introduce_exposures:
+        m = self.model
+        for rep in range(self.numReplicates):
+            exposedNodes = numpy.random.choice(range(self.numNodes), size=num_new_exposures, replace=False)
+            states = self.X[exposedNodes,rep]
+            exposedNodes, states = exposedNodes[(states==m.S)|(states==m.Q_S)], states[(states==m.S)|(states==m.Q_S)]
+            self.set_node_states(exposedNodes, numpy.full(len(exposedNodes), rep), numpy.where(states==m.S, m.R, m.Q_E))
+
+    def introduce_vaccined(self, num_new_vaccined):
+        for rep in range(self.numReplicates):
+            vaccinedNodes = numpy.random.choice(range(self.numNodes), size=num_new_vaccined, replace=False)
+            self.set_node_states(vaccinedNodes, numpy.full(len(vaccinedNodes), rep), numpy.full(len(vaccinedNodes), self.model.R))
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def finalize_data_series(self):
+        m = self.model
+        stateCounts = numpy.array(self.stateCountsList)
+        self.tseries     = numpy.array(self.tseriesList)
+        self.numS        = stateCounts[:,m.S]
+        self.numE        = stateCounts[:,m.E]
+        self.numI_pre    = stateCounts[:,m.I_pre]
+        self.numI_sym    = stateCounts[:,m.I_sym]
+        self.numI_asym   = stateCounts[:,m.I_asym]
+        self.numH        = stateCounts[:,m.H]
+        self.numR        = stateCounts[:,m.R]
+        self.numF        = stateCounts[:,m.F]
+        self.numQ_S      = stateCounts[:,m.Q_S]
+        self.numQ_E      = stateCounts[:,m.Q_E]
+        self.numQ_pre    = stateCounts[:,m.Q_pre]
+        self.numQ_sym    = stateCounts[:,m.Q_sym]
+        self.numQ_asym   = stateCounts[:,m.Q_asym]
+        self.numQ_R      = stateCounts[:,m.Q_R]
+        self.numTested   = numpy.array(self.numTestedList)
+        self.numPositive = numpy.array(self.numPositiveList)
+        self.N           = numpy.clip((self.numNodes - self.numF), a_min=0, a_max=self.numNodes)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def run_iteration(self):
+        m = self.model
+
+        # Steps end exactly at tmax and at the next checkpoint:
+        dt = min(self.dt, self.tmax - self.t)
+        if(m.nextCheckpointTime > self.t):
+            dt = min(dt, m.nextCheckpointTime - self.t)
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Infection pressure and global interaction terms at the start of the step:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        exposure        = self.calc_exposure()
+        globalScales    = self.calc_global_scales()
+
+        numContacts_Q = None
+        if(m.testingActive and numpy.any(self.positive) and m.contact_tracing_active()):
+            numContacts_Q = numpy.asarray(scipy.sparse.csr_matrix.dot(m.A, self.positive & ~numpy.isin(self.X, [m.R, m.Q_R, m.F])))
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Draw the transitions of all nodes of all replicates within the step:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # (the (node, replicate) pairs are grouped by state with one sort of the state array)
+        order       = numpy.argsort(self.X, axis=None, kind='stable')
+        stateStarts = numpy.concatenate([[0], numpy.cumsum(self.stateCounts.sum(axis=1))])
+        transitionNodes, transitionReps, newStates, positiveMask = [], [], [], []
+        for state, transitionTypes in self.stateTransitions.items():
+            if(stateStarts[state+1] == stateStarts[state]):
+                continue
+            nodes, reps  = numpy.divmod(order[stateStarts[state]:stateStarts[state+1]], self.numReplicates)
+            propensities = self.calc_propensities(state, nodes, reps, exposure, numContacts_Q, globalScales)
+            totals       = propensities.sum(axis=1)
+            fired        = numpy.random.rand(len(nodes)) < -numpy.expm1(-totals*dt)
+            if(not numpy.any(fired)):
+                continue
+            nodes, reps, propensities, totals = nodes[fired], reps[fired], propensities[fired], totals[fired]
+            # Choose each transition in proportion to the propensities:
+            r           = numpy.random.rand(len(nodes)) * totals
+            typeIdx     = numpy.minimum(numpy.count_nonzero(numpy.cumsum(propensities, axis=1) <= r[:,None], axis=1), len(transitionTypes)-1)
+            transitionNodes.append(nodes)
+            transitionReps.append(reps)
+            newStates.append(numpy.array([m.transitions[transitionType]['newState'] for transitionType in transitionTypes])[typeIdx])
+            positiveMask.append(numpy.isin(numpy.array(transitionTypes)[typeIdx], ['EtoQE', 'IPREtoQPRE', 'ISYMtoQSYM', 'IASYMtoQASYM', 'ISYMtoH']))
+
+        self.t += dt
+
+        if(len(transitionNodes) > 0):
+            transitionNodes, transitionReps = numpy.concatenate(transitionNodes), numpy.concatenate(transitionReps)
+            self.set_node_states(transitionNodes, transitionReps, numpy.concatenate(newStates))
+            positiveMask = numpy.concatenate(positiveMask)
+            self.positive[transitionNodes[positiveMask], transitionReps[positiveMask]] = True
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Release nodes whose isolation period has ended:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        releasedNodes, releasedReps = numpy.nonzero(self.isolationEntryTime + m.isolationTime <= self.t)
+        if(len(releasedNodes) > 0):
+            self.set_node_states(releasedNodes, releasedReps, self.releaseStates[self.X[releasedNodes,releasedReps]])
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+        self.tseriesList.append(self.t)
+        self.stateCountsList.append(self.stateCounts.copy())
+        self.numTestedList.append(numpy.count_nonzero(self.tested, axis=0))
+        self.numPositiveList.append(numpy.count_nonzero(self.positive, axis=0))
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Terminate if tmax reached or num infections is 0 in every replicate:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        numActive = self.stateCounts[[m.E, m.I_pre, m.I_sym, m.I_asym, m.H, m.Q_S, m.Q_E, m.Q_pre, m.Q_sym, m.Q_asym, m.Q_R]].sum()
+        if(self.t >= self.tmax or numActive < 1):
+            self.finalize_data_series()
+            return False
+
+        return True
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def run(self, T, checkpoints=None, print_interval=10, verbose='t'):
+        if(T>0):
+            self.tmax += T
+        else:
+            return False
+
+        m = self.model
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Pre-process checkpoint values:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        if(checkpoints):
+            numCheckpoints = len(checkpoints['t'])
+            for chkpt_param, chkpt_values in checkpoints.items():
+                assert(isinstance(chkpt_values, (list, numpy.ndarray)) and len(chkpt_values)==numCheckpoints), "Expecting a list of values with length equal to number of checkpoint times ("+str(numCheckpoints)+") for each checkpoint parameter."
+            checkpointIdx  = numpy.searchsorted(checkpoints['t'], self.t) # Finds 1st index in list greater than given val
+            if(checkpointIdx >= numCheckpoints):
+                # We are out of checkpoints, stop checking them:
+                checkpoints = None
+            else:
+                checkpointTime = checkpoints['t'][checkpointIdx]
+        m.nextCheckpointTime = checkpointTime if checkpoints else numpy.inf
+
+        #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+        # Run the simulation loop:
+        #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+        print_reset = True
+        running     = True
+        while running:
+
+            running = self.run_iteration()
+
+            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+            # Handle checkpoints if applicable:
+            if(checkpoints):
+                if(self.t >= checkpointTime):
+                    if(verbose is not False):
+                        print("[Checkpoint: Updating parameters]")
+                    # A checkpoint has been reached, update param values (shared by all replicates):
+                    m.apply_checkpoint(checkpoints, checkpointIdx)
+                    self.update_coefficients()
+                    # Update the next checkpoint time:
+                    checkpointIdx  = numpy.searchsorted(checkpoints['t'], self.t) # Finds 1st index in list greater than given val
+                    if(checkpointIdx >= numCheckpoints):
+                        # We are out of checkpoints, stop checking them:
+                        checkpoints = None
+                    else:
+                        checkpointTime = checkpoints['t'][checkpointIdx]
+                    m.nextCheckpointTime = checkpointTime if checkpoints else numpy.inf
+            #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+            if(print_interval):
+                if(print_reset and (int(self.t) % print_interval == 0)):
+                    if(verbose=="t"):
+                        print("t = %.2f" % self.t)
+                    if(verbose==True):
+                        print("t = %.2f" % self.t)
+                        print("\t S      = " + str(self.stateCounts[m.S].mean()))
+                        print("\t E      = " + str(self.stateCounts[m.E].mean()))
+                        print("\t I_pre  = " + str(self.stateCounts[m.I_pre].mean()))
+                        print("\t I_sym  = " + str(self.stateCounts[m.I_sym].mean()))
+                        print("\t I_asym = " + str(self.stateCounts[m.I_asym].mean()))
+                        print("\t H      = " + str(self.stateCounts[m.H].mean()))
+                        print("\t R      = " + str(self.stateCounts[m.R].mean()))
+                        print("\t F      = " + str(self.stateCounts[m.F].mean()))
+                    print_reset = False
+                elif(not print_reset and (int(self.t) % 10 != 0)):
+                    print_reset = True
+
+        return True
+
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+
+
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+
+
+
+class ExtSEIRSModelVac():
+    """
+    A class to simulate the Deterministic Extended SEIRS Model with vaccination
+    ===================================================
+    Mean-field counterpart of ExtSEIRSNetworkModelVac (exponential_rates transition mode) over the same compartments
+    (S, E, I_pre, I_sym, I_asym, H, R, F, Q_S, Q_E, Q_pre, Q_sym, Q_asym, Q_R), including the vaccination flows.
+    Any number of parameter sets is integrated at once, in one solve_ivp call: every parameter and initial count may be
+    a scalar or an array with one value per parameter set. The right-hand side is evaluated for all sets with array
+    operations, and its Jacobian (block diagonal over the sets) is given analytically to the implicit solvers.
+    Approximations with respect to the network model: local (network) and global interactions are both well mixed,
+    the outcome probabilities (a, h, f) split the flows out of a compartment, isolation ends at rate 1/isolation_time,
+    and testing of the contacts of positive individuals (phi) is not modelled.
+    Params: (as ExtSEIRSNetworkModelVac, one value or one value per parameter set)
+            initN           Population size
+            qu              Fraction of vaccinated individuals
+            fi              Rate of vaccination (inverse of the time to immunity)
+            initE, ...      Initial numbers of individuals in each compartment (all remaining initialized susceptible)
+    """
+
+    # Compartments, in the order of the state vector of each parameter set:
+    compartments = ['S', 'E', 'I_pre', 'I_sym', 'I_asym', 'H', 'R', 'F', 'Q_S', 'Q_E', 'Q_pre', 'Q_sym', 'Q_asym', 'Q_R']
+
+    # Parameters, and the parameter whose values are used in place of a parameter given as None:
+    parameterDefaults = [('beta', None), ('sigma', None), ('lamda', None), ('gamma', None), ('gamma_asym', 'gamma'),
+                         ('eta', None), ('gamma_H', 'gamma'), ('mu_H', None), ('alpha', None), ('xi', None), ('nu', None),
+                         ('a', None), ('h', None), ('f', None), ('p', None), ('beta_local', 'beta'), ('beta_asym', 'beta'),
+                         ('beta_asym_local', 'beta_local'), ('beta_Q', 'beta'), ('beta_Q_local', 'beta_Q'),
+                         ('sigma_Q', 'sigma'), ('lamda_Q', 'lamda'), ('eta_Q', 'eta'), ('gamma_Q_sym', 'gamma'),
+                         ('gamma_Q_asym', 'gamma'), ('alpha_Q', 'alpha'),
+                         ('theta_S', None), ('theta_E', None), ('theta_pre', None), ('theta_sym', None), ('theta_asym', None),
+                         ('psi_S', None), ('psi_E', None), ('psi_pre', None), ('psi_sym', None), ('psi_asym', None),
+                         ('q', None), ('isolation_time', None), ('o', None), ('prevalence_ext', None), ('qu', None), ('fi', None)]
+
+    def __init__(self, initN, beta, sigma, lamda, gamma,
+                    gamma_asym=None, eta=0, gamma_H=None, mu_H=0, alpha=1.0, xi=0, nu=0, a=0, h=0, f=0, p=0,
+                    beta_local=None, beta_asym=None, beta_asym_local=None,
+                    beta_Q=None, beta_Q_local=None, sigma_Q=None, lamda_Q=None, eta_Q=None, gamma_Q_sym=None, gamma_Q_asym=None, alpha_Q=None,
+                    theta_S=0, theta_E=0, theta_pre=0, theta_sym=0, theta_asym=0,
+                    psi_S=0, psi_E=1, psi_pre=1, psi_sym=1, psi_asym=1, q=0, isolation_time=14,
+                    o=0, prevalence_ext=0, qu=0.63, fi=1/40,
+                    initE=0, initI_pre=0, initI_sym=0, initI_asym=0, initH=0, initR=0, initF=0,
+                    initQ_S=0, initQ_E=0, initQ_pre=0, initQ_sym=0, initQ_asym=0, initQ_R=0):
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Model Parameters:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        arguments = locals()
+        self.parameters = {param: arguments[param] for param, default in self.parameterDefaults}
+
+        inits = [arguments['init'+compartment] if compartment != 'S' else 0 for compartment in self.compartments]
+        self.numSets = max([numpy.size(value) for value in list(self.parameters.values()) + inits + [initN]])
+        self.update_parameters()
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Initialize Timekeeping:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.t       = 0
+        self.tmax    = 0 # will be set when run() is called
+        self.tidx    = 0
+        self.tseries = numpy.zeros(1)
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Initialize Counts of inidividuals with each state
+        # (one row per time point, one column per compartment, one layer per parameter set):
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.numNodes   = numpy.broadcast_to(numpy.asarray(initN, dtype=float), (self.numSets,)).copy()
+        self.Y          = numpy.zeros((1, len(self.compartments), self.numSets))
+        for compartmentIdx, init in enumerate(inits):
+            self.Y[0, compartmentIdx] = init
+        self.Y[0, 0]    = self.numNodes - self.Y[0].sum(axis=0)
+        assert(numpy.all(self.Y[0, 0] >= 0)), "The specified initial population size N must be greater than or equal to the initial compartment counts."
+
+        # Current state (one row per parameter set), from which the integration continues:
+        self.state      = self.Y[0].T.copy()
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    @classmethod
+    def from_network_model(cls, model, **kwargs):
+        # Mean-field model for the current parameters and compartment counts of an ExtSEIRSNetworkModelVac
+        # (per-node parameter values are averaged over the nodes). Parameters may be overridden as keyword arguments.
+        params = {}
+        for param, default in cls.parameterDefaults:
+            if(param == 'isolation_time'):
+                continue
+            value = getattr(model, param, None) if param not in ('beta_local', 'beta_asym_local', 'beta_Q_local') else model.parameters.get(param)
+            params[param] = None if value is None else float(numpy.mean(value))
+        params['isolation_time'] = model.isolationTime
+        for compartment in cls.compartments[1:]:
+            params['init'+compartment] = model.stateCounts[getattr(model, compartment)]
+        params.update(kwargs)
+        return cls(initN=model.numNodes, **params)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update_parameters(self):
+        # Per-set parameter values and, from them, the rates of the linear flows and the coefficients of the infection terms:
+        values = {}
+        for param, default in self.parameterDefaults:
+            value = self.parameters[param]
+            value = values[default] if (value is None and default is not None) else numpy.asarray(value, dtype=float)
+            assert(value.size == 1 or value.size == self.numSets), "Expecting one value or one value per parameter set ("+str(self.numSets)+") for parameter "+param+"."
+            values[param] = numpy.broadcast_to(value.ravel() if value.size > 1 else value.reshape(()), (self.numSets,))
+        v = values
+        S, E, I_pre, I_sym, I_asym, H, R, F, Q_S, Q_E, Q_pre, Q_sym, Q_asym, Q_R = range(len(self.compartments))
+        release = numpy.divide(1, v['isolation_time'], out=numpy.zeros(self.numSets), where=v['isolation_time']>0)
+
+        # Linear flows (from compartment, to compartment, per-set rate):
+        flows = [ (S, R, v['qu']*v['fi']),                          (S, Q_S, v['theta_S']*v['psi_S']),
+                  (E, I_pre, (1-v['qu'])*v['sigma']),               (E, Q_E, v['theta_E']*v['psi_E']),           (E, R, v['qu']*v['fi']),
+                  (I_pre, I_sym, (1-v['qu'])*v['lamda']*(1-v['a'])), (I_pre, I_asym, (1-v['qu'])*v['lamda']*v['a']),
+                  (I_pre, Q_pre, v['theta_pre']*v['psi_pre']),      (I_pre, R, v['qu']*v['fi']),
+                  (I_sym, R, v['gamma']*(1-v['h'])),                (I_sym, H, v['eta']*v['h']),                 (I_sym, Q_sym, v['theta_sym']*v['psi_sym']),
+                  (I_asym, R, (1-v['qu'])*v['gamma_asym'] + v['qu']*v['fi']), (I_asym, Q_asym, v['theta_asym']*v['psi_asym']),
+                  (H, R, v['gamma_H']*(1-v['f'])),                  (H, F, v['mu_H']*v['f']),
+                  (R, S, v['xi']),
+                  (Q_E, Q_pre, v['sigma_Q']),
+                  (Q_pre, Q_sym, v['lamda_Q']*(1-v['a'])),          (Q_pre, Q_asym, v['lamda_Q']*v['a']),
+                  (Q_sym, Q_R, v['gamma_Q_sym']*(1-v['h'])),        (Q_sym, H, v['eta_Q']*v['h']),
+                  (Q_asym, Q_R, v['gamma_Q_asym']),
+                  (Q_S, S, release), (Q_E, E, release), (Q_pre, I_pre, release), (Q_sym, I_sym, release), (Q_asym, I_asym, release), (Q_R, R, release) ]
+        flows += [(compartment, S, v['nu']) for compartment in range(1, len(self.compartments)) if compartment != F]
+
+        # Matrix of the linear flows, one (compartments x compartments) block per parameter set:
+        self.L = numpy.zeros((self.numSets, len(self.compartments), len(self.compartments)))
+        for fromIdx, toIdx, rate in flows:
+            self.L[:, toIdx, fromIdx]   += rate
+            self.L[:, fromIdx, fromIdx] -= rate
+
+        # Infection terms: S (Q_S) individuals are exposed at rate c_ext + (c_sym*I_sym + c_asym*(I_pre+I_asym) + c_Q*(Q_pre+Q_sym+Q_asym))/N
+        self.c_ext  = numpy.stack([(1-v['qu'])*v['alpha']*v['o']*v['beta']*v['prevalence_ext'],
+                                   v['alpha_Q']*v['o']*v['q']*v['beta']*v['prevalence_ext']])
+        self.c_inf  = numpy.stack([(1-v['qu'])*v['alpha']*(1-v['o'])*numpy.stack([(1-v['p'])*v['beta_local'] + v['p']*v['beta'],
+                                                                                    (1-v['p'])*v['beta_asym_local'] + v['p']*v['beta_asym'],
+                                                                                    (1-v['p'])*v['beta_Q_local'] + v['p']*v['q']*v['beta_Q']]),
+                                   v['alpha_Q']*(1-v['o'])*numpy.stack([(1-v['p'])*v['beta_Q_local'] + v['p']*v['q']*v['beta'],
+                                                                          (1-v['p'])*v['beta_Q_local'] + v['p']*v['q']*v['beta_asym'],
+                                                                          (1-v['p'])*v['beta_Q_local'] + v['p']*v['q']*v['beta_Q']])])
+        self.values = values
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    # Infectious groups driving the infection terms (sym, pre+asym, isolated), and the compartments
+    # they are made up of, the compartments exposed (S, Q_S) and the compartments they are exposed to (E, Q_E):
+    infectiousGroups   = [[3], [2, 4], [10, 11, 12]]
+    exposedFrom        = [0, 8]
+    exposedTo          = [1, 9]
+
+    def infection_terms(self, Y):
+        # Per-set force of infection on S and Q_S individuals (2 x sets), and the (infectious group x sets) counts and 1/N
+        infectious = numpy.stack([Y[:, group].sum(axis=1) for group in self.infectiousGroups])
+        invN       = numpy.divide(1, self.numNodes - Y[:, 7], out=numpy.zeros(self.numSets), where=(self.numNodes - Y[:, 7])>0)
+        force      = self.c_ext + numpy.einsum('eks,ks->es', self.c_inf, infectious)*invN
+        return force, infectious, invN
+
+    def system_dfes(self, t, y):
+        # Right-hand side for all parameter sets (state vector laid out set by set)
+        Y = y.reshape((self.numSets, len(self.compartments)))
+        dY = numpy.einsum('sij,sj->si', self.L, Y)
+        force, infectious, invN = self.infection_terms(Y)
+        for e in range(2):
+            newExposures = force[e]*Y[:, self.exposedFrom[e]]
+            dY[:, self.exposedFrom[e]] -= newExposures
+            dY[:, self.exposedTo[e]]   += newExposures
+        return dY.ravel()
+
+    def system_jacobian(self, t, y):
+        # Analytic Jacobian of system_dfes, a block diagonal (sparse) matrix with one block per parameter set
+        Y = y.reshape((self.numSets, len(self.compartments)))
+        J = self.L.copy()
+        force, infectious, invN = self.infection_terms(Y)
+        for e in range(2):
+            dExposures = numpy.zeros((self.numSets, len(self.compartments)))
+            dExposures[:, self.exposedFrom[e]] = force[e]
+            for groupIdx, group in enumerate(self.infectiousGroups):
+                dExposures[:, group] += (Y[:, self.exposedFrom[e]]*self.c_inf[e, groupIdx]*invN)[:, None]
+            # N excludes fatalities:
+            dExposures[:, 7] += Y[:, self.exposedFrom[e]]*(force[e] - self.c_ext[e])*invN
+            J[:, self.exposedFrom[e], :] -= dExposures
+            J[:, self.exposedTo[e], :]   += dExposures
+        return scipy.sparse.bsr_matrix((J, numpy.arange(self.numSets), numpy.arange(self.numSets+1)),
+                                       shape=(self.numSets*len(self.compartments), self.numSets*len(self.compartments)))
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def run_epoch(self, runtime, method='RK45'):
+        # Integrate all parameter sets up to the given time, writing the solution at the output times
+        # into the preallocated data series (the state at the end of the epoch is kept to continue from):
+        t_end       = self.t + runtime
+        outIdx      = self.tidx + 1 + numpy.flatnonzero(self.tseries[self.tidx+1:] <= t_end)
+        t_eval      = self.tseries[outIdx]
+        if(len(t_eval) == 0 or t_eval[-1] < t_end):
+            t_eval  = numpy.append(t_eval, t_end)
+
+        options     = {}
+        if(method in ('Radau', 'BDF')):
+            options['jac'] = self.system_jacobian
+        elif(method == 'LSODA'):
+            options['jac'] = lambda t, y: self.system_jacobian(t, y).toarray()
+        solution    = scipy.integrate.solve_ivp(self.system_dfes, t_span=[self.t, t_end], y0=self.state.ravel(), t_eval=t_eval, method=method, **options)
+
+        solutionY   = solution['y'].reshape((self.numSets, len(self.compartments), -1))
+        self.Y[outIdx] = solutionY[:, :, :len(outIdx)].transpose(2, 1, 0)
+        self.state  = solutionY[:, :, -1]
+        if(len(outIdx) > 0):
+            self.tidx = outIdx[-1]
+        self.t      = t_end
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def run(self, T, dt=1, checkpoints=None, method='RK45', verbose=False):
+
+        if(T>0):
+            self.tmax += T
+        else:
+            return False
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Preallocate the data series for the output times of this run:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        tOut         = numpy.arange(self.t+dt, self.tmax+dt/2, dt)
+        self.tseries = numpy.concatenate([self.tseries[:self.tidx+1], tOut])
+        self.Y       = numpy.concatenate([self.Y[:self.tidx+1], numpy.zeros((len(tOut), len(self.compartments), self.numSets))])
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Pre-process checkpoint values:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        if(checkpoints):
+            numCheckpoints = len(checkpoints['t'])
+            for chkpt_param, chkpt_values in checkpoints.items():
+                assert(isinstance(chkpt_values, (list, numpy.ndarray)) and len(chkpt_values)==numCheckpoints), "Expecting a list of values with length equal to number of checkpoint times ("+str(numCheckpoints)+") for each checkpoint parameter."
+
+        #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+        # Run the simulation loop:
+        #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+        if(checkpoints):
+            for checkpointIdx, checkpointTime in enumerate(checkpoints['t']):
+                if(checkpointTime < self.t or checkpointTime > self.tmax):
+                    continue
+                # Run the sim until the next checkpoint time:
+                if(checkpointTime > self.t):
+                    self.run_epoch(runtime=checkpointTime-self.t, method=method)
+                # Having reached the checkpoint, update applicable parameters:
+                if(verbose is not False):
+                    print("[Checkpoint: Updating parameters]")
+                for param in self.parameters:
+                    if(param in checkpoints):
+                        self.parameters[param] = checkpoints[param][checkpointIdx]
+                self.update_parameters()
+
+        if(self.t < self.tmax):
+            self.run_epoch(runtime=self.tmax-self.t, method=method)
+
+        # Data series of each compartment (time points x parameter sets):
+        for compartmentIdx, compartment in enumerate(self.compartments):
+            setattr(self, 'num'+compartment, self.Y[:self.tidx+1, compartmentIdx])
+        self.tseries = self.tseries[:self.tidx+1]
+        self.Y       = self.Y[:self.tidx+1]
+        self.N       = self.numNodes - self.numF
+
+        if(verbose):
+            print("t = %.2f" % self.t)
+            for compartment in self.compartments:
+                print("\t %-6s = %s" % (compartment, getattr(self, 'num'+compartment)[-1]))
+
+        return True
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def total_num_infected(self, t_idx=None):
+        infected = self.Y[:, [1, 2, 3, 4, 9, 10, 11, 12]].sum(axis=1)
+        if(t_idx is None):
+            return (infected[:])
+        else:
+            return (infected[t_idx])
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def total_num_isolated(self, t_idx=None):
+        isolated = self.Y[:, 8:].sum(axis=1)
+        if(t_idx is None):
+            return (isolated[:])
+        else:
+            return (isolated[t_idx])
+
+
+
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+
+
+
+class ExtSEIRSEdgeBasedModelVac():
+    """
+    A class to simulate the Edge-Based Compartmental (Miller-Volz) approximation of the Extended SEIRS Network Model
+    ===================================================
+    Deterministic expected trajectory of an ExtSEIRSNetworkModelVac instance that accounts for its contact network:
+    the degree distribution of the network and, for every degree class, the mean per-edge transmission rates of the
+    local interactions (the rows of A_deltabeta, with the degree-based delta scaling, divided by the node degrees) are
+    read from the model, and the global (p) and external (o) interactions are well mixed.
+    For a susceptible node of degree k, theta_k is the probability that no transmission has occurred along one of its
+    edges, so that it is still susceptible with probability theta_k^k (times the probability of having escaped the
+    global interactions and vaccination). The states of the edge partners (exposed, pre-symptomatic, symptomatic and
+    asymptomatic) are tracked per degree class, assuming an uncorrelated (configuration model) network.
+    Testing and isolation, and re-susceptibility, are not modelled (the run_model scenarios do not use them).
+    When a checkpoint changes the network (G), the degree classes are those of the new network and the edge-based
+    state is restarted from the current expected compartment sizes, as at initialization: no transmissions along
+    any of the new edges yet, and susceptibility taken to be independent of the new degrees.
+    Params:
+            model           ExtSEIRSNetworkModelVac instance (its current parameters and compartment counts are used;
+                            checkpoint parameter updates are applied to a fork of it, the given model is left unchanged)
+            qu              Fraction of vaccinated individuals (default: the network model's, averaged over the nodes)
+            fi              Rate of vaccination (inverse of the time to immunity; default: the network model's)
+    """
+    def __init__(self, model, qu=None, fi=None):
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Model, degree classes and vaccination parameters:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # (checkpoints are applied to a fork, so that the given model is not modified)
+        self.model      = model.fork()
+        self.numNodes   = model.numNodes
+        self.qu         = float(numpy.mean(model.qu)) if qu is None else qu
+        self.fi         = float(numpy.mean(model.fi)) if fi is None else fi
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Initialize Timekeeping:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.t          = model.t
+        self.tmax       = model.t
+        self.tseries    = numpy.array([self.t])
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Initial state, from the compartment counts of the model:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        counts          = model.stateCounts
+        self.init_edge_state(counts[[model.S, model.E, model.I_pre, model.I_sym, model.I_asym, model.H, model.F]].astype(float))
+        # Series of the expected numbers of S, E, I_pre, I_sym, I_asym, H and F individuals
+        # (the state vector itself changes size with the degree classes of the network):
+        self.compartmentSeries = self.compartments(self.tseries, self.state.reshape((1,-1)))
+        self.finalize_data_series()
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def init_edge_state(self, compartments):
+        # (Re)start the edge-based state at the current time over the degree classes of the model's current network,
+        # from the (expected) numbers of S, E, I_pre, I_sym, I_asym, H and F individuals: no transmissions along any
+        # edge yet, and edge partners in each state in proportion to the compartment sizes.
+        m = self.model
+        degree          = m.degree.ravel().astype(int)
+        self.degrees, self.degreeClass, degreeCounts = numpy.unique(degree, return_inverse=True, return_counts=True)
+        self.P_k        = degreeCounts/self.numNodes
+        # Degree distribution of the partner at the end of a random edge:
+        self.Q_k        = self.degrees*self.P_k/max(numpy.sum(self.degrees*self.P_k), 1e-12)
+        self.A          = m.A
+
+        self.update_coefficients()
+
+        S, E, I_pre, I_sym, I_asym, H, F = compartments
+        self.t0         = self.t
+        self.initS      = S/self.numNodes
+        numClasses      = len(self.degrees)
+        # State vector: phi_E, cumulative global infection hazard, E, I_pre, I_sym, I_asym, H, F,
+        # then theta, phi_pre, phi_sym, phi_asym for every degree class
+        self.state      = numpy.concatenate([[E/self.numNodes, 0, E, I_pre, I_sym, I_asym, H, F],
+                                             numpy.ones(numClasses),
+                                             numpy.full(numClasses, I_pre/self.numNodes),
+                                             numpy.full(numClasses, I_sym/self.numNodes),
+                                             numpy.full(numClasses, I_asym/self.numNodes)]).astype(float)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update_coefficients(self):
+        # Rates of the model's current parameters (see ExtSEIRSNetworkModelVac.calc_propensities), per-node values
+        # averaged over the nodes, and the per-edge local transmission rates averaged over each degree class;
+        # recalculated whenever the model's parameters are updated.
+        m = self.model
+        qu, fi = self.qu, self.fi
+        localWeight     = ((1-qu)*m.alpha*(1-m.o)*(1-m.p)).ravel()
+        invDegreeSq     = numpy.divide(1, m.degree.ravel()**2, out=numpy.zeros(self.numNodes), where=m.degree.ravel()!=0)
+        edgeRate_sym    = localWeight*numpy.asarray(m.A_deltabeta.sum(axis=1)).ravel()*invDegreeSq
+        edgeRate_asym   = (localWeight*numpy.asarray(m.A_deltabeta_asym.sum(axis=1)).ravel()*invDegreeSq if m.A_deltabeta_asym is not None else edgeRate_sym)
+        classSizes      = numpy.bincount(self.degreeClass)
+        self.beta_k      = numpy.bincount(self.degreeClass, weights=edgeRate_sym)/classSizes
+        self.beta_asym_k = numpy.bincount(self.degreeClass, weights=edgeRate_asym)/classSizes
+
+        globalWeight    = (1-qu)*m.alpha*(1-m.o)*m.p
+        self.c_ext      = numpy.mean((1-qu)*m.alpha*m.o*m.beta_global*m.prevalence_ext)
+        self.c_sym      = numpy.mean(globalWeight*m.beta_global)
+        self.c_asym     = numpy.mean(globalWeight*m.beta_asym_global)
+
+        self.vac        = qu*fi
+        self.sigma      = (1-qu)*numpy.mean(m.sigma)
+        self.lamda      = (1-qu)*numpy.mean(m.lamda)
+        self.a          = numpy.mean(m.a)
+        self.h          = numpy.mean(m.h)
+        self.f          = numpy.mean(m.f)
+        self.rate_ISYM  = numpy.mean(m.gamma*(1-m.h) + m.eta*m.h)
+        self.rate_ISYMtoH = numpy.mean(m.eta*m.h)
+        self.rate_IASYM = (1-qu)*numpy.mean(m.gamma_asym) + qu*fi
+        self.rate_H     = numpy.mean(m.gamma_H*(1-m.f) + m.mu_H*m.f)
+        self.rate_HtoF  = numpy.mean(m.mu_H*m.f)
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def system_dfes(self, t, y):
+        numClasses  = len(self.degrees)
+        phi_E, G, E, I_pre, I_sym, I_asym, H, F = y[:8]
+        theta, phi_pre, phi_sym, phi_asym = y[8:].reshape((4, numClasses))
+        k           = self.degrees
+
+        # Probability of having escaped the global interactions and vaccination, and the global force of infection:
+        X           = self.initS*numpy.exp(-self.vac*(t - self.t0) - G)
+        N           = self.numNodes - F
+        dG          = self.c_ext + (self.c_sym*I_sym + self.c_asym*(I_pre + I_asym))/N if N > 0 else 0
+
+        dtheta      = -(self.beta_k*phi_sym + self.beta_asym_k*(phi_pre + phi_asym))
+
+        theta_km1   = numpy.power(theta, numpy.maximum(k-1, 0))
+        theta_km2   = numpy.where(k >= 2, numpy.power(theta, numpy.maximum(k-2, 0)), 0)
+        S           = self.numNodes*numpy.sum(self.P_k*theta_km1*theta)*X
+        phi_S       = numpy.sum(self.Q_k*theta_km1)*X
+
+        # New infections (of nodes, and of edge partners) through local and global interactions:
+        newE        = -self.numNodes*numpy.sum(self.P_k*k*theta_km1*dtheta)*X + dG*S
+        newPhi_E    = -numpy.sum(self.Q_k*(k-1)*theta_km2*dtheta)*X + dG*phi_S
+
+        dphi_E      = newPhi_E - (self.sigma + self.vac)*phi_E
+        dphi_pre    = self.sigma*phi_E - (self.lamda + self.vac + self.beta_asym_k)*phi_pre
+        dphi_sym    = self.lamda*(1-self.a)*phi_pre - (self.rate_ISYM + self.beta_k)*phi_sym
+        dphi_asym   = self.lamda*self.a*phi_pre - (self.rate_IASYM + self.beta_asym_k)*phi_asym
+
+        dE          = newE - (self.sigma + self.vac)*E
+        dI_pre      = self.sigma*E - (self.lamda + self.vac)*I_pre
+        dI_sym      = self.lamda*(1-self.a)*I_pre - self.rate_ISYM*I_sym
+        dI_asym     = self.lamda*self.a*I_pre - self.rate_IASYM*I_asym
+        dH          = self.rate_ISYMtoH*I_sym - self.rate_H*H
+        dF          = self.rate_HtoF*H
+
+        return numpy.concatenate([[dphi_E, dG, dE, dI_pre, dI_sym, dI_asym, dH, dF], dtheta, dphi_pre, dphi_sym, dphi_asym])
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def num_susceptible(self, tseries, states):
+        # Expected number of susceptible nodes for states given as rows
+        numClasses  = len(self.degrees)
+        theta       = states[:, 8:8+numClasses]
+        X           = self.initS*numpy.exp(-self.vac*(tseries - self.t0) - states[:, 1])
+        return self.numNodes*numpy.sum(self.P_k*numpy.power(theta, self.degrees), axis=1)*X
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def compartments(self, tseries, states):
+        # Expected numbers of S, E, I_pre, I_sym, I_asym, H and F individuals for states given as rows
+        return numpy.column_stack([self.num_susceptible(tseries, states), states[:, 2:8]])
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def finalize_data_series(self):
+        self.numS       = self.compartmentSeries[:, 0]
+        self.numE       = self.compartmentSeries[:, 1]
+        self.numI_pre   = self.compartmentSeries[:, 2]
+        self.numI_sym   = self.compartmentSeries[:, 3]
+        self.numI_asym  = self.compartmentSeries[:, 4]
+        self.numH       = self.compartmentSeries[:, 5]
+        self.numF       = self.compartmentSeries[:, 6]
+        self.numR       = self.numNodes - self.numS - self.numE - self.numI_pre - self.numI_sym - self.numI_asym - self.numH - self.numF
+        self.N          = self.numNodes - self.numF
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def run_epoch(self, runtime, dt=1):
+        t_end       = self.t + runtime
+        t_eval      = numpy.append(numpy.arange(self.t+dt, t_end, dt), t_end)
+        solution    = scipy.integrate.solve_ivp(self.system_dfes, t_span=[self.t, t_end], y0=self.state, t_eval=t_eval)
+        self.tseries     = numpy.concatenate([self.tseries, solution['t']])
+        self.compartmentSeries = numpy.concatenate([self.compartmentSeries, self.compartments(solution['t'], solution['y'].T)])
+        self.state  = solution['y'][:, -1]
+        self.t      = t_end
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def run(self, T, dt=1, checkpoints=None, verbose=False):
+
+        if(T>0):
+            self.tmax += T
+        else:
+            return False
+
+        #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+        # Run the simulation loop (parameter updates at checkpoints are applied to the model):
+        #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+        if(checkpoints):
+            for checkpointIdx, checkpointTime in enumerate(checkpoints['t']):
+                if(checkpointTime < self.t or checkpointTime > self.tmax):
+                    continue
+                if(checkpointTime > self.t):
+                    self.run_epoch(runtime=checkpointTime-self.t, dt=dt)
+                if(verbose is not False):
+                    print("[Checkpoint: Updating parameters]")
+                self.model.apply_checkpoint(checkpoints, checkpointIdx)
+                if(self.model.A is not self.A):
+                    # The network changed: restart the edge-based state over the degree classes of the new network
+                    self.init_edge_state(self.compartments(numpy.array([self.t]), self.state.reshape((1,-1)))[0])
+                else:
+                    self.update_coefficients()
+
+        if(self.t < self.tmax):
+            self.run_epoch(runtime=self.tmax-self.t, dt=dt)
+
+        self.finalize_data_series()
+
+        if(verbose):
+            print("t = %.2f" % self.t)
+            for compartment in ['S', 'E', 'I_pre', 'I_sym', 'I_asym', 'H', 'R', 'F']:
+                print("\t %-6s = %s" % (compartment, getattr(self, 'num'+compartment)[-1]))
+
+        return True
+
+
+
+
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+#%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+
+
+
+class ExtSEIRSAgeStructuredModelVac():
+    """
+    A class to simulate the Deterministic Age-Structured Extended SEIRS Model with vaccination
+    ===================================================
+    Mean-field counterpart of ExtSEIRSNetworkModelVac (exponential_rates transition mode) with the population divided
+    into groups (the age groups of the demographic network), which mix through a contact matrix between the groups
+    (e.g. a network collapsed with EdgeMaskedGraph.group_contact_matrix). Every parameter may be a single value or one
+    value per group (the per-age values of run_model), qu and fi included, so that age-targeted vaccination orderings
+    can be evaluated by switching the per-group vaccination values at checkpoints (see vaccination_order_checkpoints).
+    Local (network) interactions of a group are spread over the groups in proportion to its row of the contact matrix,
+    and global (p) interactions over the whole population; testing and isolation are not modelled.
+    Params: (as ExtSEIRSNetworkModelVac, one value or one value per group)
+            contact_matrix  Mean number of contacts of a member of group i with members of group j (groups x groups)
+            group_sizes     Number of individuals in each group
+            qu              Fraction of vaccinated individuals
+            fi              Rate of vaccination (inverse of the time to immunity)
+            initE, ...      Initial numbers of individuals of each group in each compartment (all remaining initialized susceptible)
+    """
+
+    # Compartments, in the order of the rows of the state:
+    compartments = ['S', 'E', 'I_pre', 'I_sym', 'I_asym', 'H', 'R', 'F']
+
+    # Parameters, and the parameter whose values are used in place of a parameter given as None:
+    parameterDefaults = [('beta', None), ('beta_asym', 'beta'), ('sigma', None), ('lamda', None), ('gamma', None),
+                         ('gamma_asym', 'gamma'), ('eta', None), ('gamma_H', 'gamma'), ('mu_H', None), ('alpha', None),
+                         ('a', None), ('h', None), ('f', None), ('p', None), ('o', None), ('prevalence_ext', None),
+                         ('qu', None), ('fi', None)]
+
+    def __init__(self, contact_matrix, group_sizes, beta, sigma, lamda, gamma,
+                    beta_asym=None, gamma_asym=None, eta=0, gamma_H=None, mu_H=0, alpha=1.0, a=0, h=0, f=0, p=0,
+                    o=0, prevalence_ext=0, qu=0.63, fi=1/40,
+                    initE=0, initI_pre=0, initI_sym=0, initI_asym=0, initH=0, initR=0, initF=0):
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Model Parameters:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        arguments = locals()
+        self.parameters = {param: arguments[param] for param, default in self.parameterDefaults}
+
+        self.contactMatrix  = numpy.asarray(contact_matrix, dtype=float)
+        self.groupSizes     = numpy.asarray(group_sizes, dtype=float)
+        self.numGroups      = len(self.groupSizes)
+        # Share of the contacts of each group with each group:
+        self.contactShares  = numpy.divide(self.contactMatrix, self.contactMatrix.sum(axis=1, keepdims=True),
+                                           out=numpy.zeros_like(self.contactMatrix), where=self.contactMatrix.sum(axis=1, keepdims=True)>0)
+        self.update_parameters()
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Initialize Timekeeping:
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.t       = 0
+        self.tmax    = 0 # will be set when run() is called
+        self.tseries = numpy.zeros(1)
+
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Initialize Counts of inidividuals with each state (one row per compartment, one column per group):
+        #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.state          = numpy.zeros((len(self.compartments), self.numGroups))
+        for compartmentIdx, compartment in enumerate(self.compartments[1:], start=1):
+            self.state[compartmentIdx] = arguments['init'+compartment]
+        self.state[0]       = self.groupSizes - self.state.sum(axis=0)
+        assert(numpy.all(self.state[0] >= 0)), "The specified group sizes must be greater than or equal to the initial compartment counts."
+        self.stateSeries    = self.state.reshape((1,)+self.state.shape)
+        self.finalize_data_series()
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    @classmethod
+    def from_network_model(cls, model, groups, **kwargs):
+        # Age-structured model for the current network, parameters and compartment counts of an ExtSEIRSNetworkModelVac,
+        # with the nodes grouped by the given labels (e.g. individual_ageGroups): the network is collapsed into the
+        # contact matrix between the groups and the per-node parameter values are averaged over each group.
+        # Parameters may be overridden as keyword arguments. Returns the model and the group labels.
+        graph = model.parameters['G'] if isinstance(model.parameters['G'], EdgeMaskedGraph) else EdgeMaskedGraph(model.A)
+        groupNames, contactMatrix, groupSizes = graph.group_contact_matrix(groups)
+        groupIdx = numpy.searchsorted(groupNames, numpy.asarray(groups))
+        groupMean = lambda values: numpy.bincount(groupIdx, weights=numpy.broadcast_to(numpy.asarray(values, dtype=float).ravel(), (model.numNodes,)), minlength=len(groupNames))/groupSizes
+
+        params = {param: groupMean(getattr(model, param)) for param, default in cls.parameterDefaults}
+        for compartment in cls.compartments[1:]:
+            params['init'+compartment] = numpy.bincount(groupIdx, weights=(model.X[:,0]==getattr(model, compartment)), minlength=len(groupNames))
+        params.update(kwargs)
+        return cls(contact_matrix=contactMatrix, group_sizes=groupSizes, **params), groupNames
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def update_parameters(self):
+        # Per-group parameter values (a single value applies to all groups):
+        for param, default in self.parameterDefaults:
+            value = self.parameters[param]
+            value = getattr(self, default) if (value is None and default is not None) else numpy.asarray(value, dtype=float)
+            assert(value.size == 1 or value.size == self.numGroups), "Expecting one value or one value per group ("+str(self.numGroups)+") for parameter "+param+"."
+            setattr(self, param, numpy.broadcast_to(value.ravel() if value.size > 1 else value.reshape(()), (self.numGroups,)))
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def system_dfes(self, t, y):
+        S, E, I_pre, I_sym, I_asym, H, R, F = y.reshape((len(self.compartments), self.numGroups))
+
+        # Infectiousness of each group, per member alive, and force of infection on each group
+        # (see ExtSEIRSNetworkModelVac.calc_propensities):
+        N_group     = self.groupSizes - F
+        infectious  = self.beta*I_sym + self.beta_asym*(I_pre + I_asym)
+        localPressure  = self.contactShares @ numpy.divide(infectious, N_group, out=numpy.zeros(self.numGroups), where=N_group>0)
+        globalPressure = infectious.sum()/N_group.sum() if N_group.sum() > 0 else 0
+        force       = (1-self.qu)*self.alpha*(self.o*numpy.mean(self.beta)*self.prevalence_ext
+                                              + (1-self.o)*((1-self.p)*localPressure + self.p*globalPressure))
+        vac         = self.qu*self.fi
+
+        dS      = -force*S - vac*S
+        dE      = force*S - ((1-self.qu)*self.sigma + vac)*E
+        dI_pre  = (1-self.qu)*self.sigma*E - ((1-self.qu)*self.lamda + vac)*I_pre
+        dI_sym  = (1-self.qu)*self.lamda*(1-self.a)*I_pre - (self.gamma*(1-self.h) + self.eta*self.h)*I_sym
+        dI_asym = (1-self.qu)*self.lamda*self.a*I_pre - ((1-self.qu)*self.gamma_asym + vac)*I_asym
+        dH      = self.eta*self.h*I_sym - (self.gamma_H*(1-self.f) + self.mu_H*self.f)*H
+        dF      = self.mu_H*self.f*H
+        dR      = -(dS + dE + dI_pre + dI_sym + dI_asym + dH + dF)
+
+        return numpy.concatenate([dS, dE, dI_pre, dI_sym, dI_asym, dH, dR, dF])
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def finalize_data_series(self):
+        # Data series of each compartment (time points x groups), and of the population alive:
+        for compartmentIdx, compartment in enumerate(self.compartments):
+            setattr(self, 'num'+compartment, self.stateSeries[:, compartmentIdx])
+        self.N = self.groupSizes - self.numF
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def run_epoch(self, runtime, dt=1):
+        t_end       = self.t + runtime
+        t_eval      = numpy.append(numpy.arange(self.t+dt, t_end, dt), t_end)
+        solution    = scipy.integrate.solve_ivp(self.system_dfes, t_span=[self.t, t_end], y0=self.state.ravel(), t_eval=t_eval)
+        self.tseries     = numpy.concatenate([self.tseries, solution['t']])
+        self.stateSeries = numpy.concatenate([self.stateSeries, solution['y'].T.reshape((-1, len(self.compartments), self.numGroups))])
+        self.state  = self.stateSeries[-1]
+        self.t      = t_end
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def run(self, T, dt=1, checkpoints=None, verbose=False):
+
+        if(T>0):
+            self.tmax += T
+        else:
+            return False
+
+        #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+        # Run the simulation loop:
+        #%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+        if(checkpoints):
+            for checkpointIdx, checkpointTime in enumerate(checkpoints['t']):
+                if(checkpointTime < self.t or checkpointTime > self.tmax):
+                    continue
+                if(checkpointTime > self.t):
+                    self.run_epoch(runtime=checkpointTime-self.t, dt=dt)
+                if(verbose is not False):
+                    print("[Checkpoint: Updating parameters]")
+                for param in self.parameters:
+                    if(param in checkpoints):
+                        self.parameters[param] = checkpoints[param][checkpointIdx]
+                self.update_parameters()
+
+        if(self.t < self.tmax):
+            self.run_epoch(runtime=self.tmax-self.t, dt=dt)
+
+        self.finalize_data_series()
+
+        if(verbose):
+            print("t = %.2f" % self.t)
+            for compartment in self.compartments:
+                print("\t %-6s = %s" % (compartment, getattr(self, 'num'+compartment)[-1].sum()))
+
+        return True
+
+#^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def vaccination_order_checkpoints(self, order, interval, start=0):
+        # Checkpoints that start the vaccination (the model's qu and fi values) of the groups one after another,
+        # in the given order of group indices, every interval days from start; groups not started are not vaccinated.
+        qu = numpy.zeros(self.numGroups)
+        fi = numpy.zeros(self.numGroups)
+        checkpoints = {'t': [], 'qu': [], 'fi': []}
+        for orderIdx, group in enumerate(order):
+            qu, fi = qu.copy(), fi.copy()
+            qu[group], fi[group] = self.qu[group], self.fi[group]
+            checkpoints['t'].append(start + orderIdx*interval)
+            checkpoints['qu'].append(qu)
+            checkpoints['fi'].append(fi)
+        return checkpoints
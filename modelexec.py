@@ -1,8 +1,64 @@
 import os
+import random
 import numpy as np
 import Extended_SEIRS_model
 import pandas as pd
 import sys, getopt
+import multiprocessing
+
+def prepare_network(network_seed):
+   Extended_SEIRS_model.load_demographic_contact_network(Extended_SEIRS_model.N, Extended_SEIRS_model.household_data, Extended_SEIRS_model.layer_info, seed=network_seed)
+
+def write_series(dataSeries, outfile, vacoutfile, i):
+   timeSeries   = np.array(dataSeries[0])
+   Sseries      = np.array(dataSeries[1])
+   Eseries      = np.array(dataSeries[2])
+   I_preseries  = np.array(dataSeries[3])
+   I_symseries  = np.array(dataSeries[4])
+   I_asymseries = np.array(dataSeries[5])
+   Rseries      = np.array(dataSeries[6])
+   Hseries      = np.array(dataSeries[7])
+   Fseries      = np.array(dataSeries[8])
+   vactimeSeries   = np.array(dataSeries[9])
+   vacSseries      = np.array(dataSeries[10])
+   vacEseries      = np.array(dataSeries[11])
+   vacI_preseries  = np.array(dataSeries[12])
+   vacI_symseries  = np.array(dataSeries[13])
+   vacI_asymseries = np.array(dataSeries[14])
+   vacRseries      = np.array(dataSeries[15])
+   vacHseries      = np.array(dataSeries[16])
+   vacFseries      = np.array(dataSeries[17])
+
+   #Exporting run data into a csv defined by the user
+   if(not(outfile=='')):
+       df = pd.DataFrame({"time" : timeSeries, "susceptibles" : Sseries, "exposed" : Eseries,"i_pre" : I_preseries, "i_sym" : I_symseries,"i_asym" : I_asymseries, "recovered" : Rseries,"hospitalized" : Hseries, "fatalities" : Fseries})
+       df.to_csv(outfile+str(i)+'.csv', index=False)
+   if(not(vacoutfile=='')):
+       vacdf = pd.DataFrame({"time" : vactimeSeries, "susceptibles" : vacSseries, "exposed" : vacEseries,"i_pre" : vacI_preseries, "i_sym" : vacI_symseries,"i_asym" : vacI_asymseries, "recovered" : vacRseries,"hospitalized" : vacHseries, "fatalities" : vacFseries})
+       vacdf.to_csv(vacoutfile+str(i)+'.csv', index=False)
+
+def run_replicate(i, seedSequence, scenario, runs, plot, outfile, vacoutfile, network_seed, timeline_file=None, snapshot_dir=None):
+   #The models (and the network generators) draw from the global numpy.random and random states,
+   #so each run seeds them in its own process from its own child of the root SeedSequence:
+   rng = np.random.default_rng(seedSequence)
+   np.random.seed(rng.integers(2**32))
+   random.seed(int(rng.integers(2**32)))
+
+   print('run no',i)
+   options = {'network_seed': network_seed}
+   if(timeline_file):
+      options['timeline_file'] = timeline_file
+   if(snapshot_dir):
+      options['snapshot_dir'] = snapshot_dir
+   dataSeries = Extended_SEIRS_model.run_model(scenario,runs,plot,outfile,**options)
+
+   #With scenario 'all' the series of every scenario are written, to files named after the scenario
+   if(scenario == 'all'):
+      for scenarioName, scenarioSeries in dataSeries.items():
+         write_series(scenarioSeries, outfile+scenarioName if outfile else '', vacoutfile+scenarioName if vacoutfile else '', i)
+   else:
+      write_series(dataSeries, outfile, vacoutfile, i)
+   return i
 
 def main(argv):
    scenario = ''
@@ -10,14 +66,19 @@ def main(argv):
    plot = False
    outfile = ''
    vacoutfile = ''
+   workers = 1
+   seed = None
+   networkPool = None
+   timelineFile = None
+   snapshotDir = None
    try:
-      opts, args = getopt.getopt(argv,"hs:r:po:v:",["help","scenario=","runs=","plot","outfile=","vaccination="])
+      opts, args = getopt.getopt(argv,"hs:r:po:v:w:t:",["help","scenario=","runs=","plot","outfile=","vaccination=","workers=","seed=","network-pool=","timeline=","snapshots="])
    except getopt.GetoptError:
-      print ('modelexec.py -s [scenario] -r [number of runs] -o [output file] -v [vaccination output file]')
+      print ('modelexec.py -s [scenario|all] -r [number of runs] -o [output file] -v [vaccination output file] -w [number of worker processes] --seed [root seed] --network-pool [number of networks] -t [timeline file] --snapshots [snapshot directory]')
       sys.exit(2)
    for opt, arg in opts:
       if opt in("-h","--help"):
-         print ('modelexec.py -s [scenario] -r [number of runs] -o [output file] -v [vaccination output file]')
+         print ('modelexec.py -s [scenario|all] -r [number of runs] -o [output file] -v [vaccination output file] -w [number of worker processes] --seed [root seed] --network-pool [number of networks] -t [timeline file] --snapshots [snapshot directory]')
          sys.exit()
       elif opt in ("-s", "--scenario"):
          scenario = arg
@@ -34,37 +95,39 @@ def main(argv):
       elif opt in ("-v","--vaccination"):
          vacoutfile = arg
          print('Writing vaccination run to file',vacoutfile)
+      elif opt in ("-w","--workers"):
+         workers = int(arg)
+         print('Using',workers,'worker processes')
+      elif opt == "--seed":
+         seed = int(arg)
+      elif opt == "--network-pool":
+         networkPool = int(arg)
+         print('Drawing runs from a pool of',networkPool,'cached networks')
+      elif opt in ("-t","--timeline"):
+         timelineFile = arg
+         print('Reading scenario timelines from',timelineFile)
+      elif opt == "--snapshots":
+         snapshotDir = arg
+         print('Storing and resuming from simulation snapshots in',snapshotDir)
 
-   for i in range(1,int(runs),1):
-       print('run no',i)
-       dataSeries = Extended_SEIRS_model.run_model(scenario,runs,plot,outfile)
-       dataSeries = np.array(dataSeries)
-       timeSeries   = np.array(dataSeries[0])
-       Sseries      = np.array(dataSeries[1])
-       Eseries      = np.array(dataSeries[2])
-       I_preseries  = np.array(dataSeries[3])
-       I_symseries  = np.array(dataSeries[4])
-       I_asymseries = np.array(dataSeries[5])
-       Rseries      = np.array(dataSeries[6])
-       Hseries      = np.array(dataSeries[7])
-       Fseries      = np.array(dataSeries[8])
-       vactimeSeries   = np.array(dataSeries[9])
-       vacSseries      = np.array(dataSeries[10])
-       vacEseries      = np.array(dataSeries[11])
-       vacI_preseries  = np.array(dataSeries[12])
-       vacI_symseries  = np.array(dataSeries[13])
-       vacI_asymseries = np.array(dataSeries[14])
-       vacRseries      = np.array(dataSeries[15])
-       vacHseries      = np.array(dataSeries[16])
-       vacFseries      = np.array(dataSeries[17])
+   #Every run gets an independent random stream spawned from the root seed (fresh entropy if no seed is given):
+   seedSequences = np.random.SeedSequence(seed).spawn(int(runs))
+   #With a network pool, run i uses the cached network number (i-1) mod K, otherwise every run generates its own network
+   networkSeeds = [(i-1) % networkPool if networkPool else None for i in range(1,int(runs)+1)]
+   replicates = [(i, seedSequences[i-1], scenario, runs, plot, outfile, vacoutfile, networkSeeds[i-1], timelineFile, snapshotDir) for i in range(1,int(runs)+1)]
 
-       #Exporting run data into a csv defined by the user
-       if(not(outfile=='')):
-           df = pd.DataFrame({"time" : timeSeries, "susceptibles" : Sseries, "exposed" : Eseries,"i_pre" : I_preseries, "i_sym" : I_symseries,"i_asym" : I_asymseries, "recovered" : Rseries,"hospitalized" : Hseries, "fatalities" : Fseries})
-           df.to_csv(outfile+str(i)+'.csv', index=False)
-       if(not(vacoutfile=='')):
-           vacdf = pd.DataFrame({"time" : vactimeSeries, "susceptibles" : vacSseries, "exposed" : vacEseries,"i_pre" : vacI_preseries, "i_sym" : vacI_symseries,"i_asym" : vacI_asymseries, "recovered" : vacRseries,"hospitalized" : vacHseries, "fatalities" : vacFseries})
-           vacdf.to_csv(vacoutfile+str(i)+'.csv', index=False)
+   if(workers > 1):
+      #Results are written by each worker as soon as its run finishes
+      with multiprocessing.Pool(processes=workers) as pool:
+         if(networkPool):
+            pool.map(prepare_network, range(min(networkPool, int(runs))), chunksize=1)
+         pool.starmap(run_replicate, replicates, chunksize=1)
+   else:
+      if(networkPool):
+         for networkSeed in range(min(networkPool, int(runs))):
+            prepare_network(networkSeed)
+      for replicate in replicates:
+         run_replicate(*replicate)
 
 if __name__ == "__main__":
    main(sys.argv[1:])